@@ -0,0 +1,283 @@
+import argparse
+import builtins
+import sys
+import time
+from src.common.configs import *
+from src.common.constans import *
+
+# Every subcommand imports its modules inside its handler, so "--help" and the light
+# subcommands never load cv2, PIL or ultralytics
+
+
+class ImportProfiler:
+    def __init__(self) -> None:
+        """
+        Initialize the ImportProfiler, timing the first import of every module by wrapping
+        builtins.__import__. The time of a module excludes the modules it imports itself and is
+        summed per top level package
+        """
+        self.times = {}
+        self.children = []
+        self.original = builtins.__import__
+
+    def __enter__(self):
+        builtins.__import__ = self.wrapped
+        return self
+
+    def __exit__(self, *exc_info):
+        builtins.__import__ = self.original
+        self.report()
+
+    def wrapped(self, name, globals=None, locals=None, fromlist=(), level=0):
+        """
+        Import a module like builtins.__import__, timing it when it is not imported yet
+        """
+        if level or name in sys.modules:
+            return self.original(name, globals, locals, fromlist, level)
+        self.children.append(0.0)
+        start = time.perf_counter()
+        try:
+            return self.original(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            package = name.split(".")[0]
+            self.times[package] = self.times.get(package, 0.0) + elapsed - self.children.pop()
+            if self.children:
+                self.children[-1] += elapsed
+
+    def report(self, top: int = 15) -> None:
+        """
+        Print the slowest packages to stderr
+        Args:
+            top (int): The number of packages to print (default is 15)
+        """
+        print(f"{'import':30s} {'seconds':>8s}", file=sys.stderr)
+        for package, seconds in sorted(self.times.items(), key=lambda item: -item[1])[:top]:
+            print(f"{package:30s} {seconds:8.3f}", file=sys.stderr)
+        print(f"{'total':30s} {sum(self.times.values()):8.3f}", file=sys.stderr)
+
+
+def extract(args) -> None:
+    """
+    Extract every n-th frame of a time window of a video
+    """
+    from src.model.data_collector import DataCollectorAndDivider
+    collector = DataCollectorAndDivider(args.video, args.frames, None)
+    count, failures = collector.extract_frames_fast(args.stride, args.target_fps, args.start, args.end,
+                                                    args.workers, jpeg_quality=args.quality)
+    for path, error in failures:
+        print(f"Failed to write {path}: {error}")
+    print(f"{count} frames written to {args.frames}")
+
+
+def split(args) -> None:
+    """
+    Split the images into train, test and valid sets without copying them
+    """
+    from src.model.data_collector import DataCollectorAndDivider
+    if args.labels is None and (args.stratify or args.mode != MANIFEST):
+        build_parser().error("--stratify, --mode hardlink and --mode symlink need --labels")
+    if abs(sum(args.ratios) - 1) > 1e-6:
+        build_parser().error("--ratios must sum to 1")
+    divider = DataCollectorAndDivider(None, args.images, args.output)
+    train_ratio, test_ratio, valid_ratio = args.ratios
+    splits, failures = divider.split_dataset_linked(args.labels, args.mode, train_ratio, test_ratio, valid_ratio,
+                                                    args.seed, args.stratify, args.data_yaml, args.dedup_threshold,
+                                                    args.drop_duplicates)
+    for path, error in failures:
+        print(f"Failed to read {path}: {error}")
+    for name, files in splits.items():
+        print(f"{name}: {len(files)} images")
+
+
+def crops(args) -> None:
+    """
+    Build the classifier and the localizer datasets of the cascade from the YOLO labels
+    """
+    from src.model.crop_extractor import CropExtractor
+    extractor = CropExtractor(args.data_folder, args.data_yaml, args.size, args.padding)
+    counts, failures = extractor.extract(args.output, workers=args.workers)
+    for split, split_counts in counts.items():
+        print(f"{split}: {sum(split_counts)} crops")
+    for path, error in failures:
+        print(f"Failed {path}: {error}")
+    if args.agnostic:
+        print(f"{extractor.agnostic_labels(args.agnostic, mode=args.mode)} class-agnostic label files")
+
+
+def augment(args) -> None:
+    """
+    Generate the augmented images of the training set
+    """
+    from src.controler import generate_data
+    failures = generate_data.main()
+    for filename, error in failures:
+        print(f"Failed to augment {filename}: {error}")
+
+
+def adjust_labels(args) -> None:
+    """
+    Rescale the annotations of every split to the resized images
+    """
+    from src.controler import adjust_bboxes
+    adjust_bboxes.main()
+
+
+def rename(args) -> None:
+    """
+    Add a suffix to the names of the augmented images
+    """
+    from src.controler import rename_file
+    if args.folder:
+        rename_file.rename_files_in_folder(args.folder, args.extension, args.suffix)
+    else:
+        rename_file.main()
+
+
+def detect(args) -> None:
+    """
+    Detect traffic signs in a video, in a window or headless when an output file is given
+    """
+    from src.model.yolo_detection import Detection
+    detection = Detection(args.model, args.video, args.backend, args.imgsz, args.int8)
+    video_size = tuple(args.video_size) if args.video_size else None
+    if args.classifier:
+        if not args.output:
+            raise SystemExit("--classifier needs --output")
+        count = detection.detect_cascade(args.output, args.classifier, args.crop_size, batch_size=args.batch_size,
+                                         video_output=args.video_output, video_fps=args.video_fps,
+                                         video_size=video_size, font_path=args.font)
+        print(f"{count} frames processed")
+    elif args.output:
+        count = detection.detect_headless(args.output, args.batch_size, video_output=args.video_output,
+                                          video_fps=args.video_fps, video_size=video_size, font_path=args.font)
+        print(f"{count} frames processed")
+    else:
+        detection.detect(args.font)
+
+
+def forward(module: str):
+    """
+    Create a handler passing the remaining arguments to the main of a controller
+    Args:
+        module (str): The controller module in src.controler
+    Returns:
+        function: The handler
+    """
+    def handler(args) -> None:
+        import importlib
+        result = importlib.import_module(f"src.controler.{module}").main(args.args)
+        if isinstance(result, int):
+            sys.exit(result)
+    return handler
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    Build the parser of every subcommand
+    Returns:
+        argparse.ArgumentParser: The parser
+    """
+    parser = argparse.ArgumentParser(prog="python -m src", description="Traffic sign detection tools")
+    parser.add_argument("--profile-imports", action="store_true",
+                        help="print the time spent importing every package to stderr")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("extract", help="extract frames from a video")
+    command.add_argument("--video", default=VIDEO_YOLO)
+    command.add_argument("--frames", required=True, help="folder to write the frames to")
+    command.add_argument("--stride", type=int, default=1, help="keep one frame out of stride")
+    command.add_argument("--target-fps", type=float, default=None, help="keep about this many frames per second")
+    command.add_argument("--start", type=float, default=0.0, help="start of the window in seconds")
+    command.add_argument("--end", type=float, default=None, help="end of the window in seconds")
+    command.add_argument("--workers", type=int, default=4, help="number of writer threads")
+    command.add_argument("--quality", type=int, default=95, help="JPEG quality")
+    command.set_defaults(handler=extract)
+
+    command = commands.add_parser("split", help="split images into train, test and valid sets")
+    command.add_argument("--images", required=True, help="folder of the images")
+    command.add_argument("--labels", default=None, help="folder of the YOLO annotation files")
+    command.add_argument("--output", required=True, help="folder to write the split to")
+    command.add_argument("--mode", default=MANIFEST, choices=[MANIFEST, HARDLINK, SYMLINK])
+    command.add_argument("--ratios", type=float, nargs=3, default=(0.7, 0.15, 0.15),
+                         metavar=("TRAIN", "TEST", "VALID"))
+    command.add_argument("--seed", type=int, default=0)
+    command.add_argument("--stratify", action="store_true", help="balance the dominant class of every image")
+    command.add_argument("--data-yaml", default=DATA_YAML)
+    command.add_argument("--dedup-threshold", type=int, default=None,
+                         help="keep near duplicates within this Hamming distance in one split")
+    command.add_argument("--drop-duplicates", action="store_true", help="keep one image of every near duplicate group")
+    command.set_defaults(handler=split)
+
+    command = commands.add_parser("crops", help="build the datasets of the localizer and classifier cascade")
+    command.add_argument("--data-folder", default=DATA_FOLDER)
+    command.add_argument("--data-yaml", default=DATA_YAML)
+    command.add_argument("--output", required=True, help="folder of the classifier dataset")
+    command.add_argument("--agnostic", default=None, help="folder of the class-agnostic localizer dataset")
+    command.add_argument("--mode", default=HARDLINK, choices=[HARDLINK, SYMLINK],
+                         help="how the localizer dataset links the images")
+    command.add_argument("--size", type=int, default=64, help="width and height of the crops")
+    command.add_argument("--padding", type=float, default=0.1, help="context around a box as a fraction of its size")
+    command.add_argument("--workers", type=int, default=4, help="number of writer threads")
+    command.set_defaults(handler=crops)
+
+    command = commands.add_parser("augment", help="generate the augmented images")
+    command.set_defaults(handler=augment)
+
+    command = commands.add_parser("adjust-labels", help="rescale the annotations to the resized images")
+    command.set_defaults(handler=adjust_labels)
+
+    command = commands.add_parser("rename", help="add a suffix to the names of the augmented images")
+    command.add_argument("--folder", default=None, help="rename only this folder")
+    command.add_argument("--suffix", default="", help="suffix added before the extension")
+    command.add_argument("--extension", default=JPG)
+    command.set_defaults(handler=rename)
+
+    command = commands.add_parser("detect", help="detect traffic signs in a video")
+    command.add_argument("--model", default=YOLO_MODEL)
+    command.add_argument("--video", default=VIDEO_YOLO)
+    command.add_argument("--backend", default="torch", choices=["torch", "onnx", "openvino"])
+    command.add_argument("--imgsz", type=int, default=640)
+    command.add_argument("--int8", action="store_true", help="int8 model, openvino backend only")
+    command.add_argument("--output", default=None,
+                         help="JSONL or CSV file for the detections, runs without a window")
+    command.add_argument("--batch-size", type=int, default=8)
+    command.add_argument("--video-output", default=None, help="annotated video, only with --output")
+    command.add_argument("--video-fps", type=float, default=None, help="frame rate of the annotated video")
+    command.add_argument("--video-size", type=int, nargs=2, default=None, metavar=("WIDTH", "HEIGHT"),
+                         help="size of the annotated video")
+    command.add_argument("--font", default=None, help="TrueType font with Vietnamese glyphs")
+    command.add_argument("--classifier", default=None,
+                         help="crop classifier weights, runs --model as the sign localizer of the cascade")
+    command.add_argument("--crop-size", type=int, default=64, help="input size of the crop classifier")
+    command.set_defaults(handler=detect)
+
+    for name, module, help in (("bench", "benchmark", "benchmark the data pipeline and the detection"),
+                               ("evaluate", "evaluate", "score a model against a split"),
+                               ("serve", "serve", "serve the detection model over HTTP")):
+        # Every argument, --help included, is left to the parser of the controller
+        command = commands.add_parser(name, help=f"{help}, see {name} --help", add_help=False)
+        command.set_defaults(handler=forward(module), forwarded=True)
+    return parser
+
+
+def main(argv: list = None) -> None:
+    """
+    Run a subcommand
+    Args:
+        argv (list): The command line arguments (default is None, sys.argv)
+    """
+    parser = build_parser()
+    args, rest = parser.parse_known_args(argv)
+    if rest and not getattr(args, "forwarded", False):
+        parser.error(f"unrecognized arguments: {' '.join(rest)}")
+    args.args = rest
+    if args.profile_imports:
+        with ImportProfiler():
+            args.handler(args)
+    else:
+        args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
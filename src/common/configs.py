@@ -1,4 +1,6 @@
 VIDEO_YOLO = "data/video/video-YOLO.mp4"
 VIDEO_RCNN = "data/video/video-YOLO.mp4"
 YOLO_MODEL = "notebook/yolo-training-model-for-video/weight/64epochs_batch16/best.pt"
-OUTPUT_RCNN_FRAMES = "data\VN_traffic_sign_frames_video\Frames-Video for YOLO\frames"
\ No newline at end of file
+OUTPUT_RCNN_FRAMES = "data\VN_traffic_sign_frames_video\Frames-Video for YOLO\frames"
+DATA_YAML = "data/VN_Traffic_Sign_Robo/data.yaml"
+DATA_FOLDER = "data/VN_Traffic_Sign_Robo"
\ No newline at end of file
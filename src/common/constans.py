@@ -6,4 +6,10 @@ VALID = "valid"
 READ = 'r'
 WRITE = 'w'
 JPG = '.jpg'
-PNG = '.png'
\ No newline at end of file
+PNG = '.png'
+TXT = '.txt'
+IMAGES = 'images'
+LABELS = 'labels'
+MANIFEST = 'manifest'
+HARDLINK = 'hardlink'
+SYMLINK = 'symlink'
\ No newline at end of file
@@ -1,10 +1,8 @@
+from src.model.build_cache import BuildCache
 from src.model.get_path import FilePathCollector
 from src.model.resize_bboxes import AdjustBoundingBoxes
 from src.common.configs import *
 from src.common.constans import *
-import sys
-sys.path.append(
-    r'E:\Traffic_Sign_Detection Thesis\Thesis---Traffic-Sign-Detection')
 
 
 def main():
@@ -27,29 +25,13 @@ def main():
     darkness = r"adjust_annotation\darkness"
     brightness = r"adjust_annotation\brightness"
 
-    # create annotation
+    # create annotation: every variant shares the resize geometry,
+    # so the boxes are adjusted once and written to all folders,
+    # annotation files whose outputs are up to date are skipped
     resize_adjust = AdjustBoundingBoxes(resize, annotations, 640, 640)
-    resize_adjust.write_new_bboxes_to_annotations_file()
-
-    blur_adjust = AdjustBoundingBoxes(blur, annotations, 640, 640)
-    blur_adjust.write_new_bboxes_to_annotations_file()
-
-    noise_adjust = AdjustBoundingBoxes(noise, annotations, 640, 640)
-    noise_adjust.write_new_bboxes_to_annotations_file()
-
-    high_contrast_adjust = AdjustBoundingBoxes(
-        high_contrast, annotations, 640, 640)
-    high_contrast_adjust.write_new_bboxes_to_annotations_file()
-
-    low_contrast_adjust = AdjustBoundingBoxes(
-        low_contrast, annotations, 640, 640)
-    low_contrast_adjust.write_new_bboxes_to_annotations_file()
-
-    darkness_adjust = AdjustBoundingBoxes(darkness, annotations, 640, 640)
-    darkness_adjust.write_new_bboxes_to_annotations_file()
-
-    brightness_adjust = AdjustBoundingBoxes(brightness, annotations, 640, 640)
-    brightness_adjust.write_new_bboxes_to_annotations_file()
+    resize_adjust.write_new_bboxes_to_annotations_file(
+        [blur, noise, high_contrast, low_contrast, darkness, brightness],
+        cache=BuildCache(r"adjust_annotation\.manifest.json"))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,42 @@
+from src.model.benchmark import Benchmark
+import argparse
+import sys
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description="Benchmark the data pipeline and the detection")
+    parser.add_argument("--output", default="benchmark.json",
+                        help="JSON file to save the results to")
+    parser.add_argument("--compare", default=None,
+                        help="baseline JSON file to compare the results against")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="allowed slowdown against the baseline, 0.1 is 10%%")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--limit", type=int, default=None,
+                        help="use only the first images of the split")
+    parser.add_argument("--model", default="yolov8n.yaml",
+                        help="local model used for the detection benchmark")
+    args = parser.parse_args(argv)
+
+    benchmark = Benchmark(repeats=args.repeats, limit=args.limit,
+                          detection_model=args.model)
+    report = benchmark.run()
+    benchmark.save(report, args.output)
+    for name, result in report["results"].items():
+        if "seconds" in result:
+            # A run too fast for the clock has no rate
+            rate = "-" if result["per_second"] is None else f"{result['per_second']:.1f}"
+            print(f"{name:40s} {result['seconds']:9.4f}s {rate:>10s}/s")
+        else:
+            print(f"{name:40s} skipped")
+
+    if args.compare:
+        regressions = benchmark.compare(report, args.compare, args.tolerance)
+        for name, baseline, current, ratio in regressions:
+            print(f"REGRESSION {name}: {baseline:.4f}s -> {current:.4f}s ({ratio:.2f}x)")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
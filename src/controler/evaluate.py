@@ -0,0 +1,43 @@
+from src.model.backends import TORCH
+from src.model.evaluation import Evaluation
+from src.model.yolo_detection import Detection
+from src.common.configs import *
+from src.common.constans import *
+import argparse
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description="Score a model against the YOLO labels of a split")
+    parser.add_argument("--model", default=YOLO_MODEL)
+    parser.add_argument("--backend", default=TORCH, choices=["torch", "onnx", "openvino"])
+    parser.add_argument("--split", default=TEST, choices=[TRAIN, TEST, VALID])
+    parser.add_argument("--conf", type=float, default=0.25,
+                        help="confidence threshold of precision, recall and the confusion matrix")
+    parser.add_argument("--iou", type=float, default=0.5,
+                        help="IoU threshold of precision, recall and the confusion matrix")
+    parser.add_argument("--sweep", type=float, nargs="*", default=None,
+                        help="also report precision and recall at these confidence thresholds")
+    args = parser.parse_args(argv)
+
+    evaluation = Evaluation(Detection(args.model, None, args.backend), split=args.split)
+    result = evaluation.evaluate(args.conf, args.iou)
+    print(f"{'class':55s} {'inst':>5s} {'P':>6s} {'R':>6s} {'mAP50':>6s} {'50-95':>6s}")
+    for row in result["classes"]:
+        print(f"{row['name']:55s} {row['instances']:5d} {row['precision']:6.3f} {row['recall']:6.3f} "
+              f"{row['ap50']:6.3f} {row['ap50_95']:6.3f}")
+    print(f"{'all':55s} {'':5s} {result['precision']:6.3f} {result['recall']:6.3f} "
+          f"{result['map50']:6.3f} {result['map50_95']:6.3f}")
+    print("confusion matrix (rows: true class, columns: predicted class)")
+    print(result["confusion_matrix"])
+    print("false positives", result["false_positives"])
+    print("missed", result["missed"])
+    if any(result["unknown"].values()):
+        print("ignored, class not in data.yaml:", result["unknown"])
+
+    if args.sweep:
+        for conf, precision, recall in evaluation.sweep(args.sweep, args.iou):
+            print(f"conf {conf:.3f}: P {precision:.3f} R {recall:.3f}")
+
+
+if __name__ == "__main__":
+    main()
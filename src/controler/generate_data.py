@@ -1,12 +1,17 @@
+from src.model.build_cache import BuildCache
 from src.model.data_augment import DataAugment
+from src.model.image_store import ImageStore
 from src.common.configs import *
 from src.common.constans import *
-import sys
-sys.path.append(
-    r'E:\Traffic_Sign_Detection Thesis\Thesis---Traffic-Sign-Detection')
+import os
 
 
-def main():
+def main() -> list:
+    """
+    Generate the augmented images of the training set
+    Returns:
+        list: The (filename, error) pairs of images that could not be augmented
+    """
     train_data_folder = r"cropped_images"
     test_data_folder = r"data\VN_Traffic_Sign_Robo\test\images"
     valid_data_folder = r"data\VN_Traffic_Sign_Robo\valid\images"
@@ -19,28 +24,24 @@ def main():
     darkness = r"augment_image\darkness"
     brightness = r"augment_image\brightness"
 
-    # Generate data
-    resize_aug = DataAugment(train_data_folder, resize)
-    resize_aug.process_images(resize_aug.resize)
+    # Decode and resize the source images once, later runs only decode new or changed images
+    store = ImageStore(r"augment_image\.store", train_data_folder)
+    store.update()
 
-    blur_aug = DataAugment(resize, blur)
-    blur_aug.process_images(blur_aug.add_blur)
-
-    noise_aug = DataAugment(resize, noise)
-    noise_aug.process_images(noise_aug.add_noise)
-
-    high_contrast_aug = DataAugment(resize, high_contrast)
-    high_contrast_aug.process_images(high_contrast_aug.change_contrast, 2.0)
-
-    low_contrast_aug = DataAugment(resize, low_contrast)
-    low_contrast_aug.process_images(low_contrast_aug.change_contrast, 0.5)
-
-    darkness_aug = DataAugment(resize, darkness)
-    darkness_aug.process_images(darkness_aug.modified_color, 0.5)
-
-    brightness_aug = DataAugment(resize, brightness)
-    brightness_aug.process_images(brightness_aug.modified_color, 2.0)
+    # Generate data: read every resized image from the store and fan out all variants,
+    # images whose outputs are up to date are skipped. Images missing from the store are
+    # decoded at reduced resolution like the store does
+    augment = DataAugment(train_data_folder, resize, store=store)
+    return augment.process_variants({
+        blur: (augment.add_blur, ()),
+        noise: (augment.add_noise, ()),
+        high_contrast: (augment.change_contrast, (2.0,)),
+        low_contrast: (augment.change_contrast, (0.5,)),
+        darkness: (augment.modified_color, (0.5,)),
+        brightness: (augment.modified_color, (2.0,)),
+    }, augment.resize_fast, workers=os.cpu_count(), cache=BuildCache(r"augment_image\.manifest.json"))
 
 
 if __name__ == "__main__":
-    main()
+    for filename, error in main():
+        print(f"Failed to augment {filename}: {error}")
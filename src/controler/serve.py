@@ -0,0 +1,29 @@
+from src.model.inference_server import InferenceServer
+from src.model.metrics import Metrics
+from src.model.yolo_detection import Detection
+from src.common.configs import *
+import argparse
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description="Serve the detection model over HTTP")
+    parser.add_argument("--model", default=YOLO_MODEL)
+    parser.add_argument("--backend", default="torch", choices=["torch", "onnx", "openvino"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--unix-socket", default=None,
+                        help="listen on a Unix socket instead of host and port")
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--max-queue", type=int, default=64)
+    parser.add_argument("--timeout", type=float, default=5.0)
+    args = parser.parse_args(argv)
+
+    detection = Detection(args.model, None, args.backend, metrics=Metrics())
+    server = InferenceServer(detection, args.host, args.port, args.unix_socket,
+                             args.max_batch_size, args.max_wait_ms, args.max_queue, args.timeout)
+    server.run()
+
+
+if __name__ == "__main__":
+    main()
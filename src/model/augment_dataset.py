@@ -0,0 +1,149 @@
+import inspect
+import os
+from collections import OrderedDict
+import numpy as np
+from src.model.geometric_augment import GeometricAugment
+from src.model.resize_bboxes import AdjustBoundingBoxes
+
+
+class AugmentDataset:
+    def __init__(self, augment: GeometricAugment, photometric: list = None, geometric: list = None,
+                 adjust: AdjustBoundingBoxes = None, seed: int = 0, shuffle: bool = True,
+                 cache_size: int = 0) -> None:
+        """
+        Initialize the AugmentDataset, which yields (image, labels) pairs with the augmentation
+        applied at read time instead of writing a folder per variant. The policy is drawn from a
+        generator seeded with (seed, epoch, index), so a sample is the same on every read and
+        every epoch gets new variants.
+        A policy entry is (operation, probability, ranges), the operation is applied with the given
+        probability and one argument drawn uniformly from every (low, high) range
+        Args:
+            augment (GeometricAugment): The input images, their labels and the operations
+            photometric (list): Entries of DataAugment operations, called as operation(image, *args).
+                Operations with an rng parameter receive the sample generator (default is None)
+            geometric (list): Entries of GeometricAugment matrix operations, applied to the image
+                and its boxes (default is None)
+            adjust (AdjustBoundingBoxes): Adjusts the boxes of the resized image as the
+                annotation files of adjust_annotation are, instead of the exact resize (default is None)
+            seed (int): The seed of the policy (default is 0)
+            shuffle (bool): Iterate every epoch in a seeded random order (default is True)
+            cache_size (int): The number of resized images kept in an LRU cache, 0 disables it
+                (default is 0)
+        """
+        self.augment = augment
+        self.photometric = photometric or []
+        self.geometric = geometric or []
+        self.adjust = adjust
+        self.seed = seed
+        self.shuffle = shuffle
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.epoch = 0
+        self.filenames = augment.list_images()
+        self.takes_rng = {operation: "rng" in inspect.signature(operation).parameters
+                          for operation, _, _ in self.photometric}
+
+    def __len__(self) -> int:
+        return len(self.filenames)
+
+    def __getitem__(self, index: int) -> tuple:
+        return self.sample(index, self.epoch)
+
+    def __iter__(self):
+        return self.generator(self.epoch)
+
+    def set_epoch(self, epoch: int) -> None:
+        """
+        Select the epoch used by indexing and iteration
+        Args:
+            epoch (int): The epoch
+        """
+        self.epoch = epoch
+
+    def base(self, filename: str) -> tuple:
+        """
+        Get the resized image and its boxes, from the LRU cache when possible
+        Args:
+            filename (str): The image file name in the input folder
+        Returns:
+            tuple: The (640, 640, 3) RGB image and its (N, 5) boxes
+        """
+        if filename in self.cache:
+            self.cache.move_to_end(filename)
+            return self.cache[filename]
+
+        if self.adjust is None:
+            # The same pair as the base folder of process_variants, with or without the store
+            image, boxes = self.augment.base_pair(filename, self.augment.resize_matrix)
+        else:
+            boxes = self.adjust.resize_bboxes_array(self.augment.read_boxes(filename))
+            image = self.augment.stored_image(filename)
+            if image is None:
+                image = np.asarray(self.augment.resize_fast(os.path.join(self.augment.input_folder, filename)))
+
+        if self.cache_size > 0:
+            # Samples without any operation hand out the cached arrays themselves
+            image.setflags(write=False)
+            boxes.setflags(write=False)
+            self.cache[filename] = (image, boxes)
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return image, boxes
+
+    def draw(self, rng: np.random.Generator, policy: list) -> list:
+        """
+        Draw the operations of a policy to apply with their arguments
+        Args:
+            rng (np.random.Generator): The sample generator
+            policy (list): (operation, probability, ranges) entries
+        Returns:
+            list: The (operation, args) pairs to apply in order
+        """
+        selected = []
+        for operation, probability, ranges in policy:
+            # Draw every value even when the operation is skipped, so entries do not shift each other
+            apply = rng.random() < probability
+            args = tuple(rng.uniform(low, high) for low, high in ranges)
+            if apply:
+                selected.append((operation, args))
+        return selected
+
+    def sample(self, index: int, epoch: int = 0) -> tuple:
+        """
+        Read one augmented sample
+        Args:
+            index (int): The position of the image in the input folder
+            epoch (int): The epoch, every epoch draws new variants (default is 0)
+        Returns:
+            tuple: The RGB image and its (N, 5) boxes [label, center_x, center_y, width, height]
+        """
+        rng = np.random.default_rng((self.seed, epoch, index))
+        image, boxes = self.base(self.filenames[index])
+
+        for operation, args in self.draw(rng, self.geometric):
+            image, boxes = self.augment.apply(image, boxes, operation, *args)
+
+        photometric = self.draw(rng, self.photometric)
+        if photometric:
+            pil_img = self.augment.load_image(image)
+            for operation, args in photometric:
+                if self.takes_rng[operation]:
+                    pil_img = operation(pil_img, *args, rng=rng)
+                else:
+                    pil_img = operation(pil_img, *args)
+            image = np.asarray(pil_img)
+        return image, boxes
+
+    def generator(self, epoch: int = 0):
+        """
+        Yield every sample of an epoch
+        Args:
+            epoch (int): The epoch (default is 0)
+        Yields:
+            tuple: The RGB image and its (N, 5) boxes
+        """
+        order = np.arange(len(self.filenames))
+        if self.shuffle:
+            np.random.default_rng((self.seed, epoch)).shuffle(order)
+        for index in order:
+            yield self.sample(int(index), epoch)
@@ -0,0 +1,114 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import numpy as np
+from src.common.configs import DATA_YAML
+
+TORCH = "torch"
+ONNX = "onnx"
+OPENVINO = "openvino"
+DETECT = "detect"
+CLASSIFY = "classify"
+CACHE_FOLDER = ".cache"
+
+
+def file_hash(path: str, chunk_size: int = 1 << 20) -> str:
+    """
+    Compute the SHA-1 of a file without loading it at once
+    Args:
+        path (str): The path to the file
+        chunk_size (int): The number of bytes read at a time (default is 1 MiB)
+    Returns:
+        str: The hex digest
+    """
+    digest = hashlib.sha1()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModelBackend:
+    def __init__(self, weights: str, backend: str = TORCH, imgsz: int = 640, int8: bool = False,
+                 task: str = DETECT) -> None:
+        """
+        Initialize the ModelBackend. The PyTorch weights are run as is, or exported once to ONNX
+        (ONNX Runtime) or OpenVINO and cached in a .cache folder next to the weights, keyed by
+        the weight hash, the input size and the precision
+        Args:
+            weights (str): The PyTorch .pt weights file
+            backend (str): "torch", "onnx" or "openvino" (default is "torch")
+            imgsz (int): The inference input size (default is 640)
+            int8 (bool): Quantize the exported model to int8, OpenVINO only since it calibrates
+                the activations on DATA_YAML. Dynamic ONNX quantization only covers MatMul/Gemm
+                weights and does little for the convolutions of YOLO (default is False)
+            task (str): "detect" or "classify", the task of the exported model (default is "detect")
+        """
+        if backend not in (TORCH, ONNX, OPENVINO):
+            raise ValueError(f"Unknown backend {backend}, expected one of {TORCH}, {ONNX}, {OPENVINO}")
+        if int8 and backend != OPENVINO:
+            raise ValueError(f"int8 is only supported on the {OPENVINO} backend")
+        self.weights = weights
+        self.backend = backend
+        self.imgsz = imgsz
+        self.int8 = int8
+        self.task = task
+
+    def artifact_path(self) -> str:
+        """
+        Get the cache path of the exported model
+        Returns:
+            str: The .onnx file or the OpenVINO model folder
+        """
+        stem = os.path.splitext(os.path.basename(self.weights))[0]
+        key = f"{stem}-{file_hash(self.weights)[:16]}-{self.imgsz}{'-int8' if self.int8 else ''}"
+        suffix = ".onnx" if self.backend == ONNX else "_openvino_model"
+        return os.path.join(os.path.dirname(self.weights), CACHE_FOLDER, key + suffix)
+
+    def export(self) -> str:
+        """
+        Export the weights unless the cached artifact already exists. The export runs on a copy
+        of the weights in a private temporary folder, so files next to the weights are never
+        touched and concurrent exports do not share a path
+        Returns:
+            str: The path to the exported model
+        """
+        artifact = self.artifact_path()
+        if os.path.exists(artifact):
+            return artifact
+        os.makedirs(os.path.dirname(artifact), exist_ok=True)
+
+        from ultralytics import YOLO
+        tmp_folder = tempfile.mkdtemp(dir=os.path.dirname(artifact))
+        try:
+            model = YOLO(shutil.copy(self.weights, tmp_folder))
+            if self.backend == ONNX:
+                exported = model.export(format=ONNX, imgsz=self.imgsz, dynamic=True)
+            else:
+                exported = model.export(format=OPENVINO, imgsz=self.imgsz, dynamic=True,
+                                        int8=self.int8, data=DATA_YAML)
+            try:
+                os.rename(exported, artifact)
+            except OSError:
+                # Another process finished the same export first
+                if not os.path.exists(artifact):
+                    raise
+        finally:
+            shutil.rmtree(tmp_folder, ignore_errors=True)
+        return artifact
+
+    def load(self):
+        """
+        Load the model on the selected backend and warm it up so the first frame is not slow
+        Returns:
+            ultralytics.YOLO: The loaded model
+        """
+        # ultralytics pulls in torch, so it is only imported once a model is needed
+        from ultralytics import YOLO
+        if self.backend == TORCH:
+            model = YOLO(self.weights)
+        else:
+            model = YOLO(self.export(), task=self.task)
+        model(np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8), imgsz=self.imgsz, verbose=False)
+        return model
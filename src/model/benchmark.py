@@ -0,0 +1,321 @@
+import json
+import os
+import platform
+import shutil
+import statistics
+import tempfile
+import time
+from PIL import Image, ImageEnhance
+import numpy as np
+import cv2
+from src.common.configs import DATA_FOLDER
+from src.common.constans import IMAGES, LABELS, READ, TEST, TXT, WRITE
+from src.model.box_ops import parse_yolo_lines
+from src.model.data_augment import DataAugment
+from src.model.data_collector import DataCollectorAndDivider
+from src.model.dedup import HashIndex, connected_components, hamming
+from src.model.get_path import FilePathCollector
+from src.model.label_index import LabelIndex
+from src.model.photometric import NoiseBank, adjust_brightness, adjust_contrast
+from src.model.resize_bboxes import AdjustBoundingBoxes
+
+
+class Benchmark:
+    def __init__(self, data_folder: str = DATA_FOLDER, split: str = TEST, repeats: int = 3,
+                 limit: int = None, video_frames: int = 150, detection_model: str = "yolov8n.yaml") -> None:
+        """
+        Initialize the Benchmark, timing the pipeline stages on the bundled dataset
+        Args:
+            data_folder (str): The dataset folder (default is DATA_FOLDER)
+            split (str): The split whose images and labels are used (default is "test")
+            repeats (int): Every stage runs this many times and the median is kept (default is 3)
+            limit (int): Use only the first images of the split (default is None)
+            video_frames (int): The number of frames of the generated video (default is 150)
+            detection_model (str): A local model file or ultralytics yaml, the default builds an
+                untrained YOLOv8n without downloading anything (default is "yolov8n.yaml")
+        """
+        self.split = split
+        self.image_folder = os.path.join(data_folder, split, IMAGES)
+        self.label_folder = os.path.join(data_folder, split, LABELS)
+        self.repeats = repeats
+        self.limit = limit
+        self.video_frames = video_frames
+        self.detection_model = detection_model
+        self.results = {}
+
+    def measure(self, name: str, items: int, function, *args) -> None:
+        """
+        Time a function and store the median of the repeats
+        Args:
+            name (str): The name of the measurement
+            items (int): The number of items processed by one call
+            function (function): The function to time
+            *args: Arguments to pass to the function
+        """
+        timings = []
+        for _ in range(self.repeats):
+            start = time.perf_counter()
+            function(*args)
+            timings.append(time.perf_counter() - start)
+        seconds = statistics.median(timings)
+        self.results[name] = {"seconds": seconds, "items": items,
+                              "per_second": items / seconds if seconds else None}
+
+    def prepare_images(self, work_folder: str) -> str:
+        """
+        Copy the benchmark images and their labels into work_folder/dataset/<split>/images and
+        labels, so every benchmark sees the same limited dataset
+        Args:
+            work_folder (str): The temporary folder
+        Returns:
+            str: The folder with the copied images
+        """
+        folder = os.path.join(work_folder, "dataset", self.split, IMAGES)
+        label_folder = os.path.join(work_folder, "dataset", self.split, LABELS)
+        os.makedirs(folder)
+        os.makedirs(label_folder)
+        for filename in sorted(os.listdir(self.image_folder))[:self.limit]:
+            shutil.copy(os.path.join(self.image_folder, filename), folder)
+            label_path = os.path.join(self.label_folder, os.path.splitext(filename)[0] + TXT)
+            if os.path.exists(label_path):
+                shutil.copy(label_path, label_folder)
+        return folder
+
+    def make_video(self, path: str, width: int = 640, height: int = 360, fps: int = 30) -> None:
+        """
+        Generate a synthetic video with a moving sign shaped blob
+        Args:
+            path (str): The path to the video file
+            width (int): The frame width (default is 640)
+            height (int): The frame height (default is 360)
+            fps (int): The frame rate (default is 30)
+        """
+        rng = np.random.default_rng(0)
+        background = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+        for i in range(self.video_frames):
+            frame = background.copy()
+            center = (int(40 + i * (width - 80) / self.video_frames), height // 3)
+            cv2.circle(frame, center, 24, (0, 0, 255), -1)
+            cv2.circle(frame, center, 16, (255, 255, 255), -1)
+            writer.write(frame)
+        writer.release()
+
+    def bench_augment(self, work_folder: str, source: str) -> None:
+        """
+        Time every DataAugment operation and the decode-once fan-out
+        Args:
+            work_folder (str): The temporary folder
+            source (str): The folder with the benchmark images
+        """
+        images = len(os.listdir(source))
+        augment = DataAugment(source, os.path.join(work_folder, "resize"))
+        self.measure("augment.resize", images, augment.process_images, augment.resize)
+
+        resized = DataAugment(augment.output_folder, os.path.join(work_folder, "augmented"))
+        operations = {
+            "add_blur": (resized.add_blur, ()),
+            "add_noise": (resized.add_noise, ()),
+            "change_contrast": (resized.change_contrast, (2.0,)),
+            "modified_color": (resized.modified_color, (0.5,)),
+            "rotate": (resized.rotate, (15,)),
+        }
+        for name, (operation, args) in operations.items():
+            self.measure(f"augment.{name}", images, resized.process_images, operation, *args)
+
+        variants = {os.path.join(work_folder, name): operation
+                    for name, operation in operations.items()}
+        self.measure("augment.process_variants", images, augment.process_variants, variants)
+
+    def bench_decode(self, source: str) -> None:
+        """
+        Time the plain resize against the reduced resolution decode fast paths
+        Args:
+            source (str): The folder with the benchmark images
+        """
+        paths = [os.path.join(source, filename) for filename in sorted(os.listdir(source))]
+        augment = DataAugment(source, source)
+        self.measure("decode.resize", len(paths), lambda: [augment.resize(path) for path in paths])
+        self.measure("decode.resize_fast", len(paths), lambda: [augment.resize_fast(path) for path in paths])
+        self.measure("decode.load", len(paths), lambda: [Image.open(path).load() for path in paths])
+        self.measure("decode.load_reduced", len(paths),
+                     lambda: [augment.load_reduced(path, 320, 320).load() for path in paths])
+
+    def bench_photometric(self, source: str) -> None:
+        """
+        Time the PIL photometric operations against the LUT kernels and the noise bank
+        Args:
+            source (str): The folder with the benchmark images
+        """
+        images = np.stack([np.asarray(Image.open(os.path.join(source, filename)).convert('RGB').resize((640, 640)))
+                           for filename in sorted(os.listdir(source))])
+        pil_images = [Image.fromarray(image) for image in images]
+        rng = np.random.default_rng(0)
+        bank = NoiseBank()
+        self.measure("photometric.brightness_pil", len(images),
+                     lambda: [ImageEnhance.Brightness(img).enhance(0.5) for img in pil_images])
+        self.measure("photometric.brightness_lut", len(images), adjust_brightness, images, 0.5)
+        self.measure("photometric.contrast_pil", len(images),
+                     lambda: [ImageEnhance.Contrast(img).enhance(2.0) for img in pil_images])
+        self.measure("photometric.contrast_lut", len(images), adjust_contrast, images, 2.0)
+        self.measure("photometric.noise_normal", len(images),
+                     lambda: [np.clip(image + rng.normal(0, 25, image.shape), 0, 255).astype(np.uint8)
+                              for image in images])
+        self.measure("photometric.noise_bank", len(images), bank.add, images)
+
+    def bench_labels(self, work_folder: str, source: str) -> None:
+        """
+        Time the label listing, the bounding box adjustment and the label index against parsing
+        every label file
+        Args:
+            work_folder (str): The temporary folder
+            source (str): The folder with the benchmark images
+        """
+        dataset_folder = os.path.dirname(os.path.dirname(source))
+        label_folder = os.path.join(os.path.dirname(source), LABELS)
+        collector = FilePathCollector(source, label_folder)
+        files = len(os.listdir(label_folder))
+        self.measure("paths.get_img_path", len(os.listdir(source)), collector.get_img_path)
+        self.measure("paths.get_annotation_path", files, collector.get_annotation_path)
+
+        adjust = AdjustBoundingBoxes(os.path.join(work_folder, "labels"),
+                                     collector.get_annotation_path(), 1280, 720)
+        self.measure("labels.write_new_bboxes", files, adjust.write_new_bboxes_to_annotations_file)
+
+        def parse_class_counts():
+            boxes = [np.zeros((0, 5))]
+            for filename in os.listdir(label_folder):
+                with open(os.path.join(label_folder, filename), READ) as file:
+                    boxes.append(parse_yolo_lines(file.read()))
+            return np.bincount(np.concatenate(boxes)[:, 0].astype(np.int64), minlength=13)
+
+        index_folder = os.path.join(work_folder, "label_index")
+
+        def build_index():
+            shutil.rmtree(index_folder, ignore_errors=True)
+            LabelIndex(index_folder, dataset_folder).update()
+
+        self.measure("labels.parse_class_counts", files, parse_class_counts)
+        self.measure("labels.index_build", files, build_index)
+        self.measure("labels.index_class_counts", files, LabelIndex(index_folder, dataset_folder).class_counts)
+
+    def bench_dedup(self, work_folder: str, source: str) -> None:
+        """
+        Time the near duplicate index against comparing every pair of hashes
+        Args:
+            work_folder (str): The temporary folder
+            source (str): The folder with the benchmark images
+        """
+        index_folder = os.path.join(work_folder, "hashes")
+
+        def build_index():
+            shutil.rmtree(index_folder, ignore_errors=True)
+            HashIndex(index_folder, source).update()
+
+        index = HashIndex(index_folder, source)
+        self.measure("dedup.hash_index_build", len(os.listdir(source)), build_index)
+        index.update()
+        hashes = index.hashes
+
+        def all_pairs():
+            first, second = np.nonzero(np.triu(hamming(hashes[:, None], hashes[None, :]) <= 4, 1))
+            return connected_components(len(hashes), first, second)
+
+        self.measure("dedup.all_pairs_clusters", len(hashes), all_pairs)
+        self.measure("dedup.multi_index_clusters", len(hashes), index.clusters)
+
+    def bench_collector(self, work_folder: str) -> str:
+        """
+        Time frame extraction and dataset splitting on a generated video
+        Args:
+            work_folder (str): The temporary folder
+        Returns:
+            str: The path to the generated video
+        """
+        video = os.path.join(work_folder, "video.mp4")
+        self.make_video(video)
+        frames = os.path.join(work_folder, "frames")
+        collector = DataCollectorAndDivider(video, frames, os.path.join(work_folder, "divided"))
+        self.measure("collector.extract_frame", self.video_frames, collector.extract_frame)
+        self.measure("collector.extract_frames_fast", self.video_frames, collector.extract_frames_fast)
+        self.measure("collector.split_dataset", self.video_frames, collector.split_dataset)
+        self.measure("collector.split_dataset_linked", self.video_frames, collector.split_dataset_linked)
+        return video
+
+    def bench_detection(self, work_folder: str, video: str) -> None:
+        """
+        Time headless detection on the generated video, skipped when ultralytics is missing
+        Args:
+            work_folder (str): The temporary folder
+            video (str): The path to the generated video
+        """
+        try:
+            from src.model.yolo_detection import Detection
+            detection = Detection(self.detection_model, video)
+            model = detection.load()
+        except ImportError as error:
+            self.results["detection.detect_headless"] = {"skipped": repr(error)}
+            return
+        # The model is loaded once, the timing only covers the video
+        self.measure("detection.detect_headless", self.video_frames,
+                     lambda: detection.detect_headless(os.path.join(work_folder, "detections.jsonl"), model=model))
+
+    def run(self) -> dict:
+        """
+        Run every benchmark in a temporary folder
+        Returns:
+            dict: The machine description and the measurements
+        """
+        work_folder = tempfile.mkdtemp(prefix="benchmark_")
+        try:
+            source = self.prepare_images(work_folder)
+            self.bench_augment(work_folder, source)
+            self.bench_decode(source)
+            self.bench_photometric(source)
+            self.bench_labels(work_folder, source)
+            self.bench_dedup(work_folder, source)
+            video = self.bench_collector(work_folder)
+            self.bench_detection(work_folder, video)
+        finally:
+            shutil.rmtree(work_folder, ignore_errors=True)
+
+        return {
+            "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                        "processor": platform.processor(), "cpu_count": os.cpu_count()},
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "repeats": self.repeats,
+            "results": self.results,
+        }
+
+    def save(self, report: dict, output_path: str) -> None:
+        """
+        Save a benchmark report as JSON
+        Args:
+            report (dict): The report returned by run
+            output_path (str): The path to the JSON file
+        """
+        with open(output_path, WRITE) as file:
+            json.dump(report, file, indent=2)
+
+    def compare(self, report: dict, baseline_path: str, tolerance: float = 0.1) -> list:
+        """
+        Compare a report against a stored baseline, measurements the baseline skipped or timed at
+        zero seconds are not compared
+        Args:
+            report (dict): The report returned by run
+            baseline_path (str): The path to the baseline JSON file
+            tolerance (float): The allowed slowdown as a fraction of the baseline time (default is 0.1)
+        Returns:
+            list: The (name, baseline seconds, current seconds, ratio) of every regression
+        """
+        with open(baseline_path, READ) as file:
+            baseline = json.load(file)["results"]
+
+        regressions = []
+        for name, current in report["results"].items():
+            if "seconds" not in current or not baseline.get(name, {}).get("seconds"):
+                continue
+            ratio = current["seconds"] / baseline[name]["seconds"]
+            if ratio > 1 + tolerance:
+                regressions.append((name, baseline[name]["seconds"], current["seconds"], ratio))
+        return regressions
@@ -0,0 +1,127 @@
+import numpy as np
+
+
+def yolo_to_xyxy(boxes: np.ndarray, image_width: float, image_height: float) -> np.ndarray:
+    """
+    Convert normalized YOLO boxes to pixel corners
+    Args:
+        boxes (np.ndarray): (N, 4) array of [center_x, center_y, width, height] in 0-1
+        image_width (float): The width of the image
+        image_height (float): The height of the image
+    Returns:
+        np.ndarray: (N, 4) array of [top_left_x, top_left_y, bottom_right_x, bottom_right_y]
+    """
+    center_x = boxes[:, 0] * image_width
+    center_y = boxes[:, 1] * image_height
+    box_width = boxes[:, 2] * image_width
+    box_height = boxes[:, 3] * image_height
+    return np.stack([center_x - box_width / 2, center_y - box_height / 2,
+                     center_x + box_width / 2, center_y + box_height / 2], axis=1)
+
+
+def xyxy_to_yolo(boxes: np.ndarray, image_width: float, image_height: float) -> np.ndarray:
+    """
+    Convert pixel corners to normalized YOLO boxes
+    Args:
+        boxes (np.ndarray): (N, 4) array of [top_left_x, top_left_y, bottom_right_x, bottom_right_y]
+        image_width (float): The width of the image
+        image_height (float): The height of the image
+    Returns:
+        np.ndarray: (N, 4) array of [center_x, center_y, width, height] in 0-1
+    """
+    box_width = boxes[:, 2] - boxes[:, 0]
+    box_height = boxes[:, 3] - boxes[:, 1]
+    center_x = boxes[:, 0] + box_width / 2
+    center_y = boxes[:, 1] + box_height / 2
+    return np.stack([center_x / image_width, center_y / image_height,
+                     box_width / image_width, box_height / image_height], axis=1)
+
+
+def parse_yolo_lines(text: str) -> np.ndarray:
+    """
+    Parse the content of YOLO annotation files into one array
+    Args:
+        text (str): Lines of "label center_x center_y width height"
+    Returns:
+        np.ndarray: (N, 5) array of [label, center_x, center_y, width, height]
+    """
+    return np.array(text.split(), dtype=np.float64).reshape(-1, 5)
+
+
+def format_yolo_lines(boxes: np.ndarray) -> str:
+    """
+    Format boxes as the content of a YOLO annotation file
+    Args:
+        boxes (np.ndarray): (N, 5) array of [label, center_x, center_y, width, height]
+    Returns:
+        str: One "label center_x center_y width height" line per box
+    """
+    return "".join(f"{int(label)} {center_x} {center_y} {box_width} {box_height}\n"
+                   for label, center_x, center_y, box_width, box_height in boxes.tolist())
+
+
+def box_iou(boxes1: np.ndarray, boxes2: np.ndarray) -> np.ndarray:
+    """
+    Compute the IoU of every pair of boxes
+    Args:
+        boxes1 (np.ndarray): (N, 4) boxes [x1, y1, x2, y2]
+        boxes2 (np.ndarray): (M, 4) boxes [x1, y1, x2, y2]
+    Returns:
+        np.ndarray: (N, M) IoU matrix
+    """
+    area1 = (boxes1[:, 2] - boxes1[:, 0]) * (boxes1[:, 3] - boxes1[:, 1])
+    area2 = (boxes2[:, 2] - boxes2[:, 0]) * (boxes2[:, 3] - boxes2[:, 1])
+    top_left = np.maximum(boxes1[:, None, :2], boxes2[None, :, :2])
+    bottom_right = np.minimum(boxes1[:, None, 2:], boxes2[None, :, 2:])
+    inter = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    return inter / np.maximum(area1[:, None] + area2[None, :] - inter, 1e-9)
+
+
+def box_ios(boxes1: np.ndarray, boxes2: np.ndarray) -> np.ndarray:
+    """
+    Compute the intersection over the smaller area of every pair of boxes, close to 1 when one
+    box is a piece of the other, where the IoU of a box cut by a tile border stays low
+    Args:
+        boxes1 (np.ndarray): (N, 4) boxes [x1, y1, x2, y2]
+        boxes2 (np.ndarray): (M, 4) boxes [x1, y1, x2, y2]
+    Returns:
+        np.ndarray: (N, M) intersection over smaller matrix
+    """
+    area1 = (boxes1[:, 2] - boxes1[:, 0]) * (boxes1[:, 3] - boxes1[:, 1])
+    area2 = (boxes2[:, 2] - boxes2[:, 0]) * (boxes2[:, 3] - boxes2[:, 1])
+    top_left = np.maximum(boxes1[:, None, :2], boxes2[None, :, :2])
+    bottom_right = np.minimum(boxes1[:, None, 2:], boxes2[None, :, 2:])
+    inter = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    return inter / np.maximum(np.minimum(area1[:, None], area2[None, :]), 1e-9)
+
+
+def nmm(boxes: np.ndarray, scores: np.ndarray, class_ids: np.ndarray, ios_threshold: float) -> tuple:
+    """
+    Class-aware greedy non maximum merging: instead of dropping the boxes overlapping a better box
+    of the same class, the better box grows to cover them, so the pieces of a box cut by tile
+    borders merge back into the whole box
+    Args:
+        boxes (np.ndarray): (N, 4) boxes [x1, y1, x2, y2]
+        scores (np.ndarray): (N,) confidence per box
+        class_ids (np.ndarray): (N,) class id per box
+        ios_threshold (float): Boxes whose intersection over the smaller box with a better box of the
+            same class is above this are merged into it
+    Returns:
+        tuple: The indices of the kept boxes, best first, and their (K, 4) merged boxes
+    """
+    order = np.argsort(-scores, kind="stable")
+    ordered = boxes[order].astype(float)
+    same_class = class_ids[order][:, None] == class_ids[order][None, :]
+    keep = np.ones(len(order), dtype=bool)
+    merged = ordered.copy()
+    for i in range(len(order)):
+        # The grown box is matched again until it stops growing, so every piece of a cut box joins
+        while keep[i]:
+            candidates = np.flatnonzero(keep[i + 1:] & same_class[i, i + 1:]) + i + 1
+            group = candidates[box_ios(merged[i:i + 1], ordered[candidates])[0] > ios_threshold]
+            if len(group) == 0:
+                break
+            keep[group] = False
+            merged[i, :2] = np.minimum(merged[i, :2], ordered[group, :2].min(axis=0))
+            merged[i, 2:] = np.maximum(merged[i, 2:], ordered[group, 2:].max(axis=0))
+    return order[keep], merged[keep]
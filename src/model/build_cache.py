@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+from src.common.constans import READ, WRITE
+
+
+class BuildCache:
+    def __init__(self, manifest_path: str) -> None:
+        """
+        Initialize the BuildCache, an on-disk manifest mapping every generated file to the hash
+        of its input file content and of the operations with their parameters that produced it.
+        An output whose recorded hash matches is up to date and does not need to be generated again
+        Args:
+            manifest_path (str): The JSON manifest file
+        """
+        self.manifest_path = manifest_path
+        self.inputs = {}
+        self.outputs = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, READ) as file:
+                manifest = json.load(file)
+            self.inputs = manifest["inputs"]
+            self.outputs = manifest["outputs"]
+
+    def input_hash(self, path: str) -> str:
+        """
+        Hash the content of an input file, files whose mtime and size did not change are not read again
+        Args:
+            path (str): The input file
+        Returns:
+            str: The SHA-1 hex digest of the content
+        """
+        stat = os.stat(path)
+        known = self.inputs.get(path)
+        if known and known[0] == stat.st_mtime_ns and known[1] == stat.st_size:
+            return known[2]
+
+        digest = hashlib.sha1()
+        with open(path, "rb") as file:
+            for block in iter(lambda: file.read(1 << 20), b""):
+                digest.update(block)
+        self.inputs[path] = [stat.st_mtime_ns, stat.st_size, digest.hexdigest()]
+        return digest.hexdigest()
+
+    def key(self, path: str, *steps) -> str:
+        """
+        Build the key of an output from its input file and the operations applied to it
+        Args:
+            path (str): The input file
+            *steps: (operation name, parameters) pairs in the order they are applied
+        Returns:
+            str: The SHA-1 hex digest identifying the output
+        """
+        return hashlib.sha1(f"{self.input_hash(path)}:{steps!r}".encode()).hexdigest()
+
+    def is_fresh(self, output_path: str, key: str) -> bool:
+        """
+        Check if an output exists and was built from the same input and operations
+        Args:
+            output_path (str): The generated file
+            key (str): The key of the output
+        Returns:
+            bool: True when the output does not need to be generated again
+        """
+        return self.outputs.get(output_path) == key and os.path.exists(output_path)
+
+    def record(self, output_path: str, key: str) -> None:
+        """
+        Record a generated output
+        Args:
+            output_path (str): The generated file
+            key (str): The key of the output
+        """
+        self.outputs[output_path] = key
+
+    def prune(self, folders: list, expected: set) -> int:
+        """
+        Delete the recorded outputs of the folders which are no longer produced, e.g. because
+        their input file was removed. Files the manifest never recorded are left alone
+        Args:
+            folders (list): The output folders of the run
+            expected (set): The output paths of the run
+        Returns:
+            int: The number of deleted files
+        """
+        folders = {os.path.normpath(folder) for folder in folders}
+        removed = 0
+        for output_path in list(self.outputs):
+            if output_path in expected or os.path.normpath(os.path.dirname(output_path)) not in folders:
+                continue
+            if os.path.exists(output_path):
+                os.remove(output_path)
+                removed += 1
+            del self.outputs[output_path]
+        return removed
+
+    def save(self) -> None:
+        """
+        Write the manifest to a temporary file first and then swap it in
+        """
+        folder = os.path.dirname(self.manifest_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, WRITE) as file:
+            json.dump({"inputs": self.inputs, "outputs": self.outputs}, file)
+        os.replace(tmp_path, self.manifest_path)
@@ -0,0 +1,73 @@
+import numpy as np
+from src.model.crop_extractor import crop_boxes, folder_class_ids
+from src.model.metrics import Metrics
+
+
+class Cascade:
+    def __init__(self, localizer, classifier, crop_size: int = 64, padding: float = 0.1,
+                 batch_size: int = 64, metrics: Metrics = None, imgsz: int = 640) -> None:
+        """
+        Initialize the Cascade, a class-agnostic sign localizer run on the full frames followed by
+        a small classifier run on batches of the crops of the localized signs, so most pixels only
+        see the cheap localizer
+        Args:
+            localizer (ultralytics.YOLO): The loaded single class detection model
+            classifier (ultralytics.YOLO): The loaded classification model, trained on the
+                CropExtractor dataset
+            crop_size (int): The width and height of the crops, the classifier input size (default is 64)
+            padding (float): Context added on every side as a fraction of the box size (default is 0.1)
+            batch_size (int): The maximum number of crops per classifier call (default is 64)
+            metrics (Metrics): Collects the localize, crop and classify latency (default is None)
+            imgsz (int): The inference input size of the localizer (default is 640)
+        """
+        self.localizer = localizer
+        self.classifier = classifier
+        self.crop_size = crop_size
+        self.padding = padding
+        self.batch_size = batch_size
+        self.metrics = metrics or Metrics()
+        self.imgsz = imgsz
+        self.class_ids = folder_class_ids(classifier.names)
+
+    def classify(self, crops: np.ndarray) -> tuple:
+        """
+        Classify crops in batches
+        Args:
+            crops (np.ndarray): (N, size, size, 3) BGR crops
+        Returns:
+            tuple: (N,) class ids and (N,) class probabilities
+        """
+        probabilities = [np.zeros((0, len(self.class_ids)), dtype=np.float32)]
+        for start in range(0, len(crops), self.batch_size):
+            results = self.classifier(list(crops[start:start + self.batch_size]), imgsz=self.crop_size,
+                                      verbose=False)
+            probabilities.append(np.stack([result.probs.data.cpu().numpy() for result in results]))
+        probabilities = np.concatenate(probabilities)
+        best = probabilities.argmax(axis=1)
+        return self.class_ids[best], probabilities[np.arange(len(best)), best]
+
+    def predict(self, frames: list, extract_detections) -> list:
+        """
+        Localize the signs of a batch of frames and classify all their crops together
+        Args:
+            frames (list): The BGR frames
+            extract_detections (function): Converts a result to (boxes, confidences, class ids)
+        Returns:
+            list: (N, 4) boxes [x1, y1, x2, y2] in pixels, (N,) confidences and (N,) class ids per frame,
+                the confidence is the localizer confidence times the class probability
+        """
+        with self.metrics.stage("localize"):
+            results = self.localizer(frames, imgsz=self.imgsz, verbose=False)
+            localized = [extract_detections(result)[:2] for result in results]
+        with self.metrics.stage("crop"):
+            crops = np.concatenate([crop_boxes(frame, boxes, self.crop_size, self.padding)
+                                    for frame, (boxes, _) in zip(frames, localized)])
+        with self.metrics.stage("classify"):
+            class_ids, probabilities = self.classify(crops)
+
+        detections = []
+        ends = np.cumsum([len(boxes) for boxes, _ in localized])
+        for (boxes, confidences), end in zip(localized, ends):
+            start = end - len(boxes)
+            detections.append((boxes, confidences * probabilities[start:end], class_ids[start:end]))
+        return detections
@@ -0,0 +1,195 @@
+import os
+import shutil
+import numpy as np
+import cv2
+import yaml
+from src.model.box_ops import format_yolo_lines, parse_yolo_lines, yolo_to_xyxy
+from src.model.data_collector import hard_link
+from src.model.image_writer import ImageWriterPool
+from src.common.configs import *
+from src.common.constans import *
+
+# ultralytics classification datasets name the validation folder "val"
+CLASSIFY_SPLITS = {TRAIN: TRAIN, VALID: "val", TEST: TEST}
+SIGN = "sign"
+
+
+def crop_boxes(image: np.ndarray, boxes: np.ndarray, size: int = 64, padding: float = 0.1) -> np.ndarray:
+    """
+    Cut the boxes out of an image and resize them to size x size at once, every crop is sampled
+    bilinearly from one grid of pixel indices so there is no Python loop over the boxes
+    Args:
+        image (np.ndarray): The (H, W, 3) image
+        boxes (np.ndarray): (N, 4) boxes [x1, y1, x2, y2] in pixels
+        size (int): The width and height of the crops (default is 64)
+        padding (float): Context added on every side as a fraction of the box size (default is 0.1)
+    Returns:
+        np.ndarray: (N, size, size, 3) crops, pixels outside the image repeat the border
+    """
+    height, width = image.shape[:2]
+    if len(boxes) == 0:
+        return np.zeros((0, size, size, image.shape[2]), dtype=image.dtype)
+    boxes = np.asarray(boxes, dtype=np.float32)
+    margin = (boxes[:, 2:] - boxes[:, :2]) * padding
+    top_left = boxes[:, :2] - margin
+    extent = boxes[:, 2:] + margin - top_left
+
+    # The centers of the output pixels in image coordinates, (N, size) per axis
+    steps = (np.arange(size, dtype=np.float32) + 0.5) / size
+    xs = np.clip(top_left[:, :1] + steps * extent[:, :1] - 0.5, 0, width - 1)
+    ys = np.clip(top_left[:, 1:] + steps * extent[:, 1:] - 0.5, 0, height - 1)
+    x0 = xs.astype(np.intp)
+    y0 = ys.astype(np.intp)
+    x1 = np.minimum(x0 + 1, width - 1)
+    y1 = np.minimum(y0 + 1, height - 1)
+    wx = (xs - x0)[:, None, :, None]
+    wy = (ys - y0)[:, :, None, None]
+
+    rows0, rows1 = y0[:, :, None], y1[:, :, None]
+    cols0, cols1 = x0[:, None, :], x1[:, None, :]
+    top = image[rows0, cols0] * (1 - wx) + image[rows0, cols1] * wx
+    bottom = image[rows1, cols0] * (1 - wx) + image[rows1, cols1] * wx
+    return np.rint(top * (1 - wy) + bottom * wy).astype(image.dtype)
+
+
+def class_folder(class_id: int) -> str:
+    """
+    Get the folder name of a class in the classifier dataset. Class names contain "/", and
+    ultralytics numbers the classes by sorted folder name, so the folders are zero padded ids
+    Args:
+        class_id (int): The class
+    Returns:
+        str: The folder name
+    """
+    return f"{class_id:02d}"
+
+
+def folder_class_ids(names: dict) -> np.ndarray:
+    """
+    Map the classes of a classifier trained on the crops back to the classes of data.yaml
+    Args:
+        names (dict): The class names of the classifier, e.g. model.names
+    Returns:
+        np.ndarray: The data.yaml class of every classifier class
+    """
+    return np.array([int(names[i]) for i in range(len(names))], dtype=int)
+
+
+class CropExtractor:
+    def __init__(self, data_folder: str = DATA_FOLDER, data_yaml: str = DATA_YAML, size: int = 64,
+                 padding: float = 0.1) -> None:
+        """
+        Initialize the CropExtractor, building the datasets of the two stage cascade from the YOLO
+        labels: the crops of every box for the classifier and the class-agnostic labels for the
+        sign localizer
+        Args:
+            data_folder (str): The dataset with <split>/images and <split>/labels (default is DATA_FOLDER)
+            data_yaml (str): The data.yaml with the class names (default is DATA_YAML)
+            size (int): The width and height of the crops (default is 64)
+            padding (float): Context added on every side as a fraction of the box size (default is 0.1)
+        """
+        self.data_folder = data_folder
+        self.size = size
+        self.padding = padding
+        with open(data_yaml, READ, encoding="utf-8") as file:
+            self.class_names = yaml.safe_load(file)["names"]
+
+    def samples(self, split: str, unlabelled: bool = False):
+        """
+        Iterate over the labelled images of a split
+        Args:
+            split (str): The split
+            unlabelled (bool): Also yield the images without a label file, with no boxes (default is False)
+        Yields:
+            tuple: The image file name and the (N, 5) array of [label, center_x, center_y, width, height]
+        """
+        image_folder = os.path.join(self.data_folder, split, IMAGES)
+        label_folder = os.path.join(self.data_folder, split, LABELS)
+        for img_file in sorted(os.listdir(image_folder)):
+            if not (img_file.endswith(JPG) or img_file.endswith(PNG)):
+                continue
+            label_path = os.path.join(label_folder, os.path.splitext(img_file)[0] + TXT)
+            if not os.path.exists(label_path):
+                if unlabelled:
+                    yield img_file, np.zeros((0, 5))
+                continue
+            with open(label_path, READ) as file:
+                yield img_file, parse_yolo_lines(file.read())
+
+    def extract(self, output_folder: str, splits: list = None, workers: int = 4) -> tuple:
+        """
+        Write the crop of every box to output_folder/<split>/<class>/, the layout of ultralytics
+        classification datasets. The folders of a split are emptied first
+        Args:
+            output_folder (str): The folder of the classifier dataset
+            splits (list): The splits to crop (default is None, train, valid and test)
+            workers (int): The number of writer threads (default is 4)
+        Returns:
+            tuple: Mapping of split name -> number of crops per class, and the (path, error) pairs
+                of images that could not be read and crops that could not be written
+        """
+        counts = {}
+        failures = []
+        for split in splits or [TRAIN, VALID, TEST]:
+            split_folder = os.path.join(output_folder, CLASSIFY_SPLITS[split])
+            shutil.rmtree(split_folder, ignore_errors=True)
+            for class_id in range(len(self.class_names)):
+                os.makedirs(os.path.join(split_folder, class_folder(class_id)))
+
+            counts[split] = np.zeros(len(self.class_names), dtype=int)
+            with ImageWriterPool(workers) as writer:
+                for img_file, boxes in self.samples(split):
+                    if len(boxes) == 0:
+                        continue
+                    image_path = os.path.join(self.data_folder, split, IMAGES, img_file)
+                    image = cv2.imread(image_path)
+                    if image is None:
+                        failures.append((image_path, "cv2.imread returned None"))
+                        continue
+                    height, width = image.shape[:2]
+                    crops = crop_boxes(image, yolo_to_xyxy(boxes[:, 1:], width, height), self.size, self.padding)
+                    stem = os.path.splitext(img_file)[0]
+                    for i, (label, crop) in enumerate(zip(boxes[:, 0].astype(int), crops)):
+                        writer.submit(os.path.join(split_folder, class_folder(label), f"{stem}_{i}{JPG}"), crop)
+                    counts[split] += np.bincount(boxes[:, 0].astype(int), minlength=len(self.class_names))
+
+            failures.extend(writer.failures)
+            counts[split] = counts[split].tolist()
+        return counts, failures
+
+    def agnostic_labels(self, output_folder: str, splits: list = None, mode: str = HARDLINK) -> int:
+        """
+        Build the dataset of the sign localizer: every label is rewritten to the single class
+        "sign" into output_folder/<split>/labels and the images are linked into
+        output_folder/<split>/images, with a data.yaml pointing to them. Images without a label
+        file get an empty one and stay in the dataset as background
+        Args:
+            output_folder (str): The folder of the localizer dataset
+            splits (list): The splits to convert (default is None, train, valid and test)
+            mode (str): "hardlink" or "symlink", hard links fall back to symlinks across file systems
+                (default is "hardlink")
+        Returns:
+            int: The number of written label files
+        """
+        link = hard_link if mode == HARDLINK else os.symlink
+        splits = splits or [TRAIN, VALID, TEST]
+        converted = 0
+        for split in splits:
+            for folder in [IMAGES, LABELS]:
+                # Converting again replaces the previous files
+                shutil.rmtree(os.path.join(output_folder, split, folder), ignore_errors=True)
+                os.makedirs(os.path.join(output_folder, split, folder))
+            for img_file, boxes in self.samples(split, unlabelled=True):
+                boxes[:, 0] = 0
+                label_file = os.path.splitext(img_file)[0] + TXT
+                with open(os.path.join(output_folder, split, LABELS, label_file), WRITE) as file:
+                    file.write(format_yolo_lines(boxes))
+                link(os.path.abspath(os.path.join(self.data_folder, split, IMAGES, img_file)),
+                     os.path.join(output_folder, split, IMAGES, img_file))
+                converted += 1
+
+        with open(os.path.join(output_folder, "data.yaml"), WRITE, encoding="utf-8") as file:
+            yaml.safe_dump({"path": os.path.abspath(output_folder),
+                            **{("val" if split == VALID else split): f"{split}/{IMAGES}" for split in splits},
+                            "nc": 1, "names": [SIGN]}, file, sort_keys=False)
+        return converted
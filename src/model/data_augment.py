@@ -1,72 +1,352 @@
 import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from PIL import Image, ImageEnhance, ImageFilter
 import numpy as np
 import cv2
+import time
+from src.model.build_cache import BuildCache
+from src.model.image_store import ImageStore, resize_reduced
+from src.model.metrics import Metrics
+from src.model.photometric import NoiseBank, adjust_brightness, adjust_contrast
+from src.common.constans import JPG, PNG
+
+
+def process_chunk(task, filenames: list, args: tuple) -> list:
+    """
+    Run a per-file task over a chunk of files inside a worker process
+    Args:
+        task (function): The task called as task(filename, *args)
+        filenames (list): The file names of the chunk
+        args (tuple): Additional arguments to pass to the task
+    Returns:
+        list: The (filename, error) pairs of files that failed
+    """
+    failures = []
+    for filename in filenames:
+        try:
+            task(filename, *args)
+        except Exception as error:
+            failures.append((filename, repr(error)))
+    return failures
+
+
+def letterbox_geometry(width: int, height: int, size: int) -> tuple:
+    """
+    Get where an image lands when it is letterboxed into size x size: it is resized to whole
+    pixels keeping its aspect ratio and pasted at whole pixel padding
+    Args:
+        width (int): The width of the image
+        height (int): The height of the image
+        size (int): The output size
+    Returns:
+        tuple: The (new_width, new_height) of the resized image and its (pad_x, pad_y) offset
+    """
+    scale = min(size / width, size / height)
+    new_width = max(1, round(width * scale))
+    new_height = max(1, round(height * scale))
+    return new_width, new_height, (size - new_width) // 2, (size - new_height) // 2
 
 
 class DataAugment:
-    def __init__(self, input_folder: str, output_folder: str):
+    def __init__(self, input_folder: str, output_folder: str, metrics: Metrics = None, store: ImageStore = None):
         """
         Initialize the DataAugment class with the input and output folders
         Args:
             input_folder (str): The input folder containing images
             output_folder (str): The output folder to save processed images
+            metrics (Metrics): Receives the throughput of every run as "augment" (default is None)
+            store (ImageStore): Already resized images of the input folder, used instead of decoding
+                and resizing the JPEGs again (default is None)
         """
         self.input_folder = input_folder
         self.output_folder = output_folder
+        self.metrics = metrics or Metrics()
+        self.store = store
+        self.noise_bank = NoiseBank()
+
+    def load_image(self, img) -> Image.Image:
+        """
+        Load an image from a path, or pass through an already decoded image
+        Args:
+            img (str | PIL.Image.Image | np.ndarray): The path to the image, the decoded image or
+                an RGB array such as an ImageStore slice
+        Returns:
+            PIL.Image.Image: The decoded image
+        """
+        if isinstance(img, Image.Image):
+            return img
+        if isinstance(img, np.ndarray):
+            return Image.fromarray(img)
+        return Image.open(img)
 
-    def process_images(self, operation, *arg) -> None:
+    def stored_image(self, filename: str):
+        """
+        Get the resized image of a file from the store
+        Args:
+            filename (str): The image file name in the input folder
+        Returns:
+            np.ndarray: The (640, 640, 3) RGB view, None when the store does not hold the current
+                version of the file
+        """
+        if self.store is None or self.store.size != 640:
+            return None
+        if os.path.abspath(self.store.image_folder) != os.path.abspath(self.input_folder):
+            return None
+        if not self.store.is_fresh(filename):
+            return None
+        return self.store.image(filename)
+
+    def process_images(self, operation, *arg, workers: int = 1, chunk_size: int = 16) -> list:
         """
         Process the images in the input folder with the specified operation
         Args:
             operation (function): The operation to apply on each image
             *arg: Additional arguments to pass to the operation function
+            workers (int): The number of worker processes, 1 runs in the current process (default is 1)
+            chunk_size (int): The number of images handed to a worker at a time (default is 16)
+        Returns:
+            list: The (filename, error) pairs of images that failed
         """
         if not os.path.exists(self.output_folder):
             os.makedirs(self.output_folder)
 
-        for filename in os.listdir(self.input_folder):
-            if filename.endswith('.jpg') or filename.endswith('.png'):
-                img_path = os.path.join(self.input_folder, filename)
+        return self.run_tasks(self.process_file, (operation, arg), workers, chunk_size)
 
-                # Apply the operation to the image
-                processed_img = operation(img_path, *arg)
+    def process_variants(self, variants: dict, base_operation=None,
+                         workers: int = 1, chunk_size: int = 16, cache: BuildCache = None) -> list:
+        """
+        Decode each image in the input folder once, apply the base operation in memory and
+        save the base image together with every requested variant of it in a single pass
+        Args:
+            variants (dict): Mapping of output folder -> (operation, args) applied on the base image
+            base_operation (function): The operation producing the base image (default is resize_fast)
+            workers (int): The number of worker processes, 1 runs in the current process (default is 1)
+            chunk_size (int): The number of images handed to a worker at a time (default is 16)
+            cache (BuildCache): Skips images whose outputs are up to date and deletes the outputs
+                of removed images (default is None)
+        Returns:
+            list: The (filename, error) pairs of images that failed
+        """
+        base_operation = base_operation or self.resize_fast
+        for folder in [self.output_folder, *variants]:
+            os.makedirs(folder, exist_ok=True)
+
+        if cache is None:
+            return self.run_tasks(self.process_file_variants, (variants, base_operation), workers, chunk_size)
+
+        outputs = {filename: self.variant_outputs(filename, variants, base_operation, cache)
+                   for filename in self.list_images()}
+        return self.run_cached(self.process_file_variants, (variants, base_operation), outputs,
+                               [self.output_folder, *variants], workers, chunk_size, cache)
+
+    def run_cached(self, task, args: tuple, outputs: dict, folders: list, workers: int, chunk_size: int,
+                   cache: BuildCache) -> list:
+        """
+        Run a per-file task only over the images whose outputs are not up to date, record the
+        outputs of the images that succeeded and delete the outputs of removed images
+        Args:
+            task (function): The task called as task(filename, *args)
+            args (tuple): Additional arguments to pass to the task
+            outputs (dict): Mapping of image file name -> {output path: key}
+            folders (list): The folders holding the outputs of the run
+            workers (int): The number of worker processes
+            chunk_size (int): The number of images handed to a worker at a time
+            cache (BuildCache): The build cache of the outputs
+        Returns:
+            list: Sorted (filename, error) pairs of images that failed
+        """
+        stale = [filename for filename, paths in outputs.items()
+                 if not all(cache.is_fresh(path, key) for path, key in paths.items())]
+        failures = self.run_tasks(task, args, workers, chunk_size, stale)
+
+        failed = {filename for filename, _ in failures}
+        for filename in stale:
+            if filename not in failed:
+                for path, key in outputs[filename].items():
+                    cache.record(path, key)
+        cache.prune(folders, {path for paths in outputs.values() for path in paths})
+        cache.save()
+        return failures
 
-                output_img_path = os.path.join(self.output_folder, filename)
-                processed_img.save(output_img_path)
+    def variant_outputs(self, filename: str, variants: dict, base_operation, cache: BuildCache) -> dict:
+        """
+        Get the outputs of one image with the keys identifying their content
+        Args:
+            filename (str): The image file name in the input folder
+            variants (dict): Mapping of output folder -> (operation, args) applied on the base image
+            base_operation (function): The operation producing the base image
+            cache (BuildCache): The build cache hashing the image
+        Returns:
+            dict: Mapping of output path -> key
+        """
+        img_path = os.path.join(self.input_folder, filename)
+        base_step = (base_operation.__name__, ())
+        outputs = {os.path.join(self.output_folder, filename): cache.key(img_path, base_step)}
+        for folder, (operation, args) in variants.items():
+            outputs[os.path.join(folder, filename)] = cache.key(img_path, base_step, (operation.__name__, args))
+        return outputs
+
+    def process_file(self, filename: str, operation, arg: tuple) -> None:
+        """
+        Apply an operation to one image of the input folder and save the result
+        Args:
+            filename (str): The image file name in the input folder
+            operation (function): The operation to apply on the image
+            arg (tuple): Additional arguments to pass to the operation function
+        """
+        img_path = os.path.join(self.input_folder, filename)
+
+        # Apply the operation to the image
+        processed_img = operation(img_path, *arg)
+
+        output_img_path = os.path.join(self.output_folder, filename)
+        processed_img.save(output_img_path)
+
+    def process_file_variants(self, filename: str, variants: dict, base_operation) -> None:
+        """
+        Decode one image of the input folder once and save its base image and all variants
+        Args:
+            filename (str): The image file name in the input folder
+            variants (dict): Mapping of output folder -> (operation, args) applied on the base image
+            base_operation (function): The operation producing the base image
+        """
+        img_path = os.path.join(self.input_folder, filename)
+
+        # Decode and resize the image only once, or read it from the store
+        stored = self.stored_image(filename) if base_operation == self.resize_fast else None
+        base_img = self.load_image(stored) if stored is not None else base_operation(img_path)
+        base_img.save(os.path.join(self.output_folder, filename))
+
+        # Every variant reuses the decoded base image
+        for folder, (operation, args) in variants.items():
+            processed_img = operation(base_img, *args)
+            processed_img.save(os.path.join(folder, filename))
+
+    def run_tasks(self, task, args: tuple, workers: int, chunk_size: int, filenames: list = None) -> list:
+        """
+        Run a per-file task over the input folder, serially or on a process pool
+        Args:
+            task (function): The task called as task(filename, *args)
+            args (tuple): Additional arguments to pass to the task
+            workers (int): The number of worker processes
+            chunk_size (int): The number of images handed to a worker at a time
+            filenames (list): Run only these images of the input folder (default is None, all images)
+        Returns:
+            list: Sorted (filename, error) pairs of images that failed, a failing image never stops
+                the others in either mode
+        """
+        if filenames is None:
+            filenames = self.list_images()
+        start = time.perf_counter()
+        if workers <= 1:
+            failures = process_chunk(task, filenames, args)
+        else:
+            # Output names only depend on the input names, so chunk order does not matter
+            chunks = [filenames[i:i + chunk_size]
+                      for i in range(0, len(filenames), chunk_size)]
+            failures = []
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {executor.submit(process_chunk, task, chunk, args): chunk
+                           for chunk in chunks}
+                for future in as_completed(futures):
+                    try:
+                        failures.extend(future.result())
+                    except Exception as error:
+                        # The worker itself died, mark its whole chunk as failed
+                        failures.extend((filename, repr(error))
+                                        for filename in futures[future])
+        self.metrics.throughput("augment", len(filenames), time.perf_counter() - start)
+        self.metrics.increment("augment_failures", len(failures))
+        return sorted(failures)
+
+    def list_images(self) -> list:
+        """
+        List the image files in the input folder
+        Returns:
+            list: Sorted list of image file names
+        """
+        return sorted(filename for filename in os.listdir(self.input_folder)
+                      if filename.endswith(JPG) or filename.endswith(PNG))
 
     def resize(self, img_path: str) -> Image.Image:
         """
         Resize the input image to a smaller size (640x640)
         Args:
-            img_path (str): The path to the input image
+            img_path (str | PIL.Image.Image): The path to the input image or the decoded image
         Returns:
             PIL.Image.Image: The resized image
         """
-        img = Image.open(img_path)
+        img = self.load_image(img_path)
         return img.resize((640, 640))
 
-    def add_noise(self, img_path: str) -> Image.Image:
+    def load_reduced(self, img_path, width: int, height: int) -> Image.Image:
         """
-        Add noise to the input image
+        Load an image, letting the JPEG decoder skip the resolution that would be thrown away.
+        The decoder scales by 1/2, 1/4 or 1/8 and the result stays at least width x height
         Args:
-            img_path (str): The path to the input image
+            img_path (str | PIL.Image.Image | np.ndarray): The path to the input image or the decoded image
+            width (int): The smallest width needed
+            height (int): The smallest height needed
         Returns:
-            PIL.Image.Image: The image with added noise
+            PIL.Image.Image: The decoded image, already decoded images are returned unchanged
         """
-        img = Image.open(img_path)
+        img = self.load_image(img_path)
+        # draft only applies to JPEG files which are not decoded yet
+        img.draft(None, (width, height))
+        return img
 
-        # Convert the image to numpy array
-        img_arr = np.array(img)
+    def resize_fast(self, img_path, size: int = 640) -> Image.Image:
+        """
+        Resize the input image to size x size like resize, decoding the JPEG at the smallest scale
+        still covering the output and finishing with an area filter. ImageStore builds its images
+        the same way
+        Args:
+            img_path (str | PIL.Image.Image | np.ndarray): The path to the input image or the decoded image
+            size (int): The output size (default is 640)
+        Returns:
+            PIL.Image.Image: The resized RGB image
+        """
+        return resize_reduced(self.load_image(img_path), size)
 
-        # Generate Gaussian noise
-        noise = np.random.normal(0, 25, img_arr.shape).astype(np.uint8)
+    def letterbox(self, img_path, size: int = 640, color: tuple = (114, 114, 114)) -> tuple:
+        """
+        Fit the input image into size x size while keeping its aspect ratio, decoding the JPEG at
+        the smallest scale still covering the output. A point (x, y) of the input image lands on
+        (x * scale_x + pad_x, y * scale_y + pad_y), the matrix of GeometricAugment.letterbox_matrix
+        Args:
+            img_path (str | PIL.Image.Image | np.ndarray): The path to the input image or the decoded image
+            size (int): The output size (default is 640)
+            color (tuple): The RGB color of the padding (default is (114, 114, 114))
+        Returns:
+            tuple: The letterboxed RGB image, the (scale_x, scale_y) scale and the (pad_x, pad_y)
+                padding in pixels
+        """
+        img = self.load_image(img_path)
+        width, height = img.size
+        new_width, new_height, pad_x, pad_y = letterbox_geometry(width, height, size)
+
+        img = self.load_reduced(img, new_width, new_height).convert('RGB')
+        resized = img.resize((new_width, new_height), Image.BOX)
+        canvas = Image.new('RGB', (size, size), color)
+        canvas.paste(resized, (pad_x, pad_y))
+        return canvas, (new_width / width, new_height / height), (pad_x, pad_y)
 
-        # Add the noise to the image
-        noisy_img_array = img_arr + noise
+    def add_noise(self, img_path: str, rng: np.random.Generator = None) -> Image.Image:
+        """
+        Add noise to the input image
+        Args:
+            img_path (str | PIL.Image.Image): The path to the input image or the decoded image
+            rng (np.random.Generator): The generator drawing the noise offset, for reproducible noise
+                (default is None, an offset derived from the file name or sampled pixels)
+        Returns:
+            PIL.Image.Image: The image with added noise
+        """
+        img = self.load_image(img_path)
 
-        # Ensure the noisy image array values are within the valid range (0-255)
-        noisy_img_array = np.clip(noisy_img_array, 0, 255)
+        # Add Gaussian noise (sigma 25) from the noise bank, saturating at 0 and 255
+        key = zlib.crc32(os.path.basename(img_path).encode()) if isinstance(img_path, str) else None
+        noisy_img_array = self.noise_bank.add(np.asarray(img), rng, key)
 
         # Convert the noisy image array back to an image
         return Image.fromarray(noisy_img_array)
@@ -75,23 +355,24 @@ class DataAugment:
         """
         Add blur to the input image
         Args:
-            img_path (str): The path to the input image
+            img_path (str | PIL.Image.Image): The path to the input image or the decoded image
         Returns:
             PIL.Image.Image: The image with added blur
         """
-        img = Image.open(img_path)
+        img = self.load_image(img_path)
         return img.filter(ImageFilter.GaussianBlur(radius=2))
 
     def rotate(self, img_path: str, angle: float) -> Image.Image:
         """
         Rotates an image (angle in degrees) and expands image to avoid cropping
         Args:
-            img_path (str): The path to the input image
+            img_path (str | PIL.Image.Image): The path to the input image or the decoded image
             angle (float): The angle to rotate the image
         Returns:
             PIL.Image.Image: The rotated image
         """
-        image = cv2.imread(img_path)
+        image = cv2.cvtColor(
+            np.array(self.load_image(img_path).convert('RGB')), cv2.COLOR_RGB2BGR)
         height, width = image.shape[:2]  # image shape has 3 dimensions
         # getRotationMatrix2D needs coordinates in reverse order (width, height) compared to shape
         image_center = (width / 2, height / 2)
@@ -118,22 +399,28 @@ class DataAugment:
         """
         Convert the input image to hight and low contrast
         Args:
-            img_path (str): The path to the input image
+            img_path (str | PIL.Image.Image): The path to the input image or the decoded image
             factor (float): The contrast value
         Returns:
             PIL.Image.Image: The image with high and low contrast
         """
-        img = Image.open(img_path)
-        return ImageEnhance.Contrast(img).enhance(factor)
+        img = self.load_image(img_path)
+        if img.mode not in ("RGB", "L"):
+            return ImageEnhance.Contrast(img).enhance(factor)
+        # Same result as ImageEnhance.Contrast with a lookup table
+        return Image.fromarray(adjust_contrast(np.asarray(img), factor, batch=False))
 
     def modified_color(self, img_path: str, factor: float) -> Image.Image:
         """
         Modify the color of the input image
         Args:
-            img_path (str): The path to the input image
+            img_path (str | PIL.Image.Image): The path to the input image or the decoded image
             factor (float): The color value
         Returns:
             PIL.Image.Image: The image with modified color
         """
-        img = Image.open(img_path)
-        return ImageEnhance.Brightness(img).enhance(factor)
+        img = self.load_image(img_path)
+        if img.mode not in ("RGB", "L"):
+            return ImageEnhance.Brightness(img).enhance(factor)
+        # Same result as ImageEnhance.Brightness with a lookup table
+        return Image.fromarray(adjust_brightness(np.asarray(img), factor))
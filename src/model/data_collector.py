@@ -1,13 +1,44 @@
+import errno
+import math
 import random
+from collections import Counter
 import shutil
 import os
 import cv2
+import yaml
+from src.model.dedup import HashIndex
+from src.model.image_writer import ImageWriterPool
 from src.common.configs import *
 from src.common.constans import *
-import sys
-# Replace the path with the path to the root directory of the project in your desktop
-sys.path.append(
-    r"E:\Traffic_Sign_Detection Thesis\Thesis---Traffic-Sign-Detection")
+
+
+def yolo_label_path(image_path: str) -> str:
+    """
+    Get the label path ultralytics reads for an image, the last "images" folder of the path
+    replaced by "labels" and the extension by .txt
+    Args:
+        image_path (str): The image path
+    Returns:
+        str: The label path
+    """
+    images, labels = os.sep + IMAGES + os.sep, os.sep + LABELS + os.sep
+    return os.path.splitext(labels.join(image_path.rsplit(images, 1)))[0] + TXT
+
+
+def hard_link(source: str, target: str) -> None:
+    """
+    Hard link a file, or symlink it when the file system refuses hard links, e.g. when the
+    target is on another file system than the source
+    Args:
+        source (str): The existing file
+        target (str): The link to create
+    """
+    try:
+        os.link(source, target)
+    except OSError as error:
+        if error.errno not in (errno.EXDEV, errno.EPERM):
+            raise
+        os.symlink(os.path.abspath(source), target)
 
 
 class DataCollectorAndDivider:
@@ -44,6 +75,55 @@ class DataCollectorAndDivider:
                     self.folder_frames_path, f"image_{i}.jpg")
                 cv2.imwrite(image_path, frame)
 
+    def extract_frames_fast(self, stride: int = 1, target_fps: float = None, start_time: float = 0.0,
+                            end_time: float = None, workers: int = 4, queue_size: int = 64,
+                            jpeg_quality: int = 95) -> tuple:
+        """
+        Extract every n-th frame of a time window of the video. Skipped frames are only grabbed,
+        never decoded, and the kept frames are encoded and written by background threads
+        Args:
+            stride (int): Keep one frame out of stride (default is 1)
+            target_fps (float): Keep about this many frames per second, overrides stride (default is None)
+            start_time (float): The start of the window in seconds (default is 0.0)
+            end_time (float): The end of the window in seconds, None is the end of the video (default is None)
+            workers (int): The number of writer threads (default is 4)
+            queue_size (int): The maximum number of frames waiting to be written (default is 64)
+            jpeg_quality (int): The JPEG quality of the saved frames (default is 95)
+        Returns:
+            tuple: The number of saved frames, frames keep their index in the video as file name, and
+                the (path, error) pairs of the frames that could not be written
+        """
+        os.makedirs(self.folder_frames_path, exist_ok=True)
+
+        video = cv2.VideoCapture(self.video_path)
+        fps = video.get(cv2.CAP_PROP_FPS) or 30.0
+        frame_count = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+
+        if target_fps:
+            stride = max(1, round(fps / target_fps))
+        start_frame = int(start_time * fps)
+        end_frame = frame_count if end_time is None else min(frame_count, int(end_time * fps))
+        if start_frame:
+            video.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+
+        saved = 0
+        params = [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality]
+        with ImageWriterPool(workers, queue_size, params) as writer:
+            for i in range(start_frame, end_frame):
+                # grab() only demuxes the frame, retrieve() decodes it
+                if not video.grab():
+                    break
+                if (i - start_frame) % stride:
+                    continue
+                ret, frame = video.retrieve()
+                if ret:
+                    image_path = os.path.join(
+                        self.folder_frames_path, f"image_{i}.jpg")
+                    writer.submit(image_path, frame)
+                    saved += 1
+        video.release()
+        return saved - len(writer.failures), writer.failures
+
     def split_dataset(self, train_ratio=0.7, test_ratio=0.15, valid_ratio=0.15):
         """
         Split a dataset into train, test, and validation sets
@@ -85,3 +165,175 @@ class DataCollectorAndDivider:
         for img_file in valid_images:
             shutil.copy(os.path.join(self.folder_frames_path, img_file),
                         os.path.join(self.folder_divided_path, VALID, img_file))
+
+    def read_class_names(self, data_yaml: str = DATA_YAML) -> list:
+        """
+        Read the class names from the dataset data.yaml
+        Args:
+            data_yaml (str): The path to the data.yaml file (default is DATA_YAML)
+        Returns:
+            list: The class names
+        """
+        with open(data_yaml, READ, encoding="utf-8") as file:
+            return yaml.safe_load(file)["names"]
+
+    def dominant_class(self, label_path: str) -> int:
+        """
+        Get the most frequent class of an annotation file
+        Args:
+            label_path (str): The path to the YOLO annotation file
+        Returns:
+            int: The most frequent class, -1 for a missing or empty file
+        """
+        if not os.path.exists(label_path):
+            return -1
+        with open(label_path, READ) as file:
+            labels = [int(line.split()[0]) for line in file if line.strip()]
+        return Counter(labels).most_common(1)[0][0] if labels else -1
+
+    def assign_splits(self, image_files: list, ratios: tuple, seed: int, groups: list,
+                      clusters: list = None) -> dict:
+        """
+        Split the image files with a seeded shuffle, each group is split with the same ratios
+        Args:
+            image_files (list): The image file names
+            ratios (tuple): The (train, test, valid) ratios
+            seed (int): The seed of the shuffle
+            groups (list): The group of each image file, e.g. its dominant class
+            clusters (list): The cluster of each image file, e.g. its near duplicates, a cluster
+                always lands in a single split and takes the group of its first image (default is None)
+        Returns:
+            dict: Mapping of split name -> list of image file names
+        """
+        rng = random.Random(seed)
+        if clusters is None:
+            clusters = range(len(image_files))
+        units = {}
+        for img_file, group, cluster in zip(image_files, groups, clusters):
+            units.setdefault(cluster, (group, []))[1].append(img_file)
+        members = {}
+        for group, files in units.values():
+            members.setdefault(group, []).append(files)
+
+        splits = {TRAIN: [], TEST: [], VALID: []}
+        for group in sorted(members):
+            group_units = members[group]
+            rng.shuffle(group_units)
+            total = sum(len(files) for files in group_units)
+            num_train = round(ratios[0] * total)
+            num_test = round(ratios[1] * total)
+            assigned = 0
+            for files in group_units:
+                if assigned < num_train:
+                    splits[TRAIN] += files
+                elif assigned < num_train + num_test:
+                    splits[TEST] += files
+                else:
+                    splits[VALID] += files
+                assigned += len(files)
+        return splits
+
+    def split_dataset_linked(self, label_folder: str = None, mode: str = MANIFEST, train_ratio=0.7,
+                             test_ratio=0.15, valid_ratio=0.15, seed: int = 0, stratify: bool = False,
+                             data_yaml: str = DATA_YAML, dedup_threshold: int = None,
+                             drop_duplicates: bool = False) -> dict:
+        """
+        Split a dataset into train, test, and validation sets without copying any file.
+        In manifest mode only train.txt, test.txt, valid.txt and a data.yaml pointing to them are
+        written, ultralytics then finds each label by replacing "images" with "labels" in the image
+        path. Images whose label in label_folder is not at that path are hard linked into images/
+        next to a hard link of their label in labels/, and the manifests list the links. In
+        hardlink and symlink mode the images and their labels are linked into <split>/images and
+        <split>/labels. Hard links fall back to symlinks across file systems
+        Args:
+            label_folder (str): The folder of the YOLO annotation files, required for stratify and links
+                (default is None, the labels next to the images in manifest mode)
+            mode (str): "manifest", "hardlink" or "symlink" (default is "manifest")
+            train_ratio (float): The ratio of the training set (default is 0.7)
+            test_ratio (float): The ratio of the test set (default is 0.15)
+            valid_ratio (float): The ratio of the validation set, the three ratios must sum to 1
+                (default is 0.15)
+            seed (int): The seed of the shuffle, the same seed gives the same split (default is 0)
+            stratify (bool): Split each dominant class with the same ratios (default is False)
+            data_yaml (str): The data.yaml to take the class names from (default is DATA_YAML)
+            dedup_threshold (int): Group near duplicate frames whose perceptual hashes differ by at most
+                this many bits, every group lands in a single split (default is None, no grouping)
+            drop_duplicates (bool): Keep only the first frame of every group of near duplicates
+                (default is False)
+        Returns:
+            tuple: Mapping of split name -> list of image file names, and the (path, error) pairs of
+                the images left out because they could not be read for dedup_threshold
+        """
+        if mode not in (MANIFEST, HARDLINK, SYMLINK):
+            raise ValueError(f"Unknown mode {mode}, expected one of {MANIFEST}, {HARDLINK}, {SYMLINK}")
+        if label_folder is None and (stratify or mode != MANIFEST):
+            raise ValueError("label_folder is required to stratify or to link the labels")
+        if not math.isclose(train_ratio + test_ratio + valid_ratio, 1.0, abs_tol=1e-6):
+            raise ValueError(f"The ratios {train_ratio}, {test_ratio} and {valid_ratio} do not sum to 1")
+        os.makedirs(self.folder_divided_path, exist_ok=True)
+        image_files = sorted(f for f in os.listdir(
+            self.folder_frames_path) if f.endswith(JPG) or f.endswith(PNG))
+
+        clusters = None
+        failures = []
+        if dedup_threshold is not None:
+            index = HashIndex(os.path.join(self.folder_divided_path, ".hashes"), self.folder_frames_path)
+            # Images that cannot be hashed are left out of the split
+            _, failures = index.update()
+            if drop_duplicates:
+                image_files = index.unique(dedup_threshold)
+            else:
+                image_files = index.filenames()
+                clusters = index.clusters(dedup_threshold)
+
+        def label_path(img_file):
+            return os.path.join(label_folder, os.path.splitext(img_file)[0] + TXT)
+
+        if stratify:
+            groups = [self.dominant_class(label_path(f)) for f in image_files]
+        else:
+            groups = [0] * len(image_files)
+        splits = self.assign_splits(
+            image_files, (train_ratio, test_ratio, valid_ratio), seed, groups, clusters)
+
+        if mode == MANIFEST:
+            image_paths = {f: os.path.abspath(os.path.join(self.folder_frames_path, f)) for f in image_files}
+            if label_folder:
+                for folder in [IMAGES, LABELS]:
+                    shutil.rmtree(os.path.join(self.folder_divided_path, folder), ignore_errors=True)
+                for img_file in image_files:
+                    expected = yolo_label_path(image_paths[img_file])
+                    if not os.path.exists(label_path(img_file)) or (
+                            os.path.exists(expected) and os.path.samefile(expected, label_path(img_file))):
+                        continue
+                    for folder in [IMAGES, LABELS]:
+                        os.makedirs(os.path.join(self.folder_divided_path, folder), exist_ok=True)
+                    image_link = os.path.abspath(os.path.join(self.folder_divided_path, IMAGES, img_file))
+                    hard_link(image_paths[img_file], image_link)
+                    hard_link(label_path(img_file), yolo_label_path(image_link))
+                    image_paths[img_file] = image_link
+            for split, files in splits.items():
+                with open(os.path.join(self.folder_divided_path, split + TXT), WRITE) as file:
+                    file.writelines(image_paths[f] + "\n" for f in files)
+            names = self.read_class_names(data_yaml)
+            with open(os.path.join(self.folder_divided_path, "data.yaml"), WRITE, encoding="utf-8") as file:
+                yaml.safe_dump({"path": os.path.abspath(self.folder_divided_path),
+                                "train": TRAIN + TXT, "val": VALID + TXT, "test": TEST + TXT,
+                                "nc": len(names), "names": names}, file, allow_unicode=True, sort_keys=False)
+            return splits, failures
+
+        link = hard_link if mode == HARDLINK else os.symlink
+        for split, files in splits.items():
+            for folder in [IMAGES, LABELS]:
+                # Re-splitting replaces the links of the previous split
+                shutil.rmtree(os.path.join(self.folder_divided_path, split, folder), ignore_errors=True)
+                os.makedirs(os.path.join(self.folder_divided_path, split, folder))
+            for img_file in files:
+                pairs = [(os.path.join(self.folder_frames_path, img_file),
+                          os.path.join(self.folder_divided_path, split, IMAGES, img_file))]
+                if label_folder and os.path.exists(label_path(img_file)):
+                    pairs.append((label_path(img_file), os.path.join(
+                        self.folder_divided_path, split, LABELS, os.path.basename(label_path(img_file)))))
+                for source, target in pairs:
+                    link(os.path.abspath(source), target)
+        return splits, failures
@@ -0,0 +1,234 @@
+import json
+import os
+import numpy as np
+import cv2
+from src.common.constans import JPG, PNG, READ, WRITE
+
+HASHES_FILE = "hashes.npy"
+META_FILE = "meta.json"
+POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+
+def dhash(image: np.ndarray) -> np.uint64:
+    """
+    Compute the 64 bit difference hash of an image, one bit per pair of horizontally
+    neighbouring pixels of the 9x8 grayscale thumbnail
+    Args:
+        image (np.ndarray): The BGR or grayscale image
+    Returns:
+        np.uint64: The hash
+    """
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    thumbnail = cv2.resize(image, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = thumbnail[:, 1:] > thumbnail[:, :-1]
+    return np.packbits(bits.ravel()).view(">u8")[0].astype(np.uint64)
+
+
+def hamming(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Count the differing bits of 64 bit hashes, element-wise
+    Args:
+        a (np.ndarray): uint64 hashes
+        b (np.ndarray): uint64 hashes broadcastable with a
+    Returns:
+        np.ndarray: The Hamming distances
+    """
+    xor = np.ascontiguousarray(np.bitwise_xor(a, b), dtype=np.uint64)
+    return POPCOUNT[xor.view(np.uint8)].reshape(*xor.shape, 8).sum(axis=-1, dtype=np.int64)
+
+
+def connected_components(count: int, first: np.ndarray, second: np.ndarray, parent: np.ndarray = None) -> np.ndarray:
+    """
+    Label the connected components of a graph given by its edges, every node gets the smallest
+    node index of its component
+    Args:
+        count (int): The number of nodes
+        first (np.ndarray): The first node of every edge
+        second (np.ndarray): The second node of every edge
+        parent (np.ndarray): The labels of earlier edges to merge into, as returned by a previous
+            call (default is None, every node alone)
+    Returns:
+        np.ndarray: (count,) component label per node
+    """
+    parent = np.arange(count) if parent is None else parent.copy()
+    while True:
+        root_first, root_second = parent[first], parent[second]
+        if np.array_equal(root_first, root_second):
+            return parent
+        # Hook every root onto the smaller root of its edges, then flatten the trees
+        lower = np.minimum(root_first, root_second)
+        np.minimum.at(parent, root_first, lower)
+        np.minimum.at(parent, root_second, lower)
+        while not np.array_equal(parent[parent], parent):
+            parent = parent[parent]
+
+
+class HashIndex:
+    def __init__(self, index_folder: str, image_folder: str) -> None:
+        """
+        Initialize the HashIndex, the 64 bit difference hash of every image of a folder stored in
+        hashes.npy with the file names in meta.json. Near duplicates are found with a multi-index:
+        the hashes are cut into chunks, and two hashes within distance d share at least one
+        identical chunk when there are d + 1 chunks, so only hashes sharing a chunk are compared
+        Args:
+            index_folder (str): The folder to store hashes.npy and meta.json
+            image_folder (str): The folder containing the images
+        """
+        self.index_folder = index_folder
+        self.image_folder = image_folder
+        self.hashes = np.zeros(0, dtype=np.uint64)
+        self.files = []
+        if os.path.exists(os.path.join(index_folder, META_FILE)):
+            with open(os.path.join(index_folder, META_FILE), READ) as file:
+                self.files = json.load(file)["files"]
+            self.hashes = np.load(os.path.join(index_folder, HASHES_FILE))
+
+    def update(self) -> tuple:
+        """
+        Bring the index up to date, only images whose mtime or size changed are hashed again.
+        Images that cannot be read are left out of the index and tried again on the next update
+        Returns:
+            tuple: The number of images hashed and the (path, error) pairs of the images that
+                could not be read
+        """
+        known = {record["name"]: i for i, record in enumerate(self.files)}
+        records = []
+        with os.scandir(self.image_folder) as entries:
+            for entry in sorted(entries, key=lambda entry: entry.name):
+                if entry.name.endswith(JPG) or entry.name.endswith(PNG):
+                    stat = entry.stat()
+                    records.append({"name": entry.name, "mtime": stat.st_mtime_ns, "size": stat.st_size})
+
+        files = []
+        hashes = []
+        failures = []
+        hashed = 0
+        for record in records:
+            old_i = known.get(record["name"])
+            old = self.files[old_i] if old_i is not None else None
+            if old and old["mtime"] == record["mtime"] and old["size"] == record["size"]:
+                hashes.append(self.hashes[old_i])
+            else:
+                # A reduced decode is plenty for a 9x8 thumbnail
+                image_path = os.path.join(self.image_folder, record["name"])
+                image = cv2.imread(image_path, cv2.IMREAD_REDUCED_GRAYSCALE_4)
+                if image is None:
+                    failures.append((image_path, "cv2.imread returned None"))
+                    continue
+                hashes.append(dhash(image))
+                hashed += 1
+            files.append(record)
+
+        self.hashes = np.array(hashes, dtype=np.uint64)
+        self.files = files
+        if hashed or len(files) != len(known):
+            self.save()
+        return hashed, failures
+
+    def save(self) -> None:
+        """
+        Write the index, every file is written to a temporary file first and then swapped in
+        """
+        os.makedirs(self.index_folder, exist_ok=True)
+        tmp_path = os.path.join(self.index_folder, HASHES_FILE + ".tmp")
+        with open(tmp_path, "wb") as file:
+            np.save(file, self.hashes)
+        os.replace(tmp_path, os.path.join(self.index_folder, HASHES_FILE))
+
+        tmp_path = os.path.join(self.index_folder, META_FILE + ".tmp")
+        with open(tmp_path, WRITE) as file:
+            json.dump({"image_folder": self.image_folder, "files": self.files}, file)
+        os.replace(tmp_path, os.path.join(self.index_folder, META_FILE))
+
+    def filenames(self) -> list:
+        """
+        Get the indexed image file names
+        Returns:
+            list: Sorted list of image file names
+        """
+        return [record["name"] for record in self.files]
+
+    def close_pairs(self, threshold: int = 4, block_size: int = 1 << 20, hashes: np.ndarray = None):
+        """
+        Find the pairs of images whose hashes differ by at most threshold bits, one block of
+        comparisons at a time. A bucket of images sharing a chunk is compared a few rows at a time
+        against the rest of the bucket, so memory stays bounded by block_size comparisons even for
+        thousands of near identical video frames
+        Args:
+            threshold (int): The maximum Hamming distance of near duplicates, below 64 (default is 4)
+            block_size (int): The maximum number of hashes compared at once (default is 1 << 20)
+            hashes (np.ndarray): The hashes to pair (default is None, the hashes of the index)
+        Yields:
+            tuple: The first and second index of the pairs found in one block, first < second.
+                A pair sharing several chunks is found once per shared chunk
+        """
+        hashes = self.hashes if hashes is None else hashes
+        chunks = threshold + 1
+        widths = [64 // chunks + (i < 64 % chunks) for i in range(chunks)]
+        shift = 0
+        for width in widths:
+            keys = (hashes >> np.uint64(shift)) & np.uint64((1 << width) - 1)
+            shift += width
+            order = np.argsort(keys, kind="stable")
+            sorted_keys = keys[order]
+            starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+            sizes = np.diff(np.r_[starts, len(keys)])
+            for start, size in zip(starts[sizes > 1], sizes[sizes > 1]):
+                members = order[start:start + size]
+                member_hashes = hashes[members]
+                rows = max(1, block_size // size)
+                for row in range(0, size - 1, rows):
+                    # Rows row..row + rows against the members after row, upper triangle only
+                    first = np.arange(row, min(row + rows, size - 1))
+                    second = np.arange(row + 1, size)
+                    close = hamming(member_hashes[first, None], member_hashes[None, second]) <= threshold
+                    close &= second[None, :] > first[:, None]
+                    i, j = np.nonzero(close)
+                    a, b = members[first[i]], members[second[j]]
+                    yield np.minimum(a, b), np.maximum(a, b)
+
+    def pairs(self, threshold: int = 4) -> tuple:
+        """
+        Find every pair of images whose hashes differ by at most threshold bits
+        Args:
+            threshold (int): The maximum Hamming distance of near duplicates, below 64 (default is 4)
+        Returns:
+            tuple: The first and second image index of every pair, first < second
+        """
+        blocks = list(self.close_pairs(threshold))
+        if not blocks:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        pairs = np.unique(np.stack([np.concatenate([first for first, _ in blocks]),
+                                    np.concatenate([second for _, second in blocks])], axis=1), axis=0)
+        return pairs[:, 0], pairs[:, 1]
+
+    def clusters(self, threshold: int = 4) -> np.ndarray:
+        """
+        Group near duplicates, images are in the same cluster when a chain of near duplicate
+        pairs connects them. Identical hashes are paired once, and the pairs are merged block by
+        block and never all held at once
+        Args:
+            threshold (int): The maximum Hamming distance of near duplicates (default is 4)
+        Returns:
+            np.ndarray: The cluster of every image, the index of its first image
+        """
+        hashes, inverse = np.unique(self.hashes, return_inverse=True)
+        parent = np.arange(len(hashes))
+        for first, second in self.close_pairs(threshold, hashes=hashes):
+            parent = connected_components(len(hashes), first, second, parent)
+        # Label every cluster with its first image
+        first_image = np.full(len(hashes), len(self.files))
+        np.minimum.at(first_image, parent[inverse], np.arange(len(self.files)))
+        return first_image[parent[inverse]]
+
+    def unique(self, threshold: int = 4) -> list:
+        """
+        Keep the first image of every cluster
+        Args:
+            threshold (int): The maximum Hamming distance of near duplicates (default is 4)
+        Returns:
+            list: The image file names without near duplicates
+        """
+        clusters = self.clusters(threshold)
+        return [record["name"] for i, record in enumerate(self.files) if clusters[i] == i]
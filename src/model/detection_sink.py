@@ -0,0 +1,56 @@
+import csv
+import json
+from src.common.constans import WRITE
+
+FIELDS = ["frame", "timestamp", "class_id", "class_name", "confidence", "x1", "y1", "x2", "y2", "track_id"]
+
+
+class DetectionSink:
+    def __init__(self, output_path: str, class_names: dict) -> None:
+        """
+        Initialize the DetectionSink, streaming one row per detected box to a JSONL file,
+        or to a CSV file when the output path ends with .csv
+        Args:
+            output_path (str): The path to the output file
+            class_names (dict): Mapping of class id -> class name
+        """
+        self.output_path = output_path
+        self.class_names = class_names
+        self.file = open(output_path, WRITE, newline="", encoding="utf-8")
+        self.csv_writer = None
+        if output_path.endswith(".csv"):
+            self.csv_writer = csv.writer(self.file)
+            self.csv_writer.writerow(FIELDS)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, frame_index: int, timestamp: float, boxes, confidences, class_ids, track_ids=None) -> None:
+        """
+        Write the detections of one frame
+        Args:
+            frame_index (int): The index of the frame in the video
+            timestamp (float): The timestamp of the frame in seconds
+            boxes (np.ndarray): (N, 4) boxes [x1, y1, x2, y2] in pixels
+            confidences (np.ndarray): (N,) confidence per box
+            class_ids (np.ndarray): (N,) class id per box
+            track_ids (np.ndarray): (N,) track id per box (default is None)
+        """
+        track_ids = [None] * len(boxes) if track_ids is None else track_ids.tolist()
+        for box, confidence, class_id, track_id in zip(boxes.tolist(), confidences.tolist(),
+                                                       class_ids.tolist(), track_ids):
+            row = [frame_index, round(timestamp, 3), int(class_id), self.class_names.get(int(class_id), ""),
+                   round(confidence, 4), *(round(value, 1) for value in box), track_id]
+            if self.csv_writer:
+                self.csv_writer.writerow(row)
+            else:
+                self.file.write(json.dumps(dict(zip(FIELDS, row)), ensure_ascii=False) + "\n")
+
+    def close(self) -> None:
+        """
+        Flush and close the output file
+        """
+        self.file.close()
@@ -0,0 +1,358 @@
+import hashlib
+import os
+import numpy as np
+import cv2
+import yaml
+from src.common.configs import DATA_FOLDER, DATA_YAML
+from src.common.constans import IMAGES, JPG, LABELS, PNG, READ, TEST, TXT
+from src.model.backends import CACHE_FOLDER, file_hash
+from src.model.box_ops import parse_yolo_lines, yolo_to_xyxy
+from src.model.read_write import ReadWriteFile
+
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+
+
+def average_precision(recall: np.ndarray, precision: np.ndarray) -> np.ndarray:
+    """
+    Compute the area under precision-recall curves with 101 point interpolation (COCO)
+    Args:
+        recall (np.ndarray): (N, T) recall of the predictions sorted by confidence, per IoU threshold
+        precision (np.ndarray): (N, T) precision of the same predictions
+    Returns:
+        np.ndarray: (T,) average precision per IoU threshold
+    """
+    thresholds = recall.shape[1]
+    recall = np.concatenate([np.zeros((1, thresholds)), recall, np.ones((1, thresholds))])
+    precision = np.concatenate([np.ones((1, thresholds)), precision, np.zeros((1, thresholds))])
+    # Precision envelope, the best precision at this recall or any higher one
+    precision = np.flip(np.maximum.accumulate(np.flip(precision, 0), axis=0), 0)
+
+    points = np.linspace(0, 1, 101)
+    ap = np.empty(thresholds)
+    for t in range(thresholds):
+        curve = np.interp(points, recall[:, t], precision[:, t])
+        ap[t] = np.sum(np.diff(points) * (curve[1:] + curve[:-1]) / 2)
+    return ap
+
+
+def known_classes(csr: dict, num_classes: int) -> tuple:
+    """
+    Drop the boxes whose class is not one of the num_classes classes of data.yaml, e.g. the
+    predictions of a model trained with more classes
+    Args:
+        csr (dict): CSR boxes with "offsets", "boxes" and "cls", other keys are kept as they are
+        num_classes (int): The number of classes
+    Returns:
+        tuple: The filtered CSR boxes and the number of dropped boxes
+    """
+    known = (csr["cls"] >= 0) & (csr["cls"] < num_classes)
+    if known.all():
+        return csr, 0
+    kept_before = np.concatenate([[0], np.cumsum(known)])
+    filtered = {key: (value[known] if key in ("boxes", "cls", "conf") else value) for key, value in csr.items()}
+    filtered["offsets"] = kept_before[csr["offsets"]]
+    return filtered, int((~known).sum())
+
+
+class Evaluation:
+    def __init__(self, detection, data_folder: str = DATA_FOLDER, split: str = TEST, data_yaml: str = DATA_YAML,
+                 conf: float = 0.001, batch_size: int = 16, cache_folder: str = CACHE_FOLDER) -> None:
+        """
+        Initialize the Evaluation, scoring a Detection model against the YOLO labels of a split.
+        Inference runs once with a low confidence threshold and the predictions are cached per image,
+        keyed by the hash of the model, so scoring again under other thresholds needs no inference.
+        An image whose mtime or size changed since its predictions were cached is inferred again
+        Args:
+            detection (Detection): The detection whose model is evaluated
+            data_folder (str): The dataset folder (default is DATA_FOLDER)
+            split (str): The split to evaluate, e.g. "test" or "valid" (default is "test")
+            data_yaml (str): The data.yaml with the class names (default is DATA_YAML)
+            conf (float): The confidence threshold of the cached predictions (default is 0.001)
+            batch_size (int): The number of images per inference call (default is 16)
+            cache_folder (str): The folder of the prediction cache (default is CACHE_FOLDER)
+        """
+        self.detection = detection
+        self.image_folder = os.path.join(data_folder, split, IMAGES)
+        self.label_folder = os.path.join(data_folder, split, LABELS)
+        self.split = split
+        self.conf = conf
+        self.batch_size = batch_size
+        self.cache_folder = cache_folder
+        with open(data_yaml, READ, encoding="utf-8") as file:
+            self.class_names = yaml.safe_load(file)["names"]
+        self.num_classes = len(self.class_names)
+        self.predictions = None
+        self.truths = None
+        self.pairs = None
+        self.ap = None
+        self.unknown = {"predictions": 0, "labels": 0}
+
+    def cache_path(self) -> str:
+        """
+        Get the prediction cache of the model, keyed by the model hash, the backend, the input
+        size, the confidence threshold and the split
+        Returns:
+            str: The path to the .npz cache
+        """
+        model = self.detection.model
+        model_hash = file_hash(model) if os.path.exists(model) else hashlib.sha1(model.encode()).hexdigest()
+        settings = f"{self.detection.backend}-{self.detection.imgsz}-{int(self.detection.int8)}-{self.conf}"
+        settings_hash = hashlib.sha1(settings.encode()).hexdigest()[:8]
+        return os.path.join(self.cache_folder, f"predictions-{model_hash[:16]}-{settings_hash}-{self.split}.npz")
+
+    def list_images(self) -> list:
+        """
+        List the images of the split
+        Returns:
+            list: Sorted list of image file names
+        """
+        return sorted(filename for filename in os.listdir(self.image_folder)
+                      if filename.endswith(JPG) or filename.endswith(PNG))
+
+    def predict(self) -> dict:
+        """
+        Load the cached predictions and run inference on the images missing from the cache or
+        changed since they were cached
+        Returns:
+            dict: CSR predictions, "files", "offsets", normalized xyxy "boxes", "conf" and "cls",
+                the predictions of file i are offsets[i]:offsets[i + 1]
+        """
+        cached = {}
+        cached_stats = {}
+        path = self.cache_path()
+        if os.path.exists(path):
+            with np.load(path) as data:
+                offsets = data["offsets"]
+                # Caches written without the stat of the images are inferred again
+                stats = zip(data["mtime"], data["size"]) if "mtime" in data else []
+                for i, filename in enumerate(data["files"]):
+                    rows = slice(offsets[i], offsets[i + 1])
+                    cached[str(filename)] = (data["boxes"][rows], data["conf"][rows], data["cls"][rows])
+                for filename, (mtime, size) in zip(data["files"], stats):
+                    cached_stats[str(filename)] = (int(mtime), int(size))
+
+        filenames = self.list_images()
+        stats = {}
+        for filename in filenames:
+            stat = os.stat(os.path.join(self.image_folder, filename))
+            stats[filename] = (stat.st_mtime_ns, stat.st_size)
+        missing = [filename for filename in filenames if cached_stats.get(filename) != stats[filename]]
+        if missing:
+            model = self.detection.load()
+            for start in range(0, len(missing), self.batch_size):
+                batch = missing[start:start + self.batch_size]
+                frames = [cv2.imread(os.path.join(self.image_folder, filename)) for filename in batch]
+                results = model(frames, imgsz=self.detection.imgsz, verbose=False, conf=self.conf)
+                for filename, frame, result in zip(batch, frames, results):
+                    boxes, confidences, class_ids = self.detection.extract_detections(result)
+                    height, width = frame.shape[:2]
+                    cached[filename] = ((boxes / [width, height, width, height]).astype(np.float32),
+                                        confidences.astype(np.float32), class_ids.astype(np.int16))
+
+        parts = [cached[filename] for filename in filenames]
+        offsets = np.zeros(len(filenames) + 1, dtype=np.int64)
+        np.cumsum([len(part[1]) for part in parts], out=offsets[1:])
+        predictions = {
+            "files": np.array(filenames),
+            "offsets": offsets,
+            "boxes": np.concatenate([part[0] for part in parts]).reshape(-1, 4) if parts else np.zeros((0, 4)),
+            "conf": np.concatenate([part[1] for part in parts]) if parts else np.zeros(0),
+            "cls": np.concatenate([part[2] for part in parts]) if parts else np.zeros(0, dtype=np.int16),
+        }
+        if missing:
+            os.makedirs(self.cache_folder, exist_ok=True)
+            tmp_path = path + ".tmp.npz"
+            mtimes, sizes = np.array([stats[filename] for filename in filenames], dtype=np.int64).reshape(-1, 2).T
+            np.savez(tmp_path, **predictions, mtime=mtimes, size=sizes)
+            os.replace(tmp_path, path)
+        return predictions
+
+    def load_truths(self, filenames: list) -> dict:
+        """
+        Read the YOLO labels of the images
+        Args:
+            filenames (list): The image file names
+        Returns:
+            dict: CSR labels, "offsets", normalized xyxy "boxes" and "cls"
+        """
+        parts = []
+        for filename in filenames:
+            label_path = os.path.join(self.label_folder, os.path.splitext(filename)[0] + TXT)
+            if os.path.exists(label_path):
+                parts.append(parse_yolo_lines(ReadWriteFile(label_path, self.label_folder).read_file()))
+            else:
+                parts.append(np.zeros((0, 5)))
+        offsets = np.zeros(len(filenames) + 1, dtype=np.int64)
+        np.cumsum([len(part) for part in parts], out=offsets[1:])
+        labels = np.concatenate(parts) if parts else np.zeros((0, 5))
+        return {"offsets": offsets, "boxes": yolo_to_xyxy(labels[:, 1:], 1, 1), "cls": labels[:, 0].astype(np.int16)}
+
+    def load(self) -> None:
+        """
+        Get the predictions and labels and compute the IoU of every prediction/label pair
+        of the same image at once. Boxes of classes missing from data.yaml are left out and counted
+        """
+        self.predictions, self.unknown["predictions"] = known_classes(self.predict(), self.num_classes)
+        self.truths, self.unknown["labels"] = known_classes(self.load_truths(list(self.predictions["files"])),
+                                                            self.num_classes)
+
+        # Every prediction is paired with every label of its image
+        pred_counts = np.diff(self.predictions["offsets"])
+        truth_counts = np.diff(self.truths["offsets"])
+        pair_counts = pred_counts * truth_counts
+        image = np.repeat(np.arange(len(pair_counts)), pair_counts)
+        within = np.arange(pair_counts.sum()) - np.repeat(np.cumsum(pair_counts) - pair_counts, pair_counts)
+        pred = self.predictions["offsets"][image] + within // np.maximum(truth_counts[image], 1)
+        truth = self.truths["offsets"][image] + within % np.maximum(truth_counts[image], 1)
+
+        pred_boxes = self.predictions["boxes"][pred].astype(np.float64)
+        truth_boxes = self.truths["boxes"][truth]
+        top_left = np.maximum(pred_boxes[:, :2], truth_boxes[:, :2])
+        bottom_right = np.minimum(pred_boxes[:, 2:], truth_boxes[:, 2:])
+        inter = np.prod(np.clip(bottom_right - top_left, 0, None), axis=1)
+        area_pred = np.prod(pred_boxes[:, 2:] - pred_boxes[:, :2], axis=1)
+        area_truth = np.prod(truth_boxes[:, 2:] - truth_boxes[:, :2], axis=1)
+        iou = inter / np.maximum(area_pred + area_truth - inter, 1e-12)
+        self.pairs = {"pred": pred, "truth": truth, "iou": iou,
+                      "same_class": self.predictions["cls"][pred] == self.truths["cls"][truth]}
+        self.ap = None
+
+    def match(self, conf: float, iou_threshold: float, same_class: bool = True) -> tuple:
+        """
+        Match predictions to labels greedily by descending IoU, every prediction and every label
+        is matched at most once
+        Args:
+            conf (float): Only predictions with at least this confidence are matched
+            iou_threshold (float): The minimum IoU of a match
+            same_class (bool): Only match a prediction to a label of its class (default is True)
+        Returns:
+            tuple: The matched prediction and label indices
+        """
+        if self.pairs is None:
+            self.load()
+        pairs = self.pairs
+        keep = (pairs["iou"] >= iou_threshold) & (self.predictions["conf"][pairs["pred"]] >= conf)
+        if same_class:
+            keep &= pairs["same_class"]
+        candidates = np.flatnonzero(keep)
+        candidates = candidates[np.argsort(-pairs["iou"][candidates], kind="stable")]
+        pred, truth = pairs["pred"][candidates], pairs["truth"][candidates]
+
+        # Keep the best pair of every prediction, then the best remaining pair of every label
+        _, first = np.unique(pred, return_index=True)
+        first = np.sort(first)
+        pred, truth = pred[first], truth[first]
+        _, first = np.unique(truth, return_index=True)
+        first = np.sort(first)
+        return pred[first], truth[first]
+
+    def true_positives(self, conf: float) -> np.ndarray:
+        """
+        Flag the predictions matched to a label of their class at every IoU threshold of mAP@0.5:0.95
+        Args:
+            conf (float): Only predictions with at least this confidence are matched
+        Returns:
+            np.ndarray: (N, 10) bool
+        """
+        tp = np.zeros((len(self.predictions["conf"]), len(IOU_THRESHOLDS)), dtype=bool)
+        for t, iou_threshold in enumerate(IOU_THRESHOLDS):
+            pred, _ = self.match(conf, iou_threshold)
+            tp[pred, t] = True
+        return tp
+
+    def average_precisions(self) -> np.ndarray:
+        """
+        Compute the average precision of every class over the whole confidence range, it does not
+        depend on the operating point so it is computed once
+        Returns:
+            np.ndarray: (num_classes, 10) average precision per class and IoU threshold
+        """
+        if self.pairs is None:
+            self.load()
+        if self.ap is not None:
+            return self.ap
+        pred_cls = self.predictions["cls"].astype(np.int64)
+        confidences = self.predictions["conf"]
+        instances = np.bincount(self.truths["cls"].astype(np.int64), minlength=self.num_classes)
+
+        tp = self.true_positives(self.conf)
+        self.ap = np.zeros((self.num_classes, len(IOU_THRESHOLDS)))
+        for c in range(self.num_classes):
+            rows = np.flatnonzero(pred_cls == c)
+            if len(rows) == 0 or instances[c] == 0:
+                continue
+            rows = rows[np.argsort(-confidences[rows], kind="stable")]
+            true_cumsum = np.cumsum(tp[rows], axis=0)
+            false_cumsum = np.cumsum(~tp[rows], axis=0)
+            recall = true_cumsum / instances[c]
+            precision = true_cumsum / (true_cumsum + false_cumsum)
+            self.ap[c] = average_precision(recall, precision)
+        return self.ap
+
+    def evaluate(self, conf: float = 0.25, iou_threshold: float = 0.5) -> dict:
+        """
+        Score the cached predictions
+        Args:
+            conf (float): The confidence threshold of precision, recall and the confusion matrix
+                (default is 0.25)
+            iou_threshold (float): The IoU threshold of precision, recall and the confusion matrix
+                (default is 0.5)
+        Returns:
+            dict: Per class "precision", "recall", "ap50", "ap50_95" and "instances", their means
+                "map50" and "map50_95", and the confusion matrix with true classes as rows and
+                predicted classes as columns plus the unmatched "false_positives" and "missed" per class,
+                and the number of predictions and labels of classes missing from data.yaml as "unknown"
+        """
+        if self.pairs is None:
+            self.load()
+        nc = self.num_classes
+        pred_cls = self.predictions["cls"].astype(np.int64)
+        truth_cls = self.truths["cls"].astype(np.int64)
+        confidences = self.predictions["conf"]
+        instances = np.bincount(truth_cls, minlength=nc)[:nc]
+        ap = self.average_precisions()
+
+        # Precision and recall at the operating point
+        pred, _ = self.match(conf, iou_threshold)
+        selected = confidences >= conf
+        true_positives = np.bincount(pred_cls[pred], minlength=nc)[:nc]
+        predicted = np.bincount(pred_cls[selected], minlength=nc)[:nc]
+        precision = true_positives / np.maximum(predicted, 1)
+        recall = true_positives / np.maximum(instances, 1)
+
+        # Confusion matrix, predictions are matched to labels of any class
+        pred, truth = self.match(conf, iou_threshold, same_class=False)
+        matrix = np.zeros((nc, nc), dtype=np.int64)
+        np.add.at(matrix, (truth_cls[truth], pred_cls[pred]), 1)
+        false_positives = predicted - np.bincount(pred_cls[pred], minlength=nc)[:nc]
+        missed = instances - np.bincount(truth_cls[truth], minlength=nc)[:nc]
+
+        present = instances > 0
+        return {
+            "classes": [{"name": name, "instances": int(instances[c]), "precision": float(precision[c]),
+                         "recall": float(recall[c]), "ap50": float(ap[c, 0]), "ap50_95": float(ap[c].mean())}
+                        for c, name in enumerate(self.class_names)],
+            "precision": float(precision[present].mean()) if present.any() else 0.0,
+            "recall": float(recall[present].mean()) if present.any() else 0.0,
+            "map50": float(ap[present, 0].mean()) if present.any() else 0.0,
+            "map50_95": float(ap[present].mean()) if present.any() else 0.0,
+            "confusion_matrix": matrix,
+            "false_positives": false_positives,
+            "missed": missed,
+            "unknown": dict(self.unknown),
+        }
+
+    def sweep(self, confs: list, iou_threshold: float = 0.5) -> list:
+        """
+        Score the cached predictions under several confidence thresholds
+        Args:
+            confs (list): The confidence thresholds
+            iou_threshold (float): The IoU threshold (default is 0.5)
+        Returns:
+            list: (conf, precision, recall) per threshold, averaged over the classes
+        """
+        results = []
+        for conf in confs:
+            result = self.evaluate(conf, iou_threshold)
+            results.append((conf, result["precision"], result["recall"]))
+        return results
@@ -0,0 +1,104 @@
+import queue
+import threading
+import cv2
+from src.model.metrics import Metrics
+
+
+class FrameReader(threading.Thread):
+    def __init__(self, video: str, queue_size: int = 32, metrics: Metrics = None,
+                 drop_oldest: bool = False) -> None:
+        """
+        Initialize the FrameReader, a thread decoding the frames of a video into a bounded queue.
+        Every item is (frame index, timestamp in seconds, BGR frame) and None marks the end
+        Args:
+            video (str): The video file to be read
+            queue_size (int): The maximum number of decoded frames waiting (default is 32)
+            metrics (Metrics): Collects the decode latency and the queue depth (default is None)
+            drop_oldest (bool): When the queue is full drop its oldest frame instead of waiting,
+                for live sources that must not fall behind (default is False)
+        """
+        super().__init__(daemon=True)
+        self.video = video
+        self.cap = cv2.VideoCapture(video)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.stopped = threading.Event()
+        self.metrics = metrics or Metrics()
+        self.drop_oldest = drop_oldest
+        self.queue_gauge = "queue_depth"
+
+    def run(self) -> None:
+        """
+        Decode frames until the end of the video or until stop is called
+        """
+        index = 0
+        while self.cap.isOpened() and not self.stopped.is_set():
+            with self.metrics.stage("read"):
+                success, frame = self.cap.read()
+            if not success:
+                break
+            self.put((index, index / self.fps, frame))
+            self.metrics.set_gauge(self.queue_gauge, self.queue.qsize())
+            index += 1
+        self.cap.release()
+        self.put(None)
+
+    def put(self, item) -> None:
+        """
+        Put an item in the queue, waiting while it is full unless the reader is stopped
+        or drops the oldest frames
+        Args:
+            item (tuple): The (frame index, timestamp, frame) item or None
+        """
+        while self.drop_oldest and not self.stopped.is_set():
+            try:
+                self.queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.metrics.increment("dropped_frames")
+                except queue.Empty:
+                    pass
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def frames(self):
+        """
+        Iterate over the decoded frames
+        Yields:
+            tuple: (frame index, timestamp in seconds, BGR frame)
+        """
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            yield item
+
+    def batches(self, batch_size: int):
+        """
+        Iterate over the decoded frames in batches
+        Args:
+            batch_size (int): The maximum number of frames per batch
+        Yields:
+            list: Up to batch_size (frame index, timestamp in seconds, BGR frame) items
+        """
+        batch = []
+        for item in self.frames():
+            batch.append(item)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def stop(self) -> None:
+        """
+        Stop decoding and wait for the thread to finish
+        """
+        self.stopped.set()
+        self.join()
@@ -0,0 +1,336 @@
+import os
+from PIL import Image
+import numpy as np
+import cv2
+from src.common.constans import TXT
+from src.model.build_cache import BuildCache
+from src.model.box_ops import format_yolo_lines, parse_yolo_lines, xyxy_to_yolo, yolo_to_xyxy
+from src.model.data_augment import DataAugment, letterbox_geometry
+from src.model.image_store import ImageStore
+from src.model.metrics import Metrics
+from src.model.read_write import ReadWriteFile
+
+
+class GeometricAugment(DataAugment):
+    def __init__(self, input_folder: str, label_folder: str, output_folder: str, min_visibility: float = 0.3,
+                 metrics: Metrics = None, store: ImageStore = None):
+        """
+        Initialize the GeometricAugment class. Every geometric operation returns an affine matrix
+        which is applied to the image and to all of its YOLO boxes, and the image/label pair is
+        written together as output_folder/images and output_folder/labels
+        Args:
+            input_folder (str): The input folder containing images
+            label_folder (str): The folder containing the YOLO annotation of each image
+            output_folder (str): The output folder to save processed images and labels
+            min_visibility (float): Boxes keeping less of their area inside the image are dropped (default is 0.3)
+            metrics (Metrics): Receives the throughput of every run as "augment" (default is None)
+            store (ImageStore): Already resized images of the input folder, used as the base of
+                resize_matrix instead of decoding the JPEGs again (default is None)
+        """
+        super().__init__(input_folder, output_folder, metrics, store)
+        self.label_folder = label_folder
+        self.min_visibility = min_visibility
+
+    def read_boxes(self, filename: str) -> np.ndarray:
+        """
+        Read the YOLO boxes of an image, an image without annotation file has no boxes
+        Args:
+            filename (str): The image file name
+        Returns:
+            np.ndarray: (N, 5) boxes [label, center_x, center_y, width, height]
+        """
+        label_path = os.path.join(self.label_folder, os.path.splitext(filename)[0] + TXT)
+        if not os.path.exists(label_path):
+            return np.zeros((0, 5))
+        return parse_yolo_lines(ReadWriteFile(label_path, self.label_folder).read_file())
+
+    def write_pair(self, folder: str, filename: str, image: np.ndarray, boxes: np.ndarray) -> None:
+        """
+        Write an image and its YOLO boxes into the images and labels sub folders
+        Args:
+            folder (str): The output folder
+            filename (str): The image file name
+            image (np.ndarray): The RGB image
+            boxes (np.ndarray): (N, 5) boxes [label, center_x, center_y, width, height]
+        """
+        image_folder = os.path.join(folder, "images")
+        label_folder = os.path.join(folder, "labels")
+        os.makedirs(image_folder, exist_ok=True)
+        os.makedirs(label_folder, exist_ok=True)
+
+        Image.fromarray(image).save(os.path.join(image_folder, filename))
+        label_path = os.path.join(label_folder, os.path.splitext(filename)[0] + TXT)
+        ReadWriteFile(label_path, label_folder).write_to_file(format_yolo_lines(boxes))
+
+    def resize_matrix(self, width: int, height: int, size: int = 640) -> tuple:
+        """
+        Build the matrix stretching the image to size x size, as DataAugment.resize_fast does
+        Args:
+            width (int): The width of the image
+            height (int): The height of the image
+            size (int): The output size (default is 640)
+        Returns:
+            tuple: The 2x3 affine matrix and the output (width, height)
+        """
+        matrix = np.array([[size / width, 0, 0], [0, size / height, 0]])
+        return matrix, (size, size)
+
+    def rotate_matrix(self, width: int, height: int, angle: float) -> tuple:
+        """
+        Build the matrix rotating the image (angle in degrees) with an expanded canvas to avoid cropping
+        Args:
+            width (int): The width of the image
+            height (int): The height of the image
+            angle (float): The angle to rotate the image
+        Returns:
+            tuple: The 2x3 affine matrix and the output (width, height)
+        """
+        image_center = (width / 2, height / 2)
+        rotation_mat = cv2.getRotationMatrix2D(image_center, angle, 1.)
+
+        abs_cos = abs(rotation_mat[0, 0])
+        abs_sin = abs(rotation_mat[0, 1])
+        bound_w = int(height * abs_sin + width * abs_cos)
+        bound_h = int(height * abs_cos + width * abs_sin)
+
+        # move the rotated image to the center of the new bounds
+        rotation_mat[0, 2] += bound_w / 2 - image_center[0]
+        rotation_mat[1, 2] += bound_h / 2 - image_center[1]
+        return rotation_mat, (bound_w, bound_h)
+
+    def flip_matrix(self, width: int, height: int, horizontal: bool = True) -> tuple:
+        """
+        Build the matrix flipping the image
+        Args:
+            width (int): The width of the image
+            height (int): The height of the image
+            horizontal (bool): Flip left-right, otherwise top-bottom (default is True)
+        Returns:
+            tuple: The 2x3 affine matrix and the output (width, height)
+        """
+        if horizontal:
+            matrix = np.array([[-1., 0, width], [0, 1, 0]])
+        else:
+            matrix = np.array([[1., 0, 0], [0, -1, height]])
+        return matrix, (width, height)
+
+    def scale_matrix(self, width: int, height: int, factor: float) -> tuple:
+        """
+        Build the matrix zooming the image around its center, the canvas keeps its size
+        Args:
+            width (int): The width of the image
+            height (int): The height of the image
+            factor (float): The zoom factor, below 1 zooms out
+        Returns:
+            tuple: The 2x3 affine matrix and the output (width, height)
+        """
+        return cv2.getRotationMatrix2D((width / 2, height / 2), 0, factor), (width, height)
+
+    def translate_matrix(self, width: int, height: int, shift_x: float, shift_y: float) -> tuple:
+        """
+        Build the matrix shifting the image, the canvas keeps its size
+        Args:
+            width (int): The width of the image
+            height (int): The height of the image
+            shift_x (float): The horizontal shift as a fraction of the width
+            shift_y (float): The vertical shift as a fraction of the height
+        Returns:
+            tuple: The 2x3 affine matrix and the output (width, height)
+        """
+        matrix = np.array([[1., 0, shift_x * width], [0, 1, shift_y * height]])
+        return matrix, (width, height)
+
+    def letterbox_matrix(self, width: int, height: int, size: int = 640) -> tuple:
+        """
+        Build the matrix fitting the image into size x size while keeping its aspect ratio, with the
+        whole pixel size and padding of DataAugment.letterbox
+        Args:
+            width (int): The width of the image
+            height (int): The height of the image
+            size (int): The output size (default is 640)
+        Returns:
+            tuple: The 2x3 affine matrix and the output (width, height)
+        """
+        new_width, new_height, pad_x, pad_y = letterbox_geometry(width, height, size)
+        matrix = np.array([[new_width / width, 0, pad_x], [0, new_height / height, pad_y]], dtype=float)
+        return matrix, (size, size)
+
+    def transform_boxes(self, boxes: np.ndarray, matrix: np.ndarray, image_size: tuple, output_size: tuple) -> np.ndarray:
+        """
+        Apply an affine matrix to all boxes at once. The four corners of every box are
+        transformed, enclosed by a new axis aligned box and clipped to the output image
+        Args:
+            boxes (np.ndarray): (N, 5) boxes [label, center_x, center_y, width, height]
+            matrix (np.ndarray): The 2x3 affine matrix
+            image_size (tuple): The (width, height) of the input image
+            output_size (tuple): The (width, height) of the output image
+        Returns:
+            np.ndarray: (M, 5) transformed boxes, boxes mostly outside the image are dropped
+        """
+        corners = yolo_to_xyxy(boxes[:, 1:], *image_size)
+        points = corners[:, [[0, 1], [2, 1], [2, 3], [0, 3]]]
+        points = points @ matrix[:, :2].T + matrix[:, 2]
+
+        transformed = np.concatenate([points.min(axis=1), points.max(axis=1)], axis=1)
+        clipped = transformed.clip(0, [*output_size, *output_size])
+
+        area = np.prod(transformed[:, 2:] - transformed[:, :2], axis=1)
+        clipped_size = clipped[:, 2:] - clipped[:, :2]
+        visibility = np.prod(clipped_size, axis=1) / np.maximum(area, 1e-9)
+        keep = (visibility >= self.min_visibility) & (clipped_size > 1).all(axis=1)
+
+        result = np.empty((int(keep.sum()), 5))
+        result[:, 0] = boxes[keep, 0]
+        result[:, 1:] = xyxy_to_yolo(clipped[keep], *output_size)
+        return result
+
+    def transform(self, image: np.ndarray, boxes: np.ndarray, matrix: np.ndarray, output_size: tuple) -> tuple:
+        """
+        Apply the same affine matrix to the image and to its boxes
+        Args:
+            image (np.ndarray): The RGB image
+            boxes (np.ndarray): (N, 5) boxes [label, center_x, center_y, width, height]
+            matrix (np.ndarray): The 2x3 affine matrix in continuous pixel coordinates
+            output_size (tuple): The (width, height) of the output image
+        Returns:
+            tuple: The transformed image and boxes
+        """
+        height, width = image.shape[:2]
+
+        # warpAffine samples at pixel centers, boxes live on pixel edges
+        image_matrix = matrix.copy()
+        image_matrix[:, 2] += matrix[:, :2].sum(axis=1) * 0.5 - 0.5
+        warped = cv2.warpAffine(image, image_matrix, output_size)
+        return warped, self.transform_boxes(boxes, matrix, (width, height), output_size)
+
+    def apply(self, image: np.ndarray, boxes: np.ndarray, operation, *arg) -> tuple:
+        """
+        Apply a geometric operation to the image and to its boxes
+        Args:
+            image (np.ndarray): The RGB image
+            boxes (np.ndarray): (N, 5) boxes [label, center_x, center_y, width, height]
+            operation (function): The matrix operation, called as operation(width, height, *arg)
+            *arg: Additional arguments to pass to the operation function
+        Returns:
+            tuple: The transformed image and boxes
+        """
+        height, width = image.shape[:2]
+        matrix, output_size = operation(width, height, *arg)
+        return self.transform(image, boxes, matrix, output_size)
+
+    def process_file(self, filename: str, operation, arg: tuple) -> None:
+        """
+        Apply a geometric operation to one image of the input folder and save the image/label pair
+        Args:
+            filename (str): The image file name in the input folder
+            operation (function): The matrix operation to apply on the image and its boxes
+            arg (tuple): Additional arguments to pass to the operation function
+        """
+        image = np.asarray(self.load_image(os.path.join(self.input_folder, filename)).convert('RGB'))
+        image, boxes = self.apply(image, self.read_boxes(filename), operation, *arg)
+        self.write_pair(self.output_folder, filename, image, boxes)
+
+    def process_variants(self, variants: dict, base_operation=None, workers: int = 1, chunk_size: int = 16,
+                         cache: BuildCache = None, *, photometric: dict = None) -> list:
+        """
+        Decode each image once, apply the base geometric operation and save the base pair together
+        with every geometric and photometric variant of it in a single pass
+        Args:
+            variants (dict): Mapping of output folder -> (matrix operation, args) applied on the base pair
+            base_operation (function): The matrix operation producing the base pair (default is resize_matrix)
+            workers (int): The number of worker processes, 1 runs in the current process (default is 1)
+            chunk_size (int): The number of images handed to a worker at a time (default is 16)
+            cache (BuildCache): Skips images whose image/label pairs are up to date and deletes the
+                pairs of removed images (default is None)
+            photometric (dict): Mapping of output folder -> (DataAugment operation, args) applied on the
+                base image, the boxes are copied unchanged (default is None)
+        Returns:
+            list: The (filename, error) pairs of images that failed
+        """
+        base_operation = base_operation or self.resize_matrix
+        photometric = photometric or {}
+        args = (variants, photometric, base_operation)
+        if cache is None:
+            return self.run_tasks(self.process_file_variants, args, workers, chunk_size)
+
+        folders = [self.output_folder, *variants, *photometric]
+        outputs = {filename: self.pair_outputs(filename, variants, photometric, base_operation, cache)
+                   for filename in self.list_images()}
+        return self.run_cached(self.process_file_variants, args, outputs,
+                               [os.path.join(folder, sub) for folder in folders for sub in ("images", "labels")],
+                               workers, chunk_size, cache)
+
+    def pair_outputs(self, filename: str, variants: dict, photometric: dict, base_operation,
+                     cache: BuildCache) -> dict:
+        """
+        Get the image and label files written for one image with the keys identifying their content,
+        the keys also cover the label file and min_visibility
+        Args:
+            filename (str): The image file name in the input folder
+            variants (dict): Mapping of output folder -> (matrix operation, args)
+            photometric (dict): Mapping of output folder -> (DataAugment operation, args)
+            base_operation (function): The matrix operation producing the base pair
+            cache (BuildCache): The build cache hashing the image and its label file
+        Returns:
+            dict: Mapping of output path -> key
+        """
+        img_path = os.path.join(self.input_folder, filename)
+        label_path = os.path.join(self.label_folder, os.path.splitext(filename)[0] + TXT)
+        label_hash = cache.input_hash(label_path) if os.path.exists(label_path) else None
+        base_steps = (("labels", label_hash, self.min_visibility), (base_operation.__name__, ()))
+
+        steps = {self.output_folder: base_steps}
+        for folder, (operation, args) in [*variants.items(), *photometric.items()]:
+            steps[folder] = (*base_steps, (operation.__name__, args))
+
+        outputs = {}
+        for folder, folder_steps in steps.items():
+            key = cache.key(img_path, *folder_steps)
+            outputs[os.path.join(folder, "images", filename)] = key
+            outputs[os.path.join(folder, "labels", os.path.splitext(filename)[0] + TXT)] = key
+        return outputs
+
+    def base_pair(self, filename: str, base_operation) -> tuple:
+        """
+        Decode one image and apply the base operation to it and to its boxes. The stretch of
+        resize_matrix is read from the store when it holds the image, and otherwise resized the same
+        way the store is built, so both give the same pixels and the same clipped boxes
+        Args:
+            filename (str): The image file name in the input folder
+            base_operation (function): The matrix operation producing the base pair
+        Returns:
+            tuple: The RGB base image and its boxes
+        """
+        img_path = os.path.join(self.input_folder, filename)
+        boxes = self.read_boxes(filename)
+        if base_operation != self.resize_matrix:
+            image = np.asarray(self.load_image(img_path).convert('RGB'))
+            return self.apply(image, boxes, base_operation)
+
+        image = self.stored_image(filename)
+        if image is None:
+            image = np.asarray(self.resize_fast(img_path))
+        # A stretch keeps the normalized boxes, so they are clipped and filtered on the output image
+        matrix, output_size = self.resize_matrix(*image.shape[1::-1], size=image.shape[0])
+        return image, self.transform_boxes(boxes, matrix, output_size, output_size)
+
+    def process_file_variants(self, filename: str, variants: dict, photometric: dict, base_operation) -> None:
+        """
+        Decode one image once and save its base pair and all geometric and photometric variants
+        Args:
+            filename (str): The image file name in the input folder
+            variants (dict): Mapping of output folder -> (matrix operation, args)
+            photometric (dict): Mapping of output folder -> (DataAugment operation, args)
+            base_operation (function): The matrix operation producing the base pair
+        """
+        base_img, base_boxes = self.base_pair(filename, base_operation)
+        self.write_pair(self.output_folder, filename, base_img, base_boxes)
+
+        for folder, (operation, args) in variants.items():
+            processed_img, processed_boxes = self.apply(base_img, base_boxes, operation, *args)
+            self.write_pair(folder, filename, processed_img, processed_boxes)
+
+        pil_img = Image.fromarray(base_img)
+        for folder, (operation, args) in photometric.items():
+            processed_img = np.asarray(operation(pil_img, *args))
+            self.write_pair(folder, filename, processed_img, base_boxes)
@@ -1,6 +1,8 @@
 import os
 import re
 
+NUMBERS = re.compile(r'(\d+)')
+
 
 class FilePathCollector:
     def __init__(self, img_folder: str, annotation_folder: str) -> None:
@@ -19,8 +21,7 @@ class FilePathCollector:
         Returns:
             list: List of numbers from the file name
         """
-        numbers = re.compile(r'(\d+)')
-        parts = numbers.split(value)
+        parts = NUMBERS.split(value)
         parts[1::2] = map(int, parts[1::2])
         return parts
 
@@ -30,6 +31,7 @@ class FilePathCollector:
         Returns:
             list: List of paths to the image files
         """
+        self.img_paths = []
         for filename in sorted(os.listdir(self.img_folder), key=self.numerical_sort):
             file_path = os.path.join(self.img_folder, filename)
             self.img_paths.append(file_path)
@@ -41,6 +43,7 @@ class FilePathCollector:
         Returns:
             list: List of paths to the annotation files
         """
+        self.annotation_paths = []
         for filename in sorted(os.listdir(self.annotation_folder), key=self.numerical_sort):
             file_path = os.path.join(self.annotation_folder, filename)
             self.annotation_paths.append(file_path)
@@ -0,0 +1,255 @@
+import json
+import os
+from PIL import Image
+import numpy as np
+from numpy.lib.format import open_memmap
+from src.common.constans import JPG, PNG, READ, TXT, WRITE
+from src.model.box_ops import parse_yolo_lines
+from src.model.read_write import ReadWriteFile
+
+IMAGES_FILE = "images.npy"
+BOXES_FILE = "boxes.npy"
+OFFSETS_FILE = "offsets.npy"
+META_FILE = "meta.json"
+
+
+def resize_reduced(img: Image.Image, size: int) -> Image.Image:
+    """
+    Resize an image to size x size, letting the JPEG decoder skip the resolution that would be
+    thrown away and finishing with an area filter
+    Args:
+        img (PIL.Image.Image): The image, only a JPEG that is not decoded yet is decoded at a reduced scale
+        size (int): The output size
+    Returns:
+        PIL.Image.Image: The resized RGB image
+    """
+    # draft scales the JPEG decode by 1/2, 1/4 or 1/8 and keeps at least size x size
+    img.draft(None, (size, size))
+    return img.convert('RGB').resize((size, size), Image.BOX)
+
+
+class ImageStore:
+    def __init__(self, store_folder: str, image_folder: str, label_folder: str = None, size: int = 640) -> None:
+        """
+        Initialize the ImageStore, the images of image_folder decoded and resized to size x size once
+        into one memory-mapped (N, size, size, 3) uint8 RGB array. A sidecar index keeps the file
+        names, and the YOLO boxes of label_folder are packed with CSR style offsets so the boxes of
+        image i are boxes[offsets[i]:offsets[i + 1]]
+        Args:
+            store_folder (str): The folder to store images.npy, boxes.npy, offsets.npy and meta.json
+            image_folder (str): The folder containing the source images
+            label_folder (str): The folder containing the YOLO annotation of each image (default is None)
+            size (int): The width and height of the stored images (default is 640)
+        """
+        self.store_folder = store_folder
+        self.image_folder = image_folder
+        self.label_folder = label_folder
+        self.size = size
+        self.images = np.zeros((0, size, size, 3), dtype=np.uint8)
+        self.boxes = np.zeros((0, 5), dtype=np.float32)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.files = []
+        self.positions = {}
+        if os.path.exists(os.path.join(store_folder, META_FILE)):
+            self.load()
+
+    def __getstate__(self):
+        # Worker processes map the store again instead of receiving a copy of every image
+        state = self.__dict__.copy()
+        for name in ("images", "boxes", "offsets"):
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.images = np.zeros((0, self.size, self.size, 3), dtype=np.uint8)
+        self.boxes = np.zeros((0, 5), dtype=np.float32)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        # A store that was never built is pickled empty
+        if os.path.exists(os.path.join(self.store_folder, META_FILE)):
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self.files)
+
+    def __contains__(self, filename: str) -> bool:
+        return filename in self.positions
+
+    def __getitem__(self, i: int) -> np.ndarray:
+        return self.images[i]
+
+    def load(self) -> None:
+        """
+        Memory-map the stored images and labels
+        """
+        with open(os.path.join(self.store_folder, META_FILE), READ) as file:
+            meta = json.load(file)
+        if meta["size"] != self.size:
+            raise ValueError(f"The store holds {meta['size']}x{meta['size']} images, not {self.size}x{self.size}")
+        self.files = meta["files"]
+        self.positions = {record["name"]: i for i, record in enumerate(self.files)}
+        self.images = np.load(os.path.join(self.store_folder, IMAGES_FILE), mmap_mode=READ)
+        self.boxes = np.load(os.path.join(self.store_folder, BOXES_FILE), mmap_mode=READ)
+        self.offsets = np.load(os.path.join(self.store_folder, OFFSETS_FILE))
+
+    def scan(self) -> list:
+        """
+        List the source images with the stat of the image and of its label file
+        Returns:
+            list: One dict per image sorted by file name
+        """
+        files = []
+        with os.scandir(self.image_folder) as entries:
+            for entry in sorted(entries, key=lambda entry: entry.name):
+                if not (entry.name.endswith(JPG) or entry.name.endswith(PNG)):
+                    continue
+                stat = entry.stat()
+                record = {"name": entry.name, "mtime": stat.st_mtime_ns, "size": stat.st_size,
+                          "label_mtime": None, "label_size": None}
+                label_path = self.label_path(entry.name)
+                if label_path and os.path.exists(label_path):
+                    label_stat = os.stat(label_path)
+                    record["label_mtime"] = label_stat.st_mtime_ns
+                    record["label_size"] = label_stat.st_size
+                files.append(record)
+        return files
+
+    def label_path(self, filename: str) -> str:
+        """
+        Get the path of the label file of an image
+        Args:
+            filename (str): The image file name
+        Returns:
+            str: The label path, None without label folder
+        """
+        if self.label_folder is None:
+            return None
+        return os.path.join(self.label_folder, os.path.splitext(filename)[0] + TXT)
+
+    def decode(self, filename: str) -> np.ndarray:
+        """
+        Decode a source image and resize it as DataAugment.resize_fast does
+        Args:
+            filename (str): The image file name
+        Returns:
+            np.ndarray: The (size, size, 3) RGB image
+        """
+        with Image.open(os.path.join(self.image_folder, filename)) as img:
+            return np.asarray(resize_reduced(img, self.size))
+
+    def update(self) -> int:
+        """
+        Bring the store up to date, only images whose mtime or size changed are decoded again
+        and only label files whose mtime or size changed are parsed again
+        Returns:
+            int: The number of images decoded
+        """
+        files = self.scan()
+        if files == self.files:
+            return 0
+
+        os.makedirs(self.store_folder, exist_ok=True)
+        tmp_path = os.path.join(self.store_folder, IMAGES_FILE + ".tmp")
+        images = open_memmap(tmp_path, mode="w+", dtype=np.uint8, shape=(len(files), self.size, self.size, 3))
+        parts = []
+        decoded = 0
+        for i, record in enumerate(files):
+            old_i = self.positions.get(record["name"])
+            old = self.files[old_i] if old_i is not None else None
+            if old and old["mtime"] == record["mtime"] and old["size"] == record["size"]:
+                images[i] = self.images[old_i]
+            else:
+                images[i] = self.decode(record["name"])
+                decoded += 1
+
+            if old and old["label_mtime"] == record["label_mtime"] and old["label_size"] == record["label_size"]:
+                parts.append(self.boxes[self.offsets[old_i]:self.offsets[old_i + 1]])
+            elif record["label_mtime"] is not None:
+                content = ReadWriteFile(self.label_path(record["name"]), self.label_folder).read_file()
+                parts.append(parse_yolo_lines(content).astype(np.float32))
+            else:
+                parts.append(np.zeros((0, 5), dtype=np.float32))
+        images.flush()
+
+        counts = [len(part) for part in parts]
+        offsets = np.zeros(len(files) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        boxes = np.concatenate(parts) if parts else np.zeros((0, 5), dtype=np.float32)
+        # Drop the views of the old memory maps before they are replaced on disk
+        del images, parts
+        self.images = self.boxes = None
+        self.save(tmp_path, boxes, offsets, files)
+        self.load()
+        return decoded
+
+    def save(self, images_path: str, boxes: np.ndarray, offsets: np.ndarray, files: list) -> None:
+        """
+        Swap in the new images file and write the labels and the index, every file is written
+        to a temporary file first
+        Args:
+            images_path (str): The temporary images file
+            boxes (np.ndarray): (N, 5) float32 boxes
+            offsets (np.ndarray): (len(files) + 1,) offsets of the boxes of every image
+            files (list): The index records
+        """
+        os.replace(images_path, os.path.join(self.store_folder, IMAGES_FILE))
+        for name, array in [(BOXES_FILE, boxes), (OFFSETS_FILE, offsets)]:
+            tmp_path = os.path.join(self.store_folder, name + ".tmp")
+            with open(tmp_path, "wb") as file:
+                np.save(file, array)
+            os.replace(tmp_path, os.path.join(self.store_folder, name))
+
+        tmp_path = os.path.join(self.store_folder, META_FILE + ".tmp")
+        with open(tmp_path, WRITE) as file:
+            json.dump({"image_folder": self.image_folder, "label_folder": self.label_folder,
+                       "size": self.size, "files": files}, file)
+        os.replace(tmp_path, os.path.join(self.store_folder, META_FILE))
+
+    def is_fresh(self, filename: str) -> bool:
+        """
+        Check a stored image against the mtime and size of its source file, it is stale when the
+        source changed after the last update
+        Args:
+            filename (str): The image file name
+        Returns:
+            bool: True when the image is stored and its source is unchanged
+        """
+        i = self.positions.get(filename)
+        if i is None:
+            return False
+        try:
+            stat = os.stat(os.path.join(self.image_folder, filename))
+        except OSError:
+            return False
+        return self.files[i]["mtime"] == stat.st_mtime_ns and self.files[i]["size"] == stat.st_size
+
+    def image(self, filename: str) -> np.ndarray:
+        """
+        Get a stored image without copying it
+        Args:
+            filename (str): The image file name
+        Returns:
+            np.ndarray: The read-only (size, size, 3) RGB view
+        """
+        return self.images[self.positions[filename]]
+
+    def labels(self, filename: str) -> np.ndarray:
+        """
+        Get the stored YOLO boxes of an image
+        Args:
+            filename (str): The image file name
+        Returns:
+            np.ndarray: (K, 5) boxes [label, center_x, center_y, width, height]
+        """
+        i = self.positions[filename]
+        return self.boxes[self.offsets[i]:self.offsets[i + 1]]
+
+    def batch(self, indices) -> np.ndarray:
+        """
+        Get several stored images, a slice of positions is returned without copying
+        Args:
+            indices (slice | list): The positions of the images
+        Returns:
+            np.ndarray: (K, size, size, 3) RGB images
+        """
+        return self.images[indices]
@@ -0,0 +1,68 @@
+import queue
+import threading
+import cv2
+
+
+class ImageWriterPool:
+    def __init__(self, workers: int = 4, queue_size: int = 64, params: list = None) -> None:
+        """
+        Initialize the ImageWriterPool, background threads encoding and writing images fed by a
+        bounded queue so that decoding never waits on disk and memory stays bounded
+        Args:
+            workers (int): The number of writer threads (default is 4)
+            queue_size (int): The maximum number of pending images (default is 64)
+            params (list): Encoding parameters passed to cv2.imwrite (default is None)
+        """
+        self.params = params or []
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.failures = []
+        self.closed = False
+        self.threads = [threading.Thread(target=self.work, daemon=True)
+                        for _ in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def submit(self, image_path: str, image) -> None:
+        """
+        Queue an image for writing, blocks while the queue is full
+        Args:
+            image_path (str): The path to write the image to
+            image (np.ndarray): The BGR image
+        """
+        self.queue.put((image_path, image))
+
+    def work(self) -> None:
+        """
+        Write queued images until the stop marker is received
+        """
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            image_path, image = item
+            try:
+                if not cv2.imwrite(image_path, image, self.params):
+                    self.failures.append((image_path, "cv2.imwrite returned False"))
+            except Exception as error:
+                self.failures.append((image_path, repr(error)))
+
+    def close(self) -> list:
+        """
+        Wait until every queued image is written and stop the writer threads
+        Returns:
+            list: The (image_path, error) pairs of images that could not be written
+        """
+        if self.closed:
+            return self.failures
+        self.closed = True
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        return self.failures
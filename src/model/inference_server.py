@@ -0,0 +1,252 @@
+import asyncio
+import base64
+import json
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import cv2
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large",
+           500: "Internal Server Error", 503: "Service Unavailable", 504: "Gateway Timeout"}
+
+
+class InferenceServer:
+    def __init__(self, detection, host: str = "127.0.0.1", port: int = 8000, unix_socket: str = None,
+                 max_batch_size: int = 8, max_wait_ms: float = 5.0, max_queue: int = 64,
+                 request_timeout: float = 5.0, max_body_size: int = 32 << 20) -> None:
+        """
+        Initialize the InferenceServer, an asyncio HTTP service sharing one warm model between many
+        clients. Concurrent requests are coalesced into micro-batches.
+        POST /detect takes one JPEG body, POST /detect_batch takes {"images": [base64 JPEG, ...]},
+        GET /health and GET /metrics report the state of the server
+        Args:
+            detection (Detection): The detection whose model is served
+            host (str): The address to listen on (default is "127.0.0.1")
+            port (int): The port to listen on (default is 8000)
+            unix_socket (str): Listen on this Unix socket instead of host and port (default is None)
+            max_batch_size (int): The maximum number of frames per inference call (default is 8)
+            max_wait_ms (float): How long the first frame of a batch waits for more (default is 5.0)
+            max_queue (int): Frames waiting beyond this are rejected with 503, and requests with more
+                frames than this with 413 (default is 64)
+            request_timeout (float): Seconds before a request is answered with 504 (default is 5.0)
+            max_body_size (int): The maximum request body in bytes (default is 32 MiB)
+        """
+        self.detection = detection
+        self.host = host
+        self.port = port
+        self.unix_socket = unix_socket
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue = max_queue
+        self.request_timeout = request_timeout
+        self.max_body_size = max_body_size
+        self.model = None
+        self.queue = None
+        # The model runs on one thread, batches are the unit of parallelism
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    def run(self) -> None:
+        """
+        Load the model and serve until interrupted
+        """
+        asyncio.run(self.serve())
+
+    async def serve(self) -> None:
+        """
+        Load the model, start the batching loop and accept connections
+        """
+        loop = asyncio.get_running_loop()
+        self.model = await loop.run_in_executor(self.executor, self.detection.load)
+        self.queue = asyncio.Queue(maxsize=self.max_queue)
+        batcher = asyncio.create_task(self.batch_loop())
+
+        if self.unix_socket:
+            server = await asyncio.start_unix_server(self.handle_connection, self.unix_socket)
+        else:
+            server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+
+    async def batch_loop(self) -> None:
+        """
+        Collect queued frames into batches of up to max_batch_size, waiting at most max_wait
+        after the first frame, and resolve every request with its detections
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            # Requests that already timed out are not inferred
+            batch = [(frame, future) for frame, future in batch if not future.done()]
+            if not batch:
+                continue
+            self.detection.metrics.set_gauge("server_queue_depth", self.queue.qsize())
+            self.detection.metrics.set_gauge("server_batch_size", len(batch))
+            self.detection.metrics.increment("server_batches")
+            try:
+                results = await loop.run_in_executor(self.executor, self.infer, [frame for frame, _ in batch])
+            except Exception as error:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def infer(self, frames: list) -> list:
+        """
+        Run one batch through the model
+        Args:
+            frames (list): The BGR frames
+        Returns:
+            list: The detections of every frame
+        """
+        with self.detection.metrics.stage("infer"):
+            results = self.model(frames, imgsz=self.detection.imgsz, verbose=False)
+        detections = []
+        for result in results:
+            boxes, confidences, class_ids = self.detection.extract_detections(result)
+            detections.append([{"class_id": int(class_id), "class_name": self.model.names.get(int(class_id), ""),
+                                "confidence": round(float(confidence), 4),
+                                "box": [round(value, 1) for value in box]}
+                               for box, confidence, class_id in zip(boxes.tolist(), confidences, class_ids)])
+            self.detection.metrics.frame()
+        return detections
+
+    async def submit(self, frames: list) -> tuple:
+        """
+        Queue frames for inference and wait for their detections
+        Args:
+            frames (list): The BGR frames
+        Returns:
+            tuple: The HTTP status and the response body
+        """
+        if len(frames) > self.max_queue:
+            # Waiting would never help, the batch does not fit into an empty queue
+            self.detection.metrics.increment("server_rejected", len(frames))
+            return 413, {"error": f"at most {self.max_queue} images per request"}
+        if self.queue.qsize() + len(frames) > self.max_queue:
+            self.detection.metrics.increment("server_rejected", len(frames))
+            return 503, {"error": "server overloaded, retry later"}
+
+        loop = asyncio.get_running_loop()
+        futures = []
+        for frame in frames:
+            future = loop.create_future()
+            self.queue.put_nowait((frame, future))
+            futures.append(future)
+        try:
+            results = await asyncio.wait_for(asyncio.gather(*futures), self.request_timeout)
+        except asyncio.TimeoutError:
+            self.detection.metrics.increment("server_timeouts")
+            return 504, {"error": "request timed out"}
+        except Exception as error:
+            return 500, {"error": repr(error)}
+        return 200, {"results": results}
+
+    async def route(self, method: str, path: str, body: bytes) -> tuple:
+        """
+        Answer one request
+        Args:
+            method (str): The HTTP method
+            path (str): The request path
+            body (bytes): The request body
+        Returns:
+            tuple: The HTTP status, the response body and its content type
+        """
+        loop = asyncio.get_running_loop()
+        if method == "GET" and path == "/health":
+            return 200, {"status": "ok", "queue": self.queue.qsize()}, "application/json"
+        if method == "GET" and path == "/metrics":
+            return 200, self.detection.metrics.to_prometheus(), "text/plain; version=0.0.4"
+
+        if method == "POST" and path in ("/detect", "/detect_batch"):
+            try:
+                if path == "/detect":
+                    images = [body]
+                else:
+                    images = [base64.b64decode(image) for image in json.loads(body)["images"]]
+                frames = await loop.run_in_executor(None, self.decode, images)
+            except (ValueError, KeyError, TypeError) as error:
+                return 400, {"error": str(error)}, "application/json"
+            status, response = await self.submit(frames)
+            if status == 200 and path == "/detect":
+                response = {"detections": response["results"][0]}
+            return status, response, "application/json"
+        return 404, {"error": f"no route for {method} {path}"}, "application/json"
+
+    def decode(self, images: list) -> list:
+        """
+        Decode JPEG images
+        Args:
+            images (list): The encoded images
+        Returns:
+            list: The BGR frames
+        """
+        frames = [cv2.imdecode(np.frombuffer(image, np.uint8), cv2.IMREAD_COLOR) for image in images]
+        if not frames or any(frame is None for frame in frames):
+            raise ValueError("body is not a valid JPEG image")
+        return frames
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Serve the HTTP/1.1 requests of one connection, keeping it open between requests
+        Args:
+            reader (asyncio.StreamReader): The connection reader
+            writer (asyncio.StreamWriter): The connection writer
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                if length > self.max_body_size:
+                    status, response, content_type = 413, {"error": "body too large"}, "application/json"
+                    await self.respond(writer, status, response, content_type, close=True)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                status, response, content_type = await self.route(method, path, body)
+                close = headers.get("connection", "").lower() == "close"
+                await self.respond(writer, status, response, content_type, close)
+                if close:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, writer: asyncio.StreamWriter, status: int, response, content_type: str,
+                      close: bool = False) -> None:
+        """
+        Write one HTTP response
+        Args:
+            writer (asyncio.StreamWriter): The connection writer
+            status (int): The HTTP status
+            response (dict | str): The response, dicts are sent as JSON
+            content_type (str): The content type of the response
+            close (bool): Ask the client to close the connection (default is False)
+        """
+        body = (json.dumps(response, ensure_ascii=False) if isinstance(response, dict) else response).encode()
+        head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: {'close' if close else 'keep-alive'}\r\n\r\n")
+        writer.write(head.encode() + body)
+        await writer.drain()
@@ -0,0 +1,186 @@
+import glob
+import json
+import os
+import numpy as np
+from src.common.constans import IMAGES, JPG, LABELS, PNG, READ, TXT, WRITE
+from src.model.box_ops import format_yolo_lines, parse_yolo_lines
+from src.model.read_write import ReadWriteFile
+
+BOXES_FILE = "boxes.npy"
+OFFSETS_FILE = "offsets.npy"
+META_FILE = "meta.json"
+
+
+class LabelIndex:
+    def __init__(self, index_folder: str, dataset_folder: str) -> None:
+        """
+        Initialize the LabelIndex, all YOLO boxes of dataset_folder/<split>/labels packed into one
+        (N, 5) float32 array with CSR style offsets per label file, so the boxes of file i are
+        boxes[offsets[i]:offsets[i + 1]]
+        Args:
+            index_folder (str): The folder to store boxes.npy, offsets.npy and meta.json
+            dataset_folder (str): The dataset folder containing the split folders
+        """
+        self.index_folder = index_folder
+        self.dataset_folder = dataset_folder
+        self.boxes = np.zeros((0, 5), dtype=np.float32)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.files = []
+        if os.path.exists(os.path.join(index_folder, META_FILE)):
+            self.load()
+
+    def load(self) -> None:
+        """
+        Memory-map the stored index
+        """
+        with open(os.path.join(self.index_folder, META_FILE), READ) as file:
+            self.files = json.load(file)["files"]
+        self.boxes = np.load(os.path.join(self.index_folder, BOXES_FILE), mmap_mode=READ)
+        self.offsets = np.load(os.path.join(self.index_folder, OFFSETS_FILE))
+
+    def save(self) -> None:
+        """
+        Write the index, every file is written to a temporary file first and then swapped in
+        """
+        os.makedirs(self.index_folder, exist_ok=True)
+        for name, array in [(BOXES_FILE, self.boxes), (OFFSETS_FILE, self.offsets)]:
+            tmp_path = os.path.join(self.index_folder, name + ".tmp")
+            with open(tmp_path, "wb") as file:
+                np.save(file, array)
+            os.replace(tmp_path, os.path.join(self.index_folder, name))
+
+        tmp_path = os.path.join(self.index_folder, META_FILE + ".tmp")
+        with open(tmp_path, WRITE) as file:
+            json.dump({"dataset_folder": self.dataset_folder, "files": self.files}, file)
+        os.replace(tmp_path, os.path.join(self.index_folder, META_FILE))
+
+    def scan(self) -> list:
+        """
+        List the label files of the dataset with their split, image path and stat
+        Returns:
+            list: One dict per label file sorted by label path
+        """
+        files = []
+        for label_folder in sorted(glob.glob(os.path.join(self.dataset_folder, "*", LABELS))):
+            split_folder = os.path.dirname(label_folder)
+            image_folder = os.path.join(split_folder, IMAGES)
+            images = {os.path.splitext(f)[0]: f for f in os.listdir(image_folder)
+                      if f.endswith(JPG) or f.endswith(PNG)} if os.path.isdir(image_folder) else {}
+
+            with os.scandir(label_folder) as entries:
+                for entry in sorted(entries, key=lambda entry: entry.name):
+                    if not entry.name.endswith(TXT):
+                        continue
+                    stem = os.path.splitext(entry.name)[0]
+                    stat = entry.stat()
+                    files.append({
+                        "label": entry.path,
+                        "image": os.path.join(image_folder, images.get(stem, stem + JPG)),
+                        "split": os.path.basename(split_folder),
+                        "mtime": stat.st_mtime_ns,
+                        "size": stat.st_size,
+                    })
+        return files
+
+    def update(self) -> int:
+        """
+        Bring the index up to date, only label files whose mtime or size changed are parsed again
+        Returns:
+            int: The number of label files parsed
+        """
+        known = {record["label"]: i for i, record in enumerate(self.files)}
+        files = self.scan()
+
+        parts = []
+        parsed = 0
+        for record in files:
+            i = known.get(record["label"])
+            old = self.files[i] if i is not None else None
+            if old and old["mtime"] == record["mtime"] and old["size"] == record["size"]:
+                parts.append(self.boxes[self.offsets[i]:self.offsets[i + 1]])
+            else:
+                content = ReadWriteFile(record["label"], self.index_folder).read_file()
+                parts.append(parse_yolo_lines(content).astype(np.float32))
+                parsed += 1
+
+        counts = [len(part) for part in parts]
+        offsets = np.zeros(len(files) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        self.boxes = np.concatenate(parts) if parts else np.zeros((0, 5), dtype=np.float32)
+        self.offsets = offsets
+        # Drop the views of the old memory map before it is replaced on disk
+        del parts
+        self.files = files
+        self.save()
+        self.load()
+        return parsed
+
+    def file_ids(self) -> np.ndarray:
+        """
+        Get the index of the label file of every box
+        Returns:
+            np.ndarray: (N,) file index per box
+        """
+        return np.repeat(np.arange(len(self.files)), np.diff(self.offsets))
+
+    def query(self, classes: list = None, splits: list = None, min_area: float = None,
+              max_area: float = None) -> tuple:
+        """
+        Select boxes by class, split and normalized box area
+        Args:
+            classes (list): Keep only these classes (default is None)
+            splits (list): Keep only these splits, e.g. ["train"] (default is None)
+            min_area (float): The minimum width * height in 0-1 (default is None)
+            max_area (float): The maximum width * height in 0-1 (default is None)
+        Returns:
+            tuple: The selected (K, 5) boxes and the image path of each of them
+        """
+        mask = np.ones(len(self.boxes), dtype=bool)
+        file_ids = self.file_ids()
+        if classes is not None:
+            mask &= np.isin(self.boxes[:, 0], classes)
+        if splits is not None:
+            in_split = np.array([record["split"] in splits for record in self.files], dtype=bool)
+            mask &= in_split[file_ids]
+        area = self.boxes[:, 3] * self.boxes[:, 4]
+        if min_area is not None:
+            mask &= area >= min_area
+        if max_area is not None:
+            mask &= area <= max_area
+        return np.asarray(self.boxes[mask]), [self.files[i]["image"] for i in file_ids[mask]]
+
+    def class_counts(self, num_classes: int = 13, splits: list = None) -> np.ndarray:
+        """
+        Count the boxes of every class
+        Args:
+            num_classes (int): The number of classes (default is 13)
+            splits (list): Count only these splits (default is None)
+        Returns:
+            np.ndarray: (num_classes,) number of boxes per class
+        """
+        boxes, _ = self.query(splits=splits)
+        return np.bincount(boxes[:, 0].astype(np.int64), minlength=num_classes)
+
+    def relabel(self, mapping: dict) -> int:
+        """
+        Rewrite the class of every box in the label files, e.g. to merge classes
+        Args:
+            mapping (dict): Mapping of old class -> new class
+        Returns:
+            int: The number of label files rewritten
+        """
+        boxes = np.array(self.boxes)
+        lookup = np.arange(max([*mapping, *mapping.values(), int(boxes[:, 0].max(initial=0))]) + 1)
+        lookup[list(mapping)] = list(mapping.values())
+        boxes[:, 0] = lookup[boxes[:, 0].astype(np.int64)]
+
+        changed = np.flatnonzero(boxes[:, 0] != self.boxes[:, 0])
+        file_ids = np.unique(self.file_ids()[changed])
+        for i in file_ids:
+            # Label files keep full precision, the index itself stores float32
+            path = self.files[i]["label"]
+            lines = parse_yolo_lines(ReadWriteFile(path, self.index_folder).read_file())
+            lines[:, 0] = lookup[lines[:, 0].astype(np.int64)]
+            ReadWriteFile(path, self.index_folder).write_to_file(format_yolo_lines(lines))
+        self.update()
+        return len(file_ids)
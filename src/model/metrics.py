@@ -0,0 +1,225 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from src.common.constans import WRITE
+
+PERCENTILES = (50, 95, 99)
+
+
+class Metrics:
+    def __init__(self, prefix: str = "traffic_sign", window: int = 1000, log_interval: float = None,
+                 prometheus_path: str = None, prometheus_port: int = None, log_stream=None) -> None:
+        """
+        Initialize the Metrics, per-stage latency timers with rolling percentiles, fps, counters and
+        gauges. They are exported as a periodic JSON log line, a Prometheus text file and/or a
+        Prometheus HTTP endpoint
+        Args:
+            prefix (str): The prefix of the Prometheus metric names (default is "traffic_sign")
+            window (int): The number of latest samples kept per stage (default is 1000)
+            log_interval (float): Seconds between two exports, None disables them (default is None)
+            prometheus_path (str): Text file rewritten with the Prometheus metrics on every export
+                (default is None)
+            prometheus_port (int): Port of an HTTP endpoint serving the Prometheus metrics (default is None)
+            log_stream (io.TextIOBase): Stream every export writes the JSON log line to, e.g. sys.stderr
+                or an open file (default is None, no log line)
+        """
+        self.prefix = prefix
+        self.window = window
+        self.log_interval = log_interval
+        self.prometheus_path = prometheus_path
+        self.log_stream = log_stream
+        self.lock = threading.Lock()
+        self.timings = {}
+        # Running sample count and sum of every stage, the window only holds the latest samples
+        self.totals = {}
+        self.counters = {}
+        self.gauges = {}
+        self.frame_times = deque(maxlen=window)
+        self.last_export = time.monotonic()
+        self.server = None
+        if prometheus_port is not None:
+            self.serve(prometheus_port)
+
+    def __getstate__(self):
+        # Worker processes get a copy without the lock and the HTTP server
+        state = self.__dict__.copy()
+        del state["lock"]
+        state["server"] = None
+        state["log_stream"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Time the enclosed block as one sample of a stage
+        Args:
+            name (str): The name of the stage
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def observe(self, name: str, seconds: float) -> None:
+        """
+        Add a latency sample to a stage
+        Args:
+            name (str): The name of the stage
+            seconds (float): The latency
+        """
+        with self.lock:
+            self.timings.setdefault(name, deque(maxlen=self.window)).append(seconds)
+            count, total = self.totals.get(name, (0, 0.0))
+            self.totals[name] = (count + 1, total + seconds)
+
+    def increment(self, name: str, value: float = 1) -> None:
+        """
+        Increase a counter
+        Args:
+            name (str): The name of the counter
+            value (float): The increment (default is 1)
+        """
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """
+        Set a gauge, e.g. a queue depth
+        Args:
+            name (str): The name of the gauge
+            value (float): The current value
+        """
+        with self.lock:
+            self.gauges[name] = value
+
+    def throughput(self, name: str, items: int, seconds: float) -> None:
+        """
+        Report a batch of work, e.g. a DataAugment or AdjustBoundingBoxes run
+        Args:
+            name (str): The name of the stage
+            items (int): The number of processed items
+            seconds (float): The time the batch took
+        """
+        self.observe(name, seconds)
+        self.increment(f"{name}_items", items)
+        self.set_gauge(f"{name}_items_per_second", items / seconds if seconds else 0.0)
+
+    def frame(self) -> None:
+        """
+        Mark a processed frame and export the metrics when the log interval has passed
+        """
+        with self.lock:
+            self.frame_times.append(time.monotonic())
+            self.counters["frames"] = self.counters.get("frames", 0) + 1
+        if self.log_interval is not None and time.monotonic() - self.last_export >= self.log_interval:
+            self.export()
+
+    def fps(self) -> float:
+        """
+        Get the rolling frame rate over the latest frames
+        Returns:
+            float: Frames per second
+        """
+        with self.lock:
+            if len(self.frame_times) < 2:
+                return 0.0
+            return (len(self.frame_times) - 1) / max(self.frame_times[-1] - self.frame_times[0], 1e-9)
+
+    def snapshot(self) -> dict:
+        """
+        Get the current value of every metric
+        Returns:
+            dict: The stage latencies in milliseconds over the window, the total sample count and
+                seconds of every stage, fps, counters and gauges
+        """
+        fps = self.fps()
+        with self.lock:
+            stages = {}
+            for name, samples in self.timings.items():
+                values = np.fromiter(samples, dtype=float) * 1000
+                total_count, total_seconds = self.totals[name]
+                stages[name] = {"count": len(values), "mean_ms": float(values.mean()),
+                                **{f"p{p}_ms": float(np.percentile(values, p)) for p in PERCENTILES},
+                                "total_count": total_count, "total_seconds": total_seconds}
+            return {"time": time.time(), "fps": fps, "stages": stages,
+                    "counters": dict(self.counters), "gauges": dict(self.gauges)}
+
+    def to_json(self) -> str:
+        """
+        Format the metrics as one JSON log line
+        Returns:
+            str: The JSON line
+        """
+        return json.dumps(self.snapshot())
+
+    def to_prometheus(self) -> str:
+        """
+        Format the metrics in the Prometheus text exposition format
+        Returns:
+            str: The metrics text
+        """
+        snapshot = self.snapshot()
+        lines = [f"# TYPE {self.prefix}_fps gauge", f"{self.prefix}_fps {snapshot['fps']}"]
+        latency = f"{self.prefix}_stage_latency_seconds"
+        lines.append(f"# TYPE {latency} summary")
+        for name, stage in snapshot["stages"].items():
+            for p in PERCENTILES:
+                lines.append(f'{latency}{{stage="{name}",quantile="{p / 100}"}} {stage[f"p{p}_ms"] / 1000}')
+            lines.append(f'{latency}_sum{{stage="{name}"}} {stage["total_seconds"]}')
+            lines.append(f'{latency}_count{{stage="{name}"}} {stage["total_count"]}')
+        for name, value in snapshot["counters"].items():
+            lines += [f"# TYPE {self.prefix}_{name}_total counter", f"{self.prefix}_{name}_total {value}"]
+        for name, value in snapshot["gauges"].items():
+            lines += [f"# TYPE {self.prefix}_{name} gauge", f"{self.prefix}_{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def export(self) -> str:
+        """
+        Write the JSON log line to the log stream and rewrite the Prometheus text file
+        Returns:
+            str: The JSON log line
+        """
+        self.last_export = time.monotonic()
+        line = self.to_json()
+        if self.log_stream is not None:
+            self.log_stream.write(line + "\n")
+            self.log_stream.flush()
+        if self.prometheus_path:
+            tmp_path = self.prometheus_path + ".tmp"
+            with open(tmp_path, WRITE) as file:
+                file.write(self.to_prometheus())
+            os.replace(tmp_path, self.prometheus_path)
+        return line
+
+    def serve(self, port: int) -> None:
+        """
+        Serve the Prometheus metrics over HTTP from a background thread
+        Args:
+            port (int): The port to listen on
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.to_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("", port), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
@@ -0,0 +1,167 @@
+import os
+import queue
+import threading
+import time
+from src.model.detection_sink import DetectionSink
+from src.model.frame_reader import FrameReader
+from src.model.metrics import Metrics
+
+ROUND_ROBIN = "round_robin"
+DEADLINE = "deadline"
+
+
+def is_live(source) -> bool:
+    """
+    Tell live sources from local video files
+    Args:
+        source (str | int): The video file, stream URL or camera index
+    Returns:
+        bool: True for camera indexes and URLs such as rtsp:// or http://
+    """
+    return isinstance(source, int) or str(source).isdigit() or "://" in str(source)
+
+
+class StreamReader(FrameReader):
+    def __init__(self, source: str, stream_id: int, ready: threading.Event, queue_size: int,
+                 metrics: Metrics, drop_oldest: bool) -> None:
+        """
+        Initialize the StreamReader, a FrameReader stamping every frame with its arrival time and
+        waking the scheduler up when a frame is queued
+        Args:
+            source (str): The video file or stream URL
+            stream_id (int): The index of the source
+            ready (threading.Event): Set whenever a frame or the end marker is queued
+            queue_size (int): The maximum number of decoded frames waiting
+            metrics (Metrics): Collects the decode latency, queue depth and dropped frames
+            drop_oldest (bool): Drop the oldest frame instead of waiting when the queue is full
+        """
+        super().__init__(source, queue_size, metrics, drop_oldest)
+        self.stream_id = stream_id
+        self.ready = ready
+        self.queue_gauge = f"queue_depth_stream_{stream_id}"
+
+    def put(self, item) -> None:
+        """
+        Queue an item as (frame index, timestamp, frame, arrival time), or None at the end
+        Args:
+            item (tuple): The (frame index, timestamp, frame) item or None
+        """
+        super().put(item if item is None else (*item, time.monotonic()))
+        self.ready.set()
+
+
+class MultiStreamScheduler:
+    def __init__(self, detection, sources: list, batch_size: int = 8, policy: str = ROUND_ROBIN,
+                 queue_size: int = 4, max_age: float = 1.0, drop_oldest: bool = None) -> None:
+        """
+        Initialize the MultiStreamScheduler, running many video sources through one model.
+        Every source is decoded on its own reader thread into a small queue, and the frames
+        of all streams are scheduled into shared batches
+        Args:
+            detection (Detection): The detection whose model is shared
+            sources (list): Video files or stream URLs
+            batch_size (int): The maximum number of frames per inference call (default is 8)
+            policy (str): "round_robin" takes one frame per stream in turn, "deadline" takes the
+                oldest frames first (default is "round_robin")
+            queue_size (int): The maximum number of decoded frames waiting per stream (default is 4)
+            max_age (float): Frames of dropping streams waiting longer than this many seconds are
+                dropped as stale, None keeps every frame (default is 1.0)
+            drop_oldest (bool): Readers drop their oldest frame instead of waiting when their queue
+                is full (default is None, live streams and cameras drop, local files wait so every
+                frame is processed)
+        """
+        if policy not in (ROUND_ROBIN, DEADLINE):
+            raise ValueError(f"Unknown policy {policy}, expected {ROUND_ROBIN} or {DEADLINE}")
+        self.detection = detection
+        self.sources = sources
+        self.batch_size = batch_size
+        self.policy = policy
+        self.queue_size = queue_size
+        self.max_age = max_age
+        self.drop_oldest = drop_oldest
+        self.metrics = detection.metrics
+        self.ready = threading.Event()
+        self.readers = []
+        self.heads = {}
+        self.finished = set()
+        self.next_stream = 0
+
+    def fill_heads(self) -> None:
+        """
+        Take the next frame of every stream without one waiting, dropping stale frames
+        """
+        for reader in self.readers:
+            stream_id = reader.stream_id
+            while stream_id not in self.heads and stream_id not in self.finished:
+                try:
+                    item = reader.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self.finished.add(stream_id)
+                elif reader.drop_oldest and self.max_age is not None and time.monotonic() - item[3] > self.max_age:
+                    self.metrics.increment("stale_frames")
+                else:
+                    self.heads[stream_id] = item
+
+    def next_batch(self) -> list:
+        """
+        Schedule the next batch with the selected policy, waiting until a frame is available
+        Returns:
+            list: (stream id, frame index, timestamp, frame) items, empty when every stream ended
+        """
+        batch = []
+        while len(batch) < self.batch_size:
+            self.ready.clear()
+            self.fill_heads()
+            if not self.heads:
+                if batch or len(self.finished) == len(self.readers):
+                    break
+                self.ready.wait(0.05)
+                continue
+
+            if self.policy == ROUND_ROBIN:
+                count = len(self.readers)
+                order = [(self.next_stream + i) % count for i in range(count)]
+                stream_id = next(i for i in order if i in self.heads)
+                self.next_stream = (stream_id + 1) % count
+            else:
+                stream_id = min(self.heads, key=lambda i: self.heads[i][3])
+            index, timestamp, frame, _ = self.heads.pop(stream_id)
+            batch.append((stream_id, index, timestamp, frame))
+        return batch
+
+    def run(self, output_folder: str) -> list:
+        """
+        Detect objects on all streams until every one of them ended, writing the detections of
+        stream i to output_folder/stream_<i>.jsonl
+        Args:
+            output_folder (str): The folder for the detection files
+        Returns:
+            list: The number of processed frames of every stream
+        """
+        os.makedirs(output_folder, exist_ok=True)
+        model = self.detection.load()
+        self.readers = [StreamReader(source, i, self.ready, self.queue_size, self.metrics,
+                                     is_live(source) if self.drop_oldest is None else self.drop_oldest)
+                        for i, source in enumerate(self.sources)]
+        sinks = [DetectionSink(os.path.join(output_folder, f"stream_{i}.jsonl"), model.names)
+                 for i in range(len(self.sources))]
+        processed = [0] * len(self.sources)
+        for reader in self.readers:
+            reader.start()
+
+        try:
+            while batch := self.next_batch():
+                with self.metrics.stage("infer"):
+                    results = model([frame for _, _, _, frame in batch], imgsz=self.detection.imgsz, verbose=False)
+                for (stream_id, index, timestamp, _), result in zip(batch, results):
+                    sinks[stream_id].write(index, timestamp, *self.detection.extract_detections(result))
+                    processed[stream_id] += 1
+                    self.metrics.frame()
+        finally:
+            for reader in self.readers:
+                reader.stop()
+            for sink in sinks:
+                sink.close()
+        return processed
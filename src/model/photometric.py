@@ -0,0 +1,209 @@
+import zlib
+from PIL import Image
+import numpy as np
+import cv2
+
+LEVELS = np.arange(256, dtype=np.float32)
+
+
+def apply_lut(images: np.ndarray, lut: np.ndarray) -> np.ndarray:
+    """
+    Map every uint8 value of an image or a batch of images through a lookup table
+    Args:
+        images (np.ndarray): (H, W, C) image or (N, H, W, C) batch, uint8
+        lut (np.ndarray): (256,) uint8 table
+    Returns:
+        np.ndarray: The mapped images with the same shape
+    """
+    flat = np.ascontiguousarray(images).reshape(-1, images.shape[-2], images.shape[-1])
+    return cv2.LUT(flat, lut).reshape(images.shape)
+
+
+def blend_lut(degenerate: float, factor: float) -> np.ndarray:
+    """
+    Build the table of PIL Image.blend(degenerate, image, factor) for a constant degenerate image.
+    PIL blends in float32 and truncates, so the table does too
+    Args:
+        degenerate (float): The value of the degenerate image
+        factor (float): The blend factor, 1 keeps the image
+    Returns:
+        np.ndarray: (256,) uint8 table
+    """
+    degenerate = np.float32(degenerate)
+    values = degenerate + np.float32(factor) * (LEVELS - degenerate)
+    return np.trunc(values).clip(0, 255).astype(np.uint8)
+
+
+def brightness_lut(factor: float) -> np.ndarray:
+    """
+    Build the table of ImageEnhance.Brightness
+    Args:
+        factor (float): The brightness factor, 1 keeps the image
+    Returns:
+        np.ndarray: (256,) uint8 table
+    """
+    return blend_lut(0, factor)
+
+
+def contrast_lut(mean: int, factor: float) -> np.ndarray:
+    """
+    Build the table of ImageEnhance.Contrast for an image with the given gray mean
+    Args:
+        mean (int): The rounded mean of the grayscale image, see gray_mean
+        factor (float): The contrast factor, 1 keeps the image
+    Returns:
+        np.ndarray: (256,) uint8 table
+    """
+    return blend_lut(mean, factor)
+
+
+def gray_mean(images: np.ndarray) -> np.ndarray:
+    """
+    Get the rounded mean of every image converted to grayscale, as ImageEnhance.Contrast does
+    Args:
+        images (np.ndarray): (H, W, 3) RGB or (H, W) gray image, or a batch of them, uint8
+    Returns:
+        np.ndarray: The mean of the image, or (N,) means of the batch
+    """
+    if images.shape[-1] == 3:
+        # The PIL conversion to L with its 16 bit fixed point weights is exact and faster than numpy
+        flat = images.reshape(-1, *images.shape[-3:])
+        totals = np.array([np.asarray(Image.fromarray(image).convert("L")).sum(dtype=np.uint64)
+                           for image in flat], dtype=np.uint64).reshape(images.shape[:-3])
+        pixels = images.shape[-3] * images.shape[-2]
+    else:
+        pixels = images.shape[-2] * images.shape[-1]
+        totals = images.reshape(*images.shape[:-2], pixels).sum(axis=-1, dtype=np.uint64)
+    return (totals / pixels + 0.5).astype(np.int64)
+
+
+def adjust_brightness(images: np.ndarray, factor: float) -> np.ndarray:
+    """
+    Change the brightness of an image or a batch of images with one table lookup
+    Args:
+        images (np.ndarray): (H, W, C) image or (N, H, W, C) batch, uint8
+        factor (float): The brightness factor, same result as ImageEnhance.Brightness
+    Returns:
+        np.ndarray: The adjusted images
+    """
+    return apply_lut(images, brightness_lut(factor))
+
+
+def adjust_contrast(images: np.ndarray, factor: float, batch: bool = None) -> np.ndarray:
+    """
+    Change the contrast of an image or a batch of RGB images with one table lookup per image
+    Args:
+        images (np.ndarray): (H, W, 3) RGB image, (H, W) gray image or a batch of them, uint8
+        factor (float): The contrast factor, same result as ImageEnhance.Contrast
+        batch (bool): Whether the first axis is the batch, by default 4 dimensional and
+            3 dimensional non RGB arrays are batches (default is None)
+    Returns:
+        np.ndarray: The adjusted images
+    """
+    if batch is None:
+        batch = images.ndim == 4 or (images.ndim == 3 and images.shape[-1] != 3)
+    means = gray_mean(images)
+    if not batch:
+        images, means = images[None], [means]
+
+    output = np.empty_like(images)
+    for i, mean in enumerate(means):
+        image = images[i] if images.ndim == 4 else images[i][..., None]
+        output[i] = apply_lut(image, contrast_lut(mean, factor)).reshape(output[i].shape)
+    return output if batch else output[0]
+
+
+def image_key(image: np.ndarray, samples: int = 64) -> int:
+    """
+    Compute a key identifying an image from its shape and a grid of its pixels, the same in every
+    process. Hashing every pixel would cost more than adding the noise
+    Args:
+        image (np.ndarray): The image
+        samples (int): The number of sampled rows and columns (default is 64)
+    Returns:
+        int: The CRC-32 of the shape and of the sampled pixels
+    """
+    step_y = max(1, image.shape[0] // samples)
+    step_x = max(1, image.shape[1] // samples)
+    grid = np.ascontiguousarray(image[::step_y, ::step_x])
+    return zlib.crc32(grid, zlib.crc32(repr(image.shape).encode()))
+
+
+class NoiseBank:
+    def __init__(self, sigma: float = 25.0, size: int = 640 * 640 * 3 * 4, seed: int = 0) -> None:
+        """
+        Initialize the NoiseBank, Gaussian noise rounded to int16 once and reused by taking
+        windows at random offsets, instead of drawing a float64 array for every image. The offset
+        of an image is derived from a key identifying it, so it does not depend on the process
+        or on the order the images are processed in
+        Args:
+            sigma (float): The standard deviation of the noise (default is 25.0)
+            size (int): The number of noise values, grown to the largest image seen
+                (default is four 640x640 RGB images)
+            seed (int): The seed of the noise values and of the offsets (default is 0)
+        """
+        self.sigma = sigma
+        self.size = size
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.bank = None
+
+    def __getstate__(self):
+        # Worker processes rebuild the same bank from the seed instead of receiving a copy
+        state = self.__dict__.copy()
+        state["bank"] = None
+        return state
+
+    def values(self, count: int) -> np.ndarray:
+        """
+        Get the noise values, building the bank on first use
+        Args:
+            count (int): The number of values needed by one image
+        Returns:
+            np.ndarray: (size,) int16 noise
+        """
+        if self.bank is None or len(self.bank) < count:
+            self.size = max(self.size, count)
+            generator = np.random.default_rng((self.seed, self.size))
+            noise = generator.standard_normal(self.size, dtype=np.float32)
+            noise *= np.float32(self.sigma)
+            self.bank = np.rint(noise).astype(np.int16)
+        return self.bank
+
+    def window(self, count: int, rng: np.random.Generator = None, key: int = None) -> np.ndarray:
+        """
+        Take a window of noise values at a random offset
+        Args:
+            count (int): The number of values
+            rng (np.random.Generator): Draws the offset, for reproducible noise (default is None)
+            key (int): Identifies the image, the offset is drawn from the seed of the bank and the
+                key when no rng is given (default is None, the generator of the bank)
+        Returns:
+            np.ndarray: (count,) int16 noise, a view of the bank
+        """
+        if rng is None and key is not None:
+            rng = np.random.default_rng((self.seed, key))
+        bank = self.values(count)
+        offset = int((rng or self.rng).integers(0, len(bank) - count + 1))
+        return bank[offset:offset + count]
+
+    def add(self, images: np.ndarray, rng: np.random.Generator = None, key: int = None) -> np.ndarray:
+        """
+        Add noise to an image or a batch of images, saturating at 0 and 255
+        Args:
+            images (np.ndarray): (H, W, C) image or (N, H, W, C) batch, uint8
+            rng (np.random.Generator): Draws the offsets, for reproducible noise (default is None)
+            key (int): Identifies the image, image i of a batch uses key + i (default is None,
+                a key computed from the shape and sampled pixels)
+        Returns:
+            np.ndarray: The noisy uint8 images
+        """
+        if images.ndim == 4:
+            return np.stack([self.add(image, rng, None if key is None else key + i)
+                             for i, image in enumerate(images)])
+        if rng is None and key is None:
+            key = image_key(images)
+        noisy = images.astype(np.int16)
+        noisy += self.window(images.size, rng, key).reshape(images.shape)
+        np.clip(noisy, 0, 255, out=noisy)
+        return noisy.astype(np.uint8)
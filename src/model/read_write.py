@@ -21,6 +21,13 @@ class ReadWriteFile:
             lines = file.readlines()
         return lines
 
+    def read_file(self) -> str:
+        """
+        Read the whole content of the file
+        """
+        with open(self.file_path, READ) as file:
+            return file.read()
+
     def write_to_file(self, data) -> None:
         """
         Write data to the file
@@ -0,0 +1,169 @@
+import warnings
+from PIL import Image, ImageDraw, ImageFont
+import numpy as np
+import cv2
+
+# Fonts tried in order when no font is given, all of them cover the Vietnamese diacritics
+FONTS = ("arial.ttf", "Arial.ttf", "Arial.Unicode.ttf", "DejaVuSans.ttf", "NotoSans-Regular.ttf")
+PALETTE = [(56, 56, 255), (151, 157, 255), (31, 112, 255), (29, 178, 255), (49, 210, 207), (10, 249, 72),
+           (23, 204, 146), (134, 219, 61), (52, 147, 26), (187, 212, 0), (168, 153, 44), (255, 194, 0),
+           (147, 69, 52), (255, 115, 100), (236, 24, 0), (255, 56, 132), (133, 0, 82), (255, 56, 203)]
+
+
+def load_font(font_path: str = None, font_size: int = 16) -> ImageFont.ImageFont:
+    """
+    Load a TrueType font, falling back to the first available font of FONTS and then, with a
+    warning, to the PIL default font, which has no Vietnamese diacritics
+    Args:
+        font_path (str): The path or name of a TrueType font (default is None)
+        font_size (int): The font size in pixels (default is 16)
+    Returns:
+        ImageFont.ImageFont: The font
+    """
+    candidates = ([font_path] if font_path else []) + list(FONTS)
+    for candidate in candidates:
+        try:
+            return ImageFont.truetype(candidate, font_size)
+        except OSError:
+            continue
+    warnings.warn(f"None of the fonts {', '.join(candidates)} could be loaded, the labels use the PIL default "
+                  "font and Vietnamese diacritics are not drawn", RuntimeWarning, stacklevel=2)
+    return ImageFont.load_default()
+
+
+def concatenated_ranges(starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """
+    Concatenate the ranges starts[i], ..., starts[i] + lengths[i] - 1 without a Python loop,
+    as the cumulative sum of ones restarted at the start of every range
+    Args:
+        starts (np.ndarray): (M,) first values
+        lengths (np.ndarray): (M,) positive lengths
+    Returns:
+        np.ndarray: The lengths.sum() values
+    """
+    ends = np.cumsum(lengths)
+    steps = np.ones(ends[-1], dtype=np.intp)
+    steps[0] = starts[0]
+    steps[ends[:-1]] = starts[1:] - starts[:-1] - lengths[:-1] + 1
+    return np.cumsum(steps)
+
+
+class BoxRenderer:
+    def __init__(self, class_names, font_path: str = None, font_size: int = 16, thickness: int = 2,
+                 show_confidence: bool = True) -> None:
+        """
+        Initialize the BoxRenderer, drawing the boxes and pasting the labels of a frame with one
+        indexed assignment each. Label glyphs are rendered once with PIL, so Vietnamese class names
+        are drawn correctly
+        Args:
+            class_names (dict | list): The class names, e.g. model.names or the names of data.yaml
+            font_path (str): The path or name of a TrueType font with Vietnamese glyphs (default is None)
+            font_size (int): The font size in pixels (default is 16)
+            thickness (int): The box line thickness (default is 2)
+            show_confidence (bool): Add the confidence to the labels (default is True)
+        """
+        self.class_names = dict(enumerate(class_names)) if isinstance(class_names, list) else dict(class_names)
+        self.font = load_font(font_path, font_size)
+        self.thickness = thickness
+        self.show_confidence = show_confidence
+        # BGR colors, the palette is in RGB
+        self.colors = {class_id: PALETTE[class_id % len(PALETTE)][::-1] for class_id in self.class_names}
+        self.glyphs = {}
+
+    def color(self, class_id: int) -> tuple:
+        """
+        Get the BGR color of a class
+        Args:
+            class_id (int): The class
+        Returns:
+            tuple: The BGR color
+        """
+        return self.colors.get(class_id, PALETTE[class_id % len(PALETTE)][::-1])
+
+    def glyph(self, class_id: int, percent: int = None) -> np.ndarray:
+        """
+        Get the rendered label of a class, white text on the class color. Labels are rendered once
+        per class and confidence percent and cached
+        Args:
+            class_id (int): The class
+            percent (int): The confidence in percent shown after the name (default is None)
+        Returns:
+            np.ndarray: The (H, W, 3) BGR label
+        """
+        key = (class_id, percent)
+        if key not in self.glyphs:
+            text = self.class_names.get(class_id, str(class_id))
+            if percent is not None:
+                text = f"{text} {percent}%"
+            left, top, right, bottom = self.font.getbbox(text)
+            label = Image.new("RGB", (right - left + 4, bottom - top + 4), self.color(class_id)[::-1])
+            ImageDraw.Draw(label).text((2 - left, 2 - top), text, font=self.font, fill=(255, 255, 255))
+            self.glyphs[key] = cv2.cvtColor(np.asarray(label), cv2.COLOR_RGB2BGR)
+        return self.glyphs[key]
+
+    def draw(self, frame: np.ndarray, boxes: np.ndarray, confidences: np.ndarray, class_ids: np.ndarray) -> np.ndarray:
+        """
+        Draw boxes and labels on a frame. The frame is modified in place and returned, pass a copy
+        to keep the original. The outlines and the labels of all boxes are written with a single
+        indexed assignment, the only Python loop is over the distinct labels
+        Args:
+            frame (np.ndarray): The BGR frame, modified in place
+            boxes (np.ndarray): (N, 4) boxes [x1, y1, x2, y2] in pixels
+            confidences (np.ndarray): (N,) confidences
+            class_ids (np.ndarray): (N,) classes
+        Returns:
+            np.ndarray: The annotated frame, the same array as frame
+        """
+        if len(boxes) == 0:
+            return frame
+        height, width = frame.shape[:2]
+        class_ids = np.asarray(class_ids).astype(int)
+        corners = np.rint(boxes).astype(int)
+
+        # Every label and box color is a source in one atlas of flattened pixels, a color is a
+        # row of width pixels
+        percents = (np.asarray(confidences) * 100).astype(int) if self.show_confidence else np.full(len(boxes), -1)
+        keys, label_ids = np.unique(np.stack([class_ids, percents], axis=1), axis=0, return_inverse=True)
+        glyphs = [self.glyph(int(class_id), None if percent < 0 else int(percent)) for class_id, percent in keys]
+        colors = np.array([self.color(class_id) for class_id in range(class_ids.max() + 1)], dtype=frame.dtype)
+        atlas = np.concatenate([glyph.reshape(-1, 3) for glyph in glyphs] + [np.repeat(colors, width, axis=0)])
+        sizes = np.array([glyph.shape[:2] for glyph in glyphs])
+        areas = sizes[:, 0] * sizes[:, 1]
+        label_ids = label_ids.ravel()
+        label_heights, label_widths = sizes[label_ids].T
+
+        # The outline of a box is four strips of thickness pixels centered on its edges
+        t = self.thickness
+        x1, y1 = corners[:, 0] - t // 2, corners[:, 1] - t // 2
+        x2, y2 = x1 + corners[:, 2] - corners[:, 0] + t, y1 + corners[:, 3] - corners[:, 1] + t
+        strips = np.stack([np.stack([x1, y1, x2, y1 + t], axis=1), np.stack([x1, y2 - t, x2, y2], axis=1),
+                           np.stack([x1, y1, x1 + t, y2], axis=1), np.stack([x2 - t, y1, x2, y2], axis=1)],
+                          axis=1).reshape(-1, 4)
+        # Labels above the box, or inside it at the top of the frame
+        top = np.where(corners[:, 1] >= label_heights, corners[:, 1] - label_heights, np.maximum(corners[:, 1], 0))
+        left = np.minimum(np.maximum(corners[:, 0], 0), np.maximum(width - label_widths, 0))
+        labels = np.stack([left, top, left + label_widths, top + label_heights], axis=1)
+
+        # Every row of a strip starts at its color, every row of a label at the next glyph row.
+        # The labels come last so they cover the outlines
+        rectangles = np.clip(np.concatenate([strips, labels]), 0, [width, height, width, height])
+        offsets = np.concatenate([np.repeat(areas.sum() + class_ids * width, 4), (np.cumsum(areas) - areas)[label_ids]])
+        strides = np.concatenate([np.zeros(4 * len(boxes), dtype=int), label_widths])
+        visible = (rectangles[:, 2] > rectangles[:, 0]) & (rectangles[:, 3] > rectangles[:, 1])
+        if not visible.any():
+            return frame
+        rectangles, offsets, strides = rectangles[visible], offsets[visible], strides[visible]
+
+        heights = rectangles[:, 3] - rectangles[:, 1]
+        owners = np.repeat(np.arange(len(rectangles)), heights)
+        rows = concatenated_ranges(np.zeros(len(rectangles), dtype=int), heights)
+        lengths = (rectangles[:, 2] - rectangles[:, 0])[owners]
+        targets = concatenated_ranges((rectangles[owners, 1] + rows) * width + rectangles[owners, 0], lengths)
+        sources = concatenated_ranges(offsets[owners] + rows * strides[owners], lengths)
+        # Pixels are moved as single 3 byte values, numpy copies them much faster than rows of 3
+        pixel = np.dtype((np.void, frame.shape[2] * frame.itemsize))
+        pixels = np.ascontiguousarray(frame).view(pixel).reshape(-1)
+        pixels[targets] = np.ascontiguousarray(atlas).view(pixel).reshape(-1)[sources]
+        if not np.shares_memory(pixels, frame):
+            frame[...] = pixels.view(frame.dtype).reshape(frame.shape)
+        return frame
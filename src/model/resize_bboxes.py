@@ -1,13 +1,16 @@
+import os
+import time
+import numpy as np
 import pybboxes as pbx
-from src.common.constans import WRITE
+from src.model.box_ops import format_yolo_lines, parse_yolo_lines, xyxy_to_yolo, yolo_to_xyxy
+from src.model.build_cache import BuildCache
+from src.model.metrics import Metrics
 from src.model.read_write import ReadWriteFile
-import sys
-sys.path.append(
-    r'E:\Traffic_Sign_Detection Thesis\Thesis---Traffic-Sign-Detection')
 
 
 class AdjustBoundingBoxes:
-    def __init__(self, folder_path: str,  annotation_paths: list, image_width: int, image_height: int):
+    def __init__(self, folder_path: str,  annotation_paths: list, image_width: int, image_height: int,
+                 metrics: Metrics = None):
         """
         Initialize the AdjustBoundingBoxes object
         Args:
@@ -15,12 +18,13 @@ class AdjustBoundingBoxes:
             annotation_paths (list): The list of paths to the annotation files
             image_width (int): The original width of the image
             image_height (int): The original height of the image
-
+            metrics (Metrics): Receives the throughput of every run as "labels" (default is None)
         """
         self.folder_path = folder_path
         self.annotation_paths = annotation_paths
         self.image_width = image_width
         self.image_height = image_height
+        self.metrics = metrics or Metrics()
 
     def calculate_center_and_size(self, yolo_annotation: list) -> tuple:
         """
@@ -112,18 +116,75 @@ class AdjustBoundingBoxes:
             annotations.append([label, normalized_bboxes])
         return annotations
 
-    def write_new_bboxes_to_annotations_file(self):
-        """
-        Write the new bounding boxes to the annotations file"""
-        for annotation_file_path in self.annotation_paths:
-            lines = ReadWriteFile(annotation_file_path,
-                                  self.folder_path).read_lines_in_file()
-            annotations = self.resize_bboxes_adjust(lines)
-            new_file_path = ReadWriteFile(
-                annotation_file_path, self.folder_path).create_new_file_path()
-            with open(new_file_path, WRITE) as file:
-                for annotation in annotations:
-                    label = annotation[0]
-                    center_x, center_y, box_width, box_height = annotation[1]
-                    file.write(f"{label} {center_x} {center_y} {
-                               box_width} {box_height}\n")
+    def load_boxes(self, annotation_paths: list = None) -> tuple:
+        """
+        Load every box of the annotation files into one array
+        Args:
+            annotation_paths (list): Load only these annotation files (default is None, all files)
+        Returns:
+            tuple: The (N, 5) boxes [label, center_x, center_y, width, height] and the (M + 1,)
+                offsets so that the boxes of file i are boxes[offsets[i]:offsets[i + 1]]
+        """
+        if annotation_paths is None:
+            annotation_paths = self.annotation_paths
+        contents = [ReadWriteFile(annotation_file_path, self.folder_path).read_file()
+                    for annotation_file_path in annotation_paths]
+        counts = [len(content.split()) // 5 for content in contents]
+        offsets = np.zeros(len(contents) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        return parse_yolo_lines(" ".join(contents)), offsets
+
+    def resize_bboxes_array(self, boxes: np.ndarray) -> np.ndarray:
+        """
+        Adjust all boxes to the 640x640 image at once, same result as resize_bboxes_adjust
+        Args:
+            boxes (np.ndarray): (N, 5) boxes [label, center_x, center_y, width, height]
+        Returns:
+            np.ndarray: (N, 5) adjusted boxes
+        """
+        width_scale, height_scale = self.calculate_ratio()
+        corners = yolo_to_xyxy(boxes[:, 1:], self.image_width, self.image_height)
+        corners *= [width_scale, height_scale, width_scale, height_scale]
+        resized_bboxes = np.trunc(corners)
+
+        adjusted = np.empty_like(boxes)
+        adjusted[:, 0] = boxes[:, 0]
+        adjusted[:, 1:] = xyxy_to_yolo(resized_bboxes, 640, 640)
+        return adjusted
+
+    def write_new_bboxes_to_annotations_file(self, folder_paths: list = None, cache: BuildCache = None):
+        """
+        Write the new bounding boxes to the annotations file. The boxes are adjusted once
+        and the result is written to the folder path and every extra folder
+        Args:
+            folder_paths (list): Extra folders receiving the same annotation files (default is None)
+            cache (BuildCache): Skips annotation files whose outputs are up to date and deletes the
+                outputs of removed annotation files (default is None)
+        """
+        start = time.perf_counter()
+        folders = [self.folder_path, *(folder_paths or [])]
+        annotation_paths = self.annotation_paths
+        if cache is not None:
+            step = ("resize_bboxes", (self.image_width, self.image_height))
+            outputs = {path: {os.path.join(folder, os.path.basename(path)): cache.key(path, step)
+                              for folder in folders}
+                       for path in self.annotation_paths}
+            annotation_paths = [path for path in self.annotation_paths
+                                if not all(cache.is_fresh(output, key) for output, key in outputs[path].items())]
+
+        boxes, offsets = self.load_boxes(annotation_paths)
+        adjusted = self.resize_bboxes_array(boxes)
+        for i, annotation_file_path in enumerate(annotation_paths):
+            content = format_yolo_lines(adjusted[offsets[i]:offsets[i + 1]])
+            for folder in folders:
+                new_file_path = ReadWriteFile(
+                    annotation_file_path, folder).create_new_file_path()
+                ReadWriteFile(new_file_path, folder).write_to_file(content)
+
+        if cache is not None:
+            for path in annotation_paths:
+                for output, key in outputs[path].items():
+                    cache.record(output, key)
+            cache.prune(folders, {output for paths in outputs.values() for output in paths})
+            cache.save()
+        self.metrics.throughput("labels", len(boxes), time.perf_counter() - start)
@@ -0,0 +1,144 @@
+import numpy as np
+import cv2
+from src.model.box_ops import nmm
+
+
+class SlicedInference:
+    def __init__(self, tile_size: int = 640, overlap: float = 0.2, roi_mask: np.ndarray = None,
+                 ios_threshold: float = 0.5, batch_size: int = 16, full_frame: bool = True,
+                 imgsz: int = 640) -> None:
+        """
+        Initialize the SlicedInference, splitting high resolution frames into overlapping tiles so
+        small distant signs are seen at the model input size
+        Args:
+            tile_size (int): The width and height of a tile in pixels (default is 640)
+            overlap (float): The overlap of neighbouring tiles as a fraction of the tile (default is 0.2)
+            roi_mask (np.ndarray): Grayscale mask, non zero where signs can appear, tiles outside it
+                are never inferred (default is None)
+            ios_threshold (float): The intersection over smaller threshold of the cross-tile box
+                merging (default is 0.5)
+            batch_size (int): The number of tiles per inference call (default is 16)
+            full_frame (bool): Also infer the whole frame to keep large signs in one piece (default is True)
+            imgsz (int): The inference input size of the model (default is 640)
+        """
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.roi_mask = roi_mask
+        self.ios_threshold = ios_threshold
+        self.batch_size = batch_size
+        self.full_frame = full_frame
+        self.imgsz = imgsz
+        self.cached_tiles = {}
+        self.cached_masks = {}
+
+    def mask(self, width: int, height: int) -> np.ndarray:
+        """
+        Get the region of interest mask resized to a frame size, cached per frame size
+        Args:
+            width (int): The frame width
+            height (int): The frame height
+        Returns:
+            np.ndarray: (height, width) boolean mask
+        """
+        if (width, height) not in self.cached_masks:
+            resized = cv2.resize(self.roi_mask, (width, height), interpolation=cv2.INTER_NEAREST)
+            self.cached_masks[(width, height)] = resized > 0
+        return self.cached_masks[(width, height)]
+
+    def axis_starts(self, length: int) -> np.ndarray:
+        """
+        Get the tile start positions along one axis, the last tile ends on the border
+        Args:
+            length (int): The frame width or height
+        Returns:
+            np.ndarray: The start positions
+        """
+        if length <= self.tile_size:
+            return np.zeros(1, dtype=int)
+        step = max(1, int(self.tile_size * (1 - self.overlap)))
+        starts = np.arange(0, length - self.tile_size, step)
+        return np.append(starts, length - self.tile_size)
+
+    def tiles(self, width: int, height: int) -> np.ndarray:
+        """
+        Get the tiles of a frame size, tiles not touching the region of interest are left out.
+        The result is cached per frame size
+        Args:
+            width (int): The frame width
+            height (int): The frame height
+        Returns:
+            np.ndarray: (K, 4) tiles [x1, y1, x2, y2]
+        """
+        if (width, height) in self.cached_tiles:
+            return self.cached_tiles[(width, height)]
+
+        xs, ys = np.meshgrid(self.axis_starts(width), self.axis_starts(height))
+        tiles = np.stack([xs.ravel(), ys.ravel(),
+                          np.minimum(xs.ravel() + self.tile_size, width),
+                          np.minimum(ys.ravel() + self.tile_size, height)], axis=1)
+
+        if self.roi_mask is not None:
+            # Summed area table gives the mask coverage of every tile at once
+            integral = cv2.integral(self.mask(width, height).astype(np.uint8))
+            covered = (integral[tiles[:, 3], tiles[:, 2]] - integral[tiles[:, 1], tiles[:, 2]]
+                       - integral[tiles[:, 3], tiles[:, 0]] + integral[tiles[:, 1], tiles[:, 0]])
+            tiles = tiles[covered > 0]
+
+        self.cached_tiles[(width, height)] = tiles
+        return tiles
+
+    def full_tile(self, width: int, height: int) -> list:
+        """
+        Get the tile covering the whole frame, or only the bounding box of the region of interest
+        Args:
+            width (int): The frame width
+            height (int): The frame height
+        Returns:
+            list: The tile [x1, y1, x2, y2], None when the region of interest is empty at this size
+        """
+        if self.roi_mask is None:
+            return [0, 0, width, height]
+        x, y, w, h = cv2.boundingRect(self.mask(width, height).astype(np.uint8))
+        if w == 0 or h == 0:
+            return None
+        return [x, y, x + w, y + h]
+
+    def predict(self, model, frame: np.ndarray, extract_detections) -> tuple:
+        """
+        Infer all tiles of a frame in batches and merge the pieces of the boxes cut by tile borders
+        Args:
+            model (ultralytics.YOLO): The loaded model
+            frame (np.ndarray): The BGR frame
+            extract_detections (function): Converts a result to (boxes, confidences, class ids)
+        Returns:
+            tuple: (N, 4) boxes [x1, y1, x2, y2] in frame pixels, (N,) confidences and (N,) class ids
+        """
+        height, width = frame.shape[:2]
+        tiles = self.tiles(width, height)
+        full_tile = self.full_tile(width, height) if self.full_frame and len(tiles) > 1 else None
+        if full_tile is not None:
+            tiles = np.concatenate([tiles, [full_tile]])
+        crops = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in tiles]
+
+        boxes, confidences, class_ids = [np.zeros((0, 4))], [np.zeros(0)], [np.zeros(0, dtype=int)]
+        for start in range(0, len(crops), self.batch_size):
+            results = model(crops[start:start + self.batch_size], imgsz=self.imgsz, verbose=False)
+            for tile, result in zip(tiles[start:start + self.batch_size], results):
+                tile_boxes, tile_confidences, tile_class_ids = extract_detections(result)
+                boxes.append(tile_boxes + np.tile(tile[:2], 2))
+                confidences.append(tile_confidences)
+                class_ids.append(tile_class_ids)
+
+        boxes = np.concatenate(boxes)
+        confidences = np.concatenate(confidences)
+        class_ids = np.concatenate(class_ids)
+
+        if self.roi_mask is not None and len(boxes):
+            # Drop boxes whose center lies outside the region of interest
+            centers = ((boxes[:, :2] + boxes[:, 2:]) / 2).astype(int)
+            inside = self.mask(width, height)[centers[:, 1].clip(0, height - 1),
+                                              centers[:, 0].clip(0, width - 1)]
+            boxes, confidences, class_ids = boxes[inside], confidences[inside], class_ids[inside]
+
+        keep, merged = nmm(boxes, confidences, class_ids, self.ios_threshold)
+        return merged, confidences[keep], class_ids[keep]
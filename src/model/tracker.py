@@ -0,0 +1,114 @@
+import numpy as np
+import cv2
+from src.model.box_ops import box_iou
+
+
+class IoUTracker:
+    def __init__(self, iou_threshold: float = 0.3, max_missed: int = 10) -> None:
+        """
+        Initialize the IoUTracker, giving every traffic sign a persistent track id. Detections are
+        matched to tracks of the same class by IoU, and between keyframes the tracks are carried
+        forward with sparse optical flow
+        Args:
+            iou_threshold (float): The minimum IoU to match a detection to a track (default is 0.3)
+            max_missed (int): The number of keyframes a track survives without detection (default is 10)
+        """
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.boxes = np.zeros((0, 4))
+        self.confidences = np.zeros(0)
+        self.class_ids = np.zeros(0, dtype=int)
+        self.track_ids = np.zeros(0, dtype=int)
+        self.missed = np.zeros(0, dtype=int)
+        self.next_id = 0
+
+    def match(self, boxes: np.ndarray, class_ids: np.ndarray) -> np.ndarray:
+        """
+        Greedily match detections to tracks, highest IoU first
+        Args:
+            boxes (np.ndarray): (N, 4) detected boxes [x1, y1, x2, y2]
+            class_ids (np.ndarray): (N,) class id per detection
+        Returns:
+            np.ndarray: (N,) index of the matched track per detection, -1 when unmatched
+        """
+        matches = np.full(len(boxes), -1)
+        if not len(boxes) or not len(self.boxes):
+            return matches
+
+        iou = box_iou(boxes, self.boxes)
+        iou[class_ids[:, None] != self.class_ids[None, :]] = 0
+        for flat in np.argsort(iou, axis=None)[::-1]:
+            detection, track = np.unravel_index(flat, iou.shape)
+            if iou[detection, track] < self.iou_threshold:
+                break
+            if matches[detection] == -1 and track not in matches:
+                matches[detection] = track
+        return matches
+
+    def update(self, boxes: np.ndarray, confidences: np.ndarray, class_ids: np.ndarray) -> np.ndarray:
+        """
+        Update the tracks with the detections of a keyframe
+        Args:
+            boxes (np.ndarray): (N, 4) detected boxes [x1, y1, x2, y2]
+            confidences (np.ndarray): (N,) confidence per detection
+            class_ids (np.ndarray): (N,) class id per detection
+        Returns:
+            np.ndarray: (N,) track id per detection
+        """
+        matches = self.match(boxes, class_ids)
+        new = matches == -1
+        track_ids = np.empty(len(boxes), dtype=int)
+        track_ids[~new] = self.track_ids[matches[~new]]
+        track_ids[new] = np.arange(self.next_id, self.next_id + new.sum())
+        self.next_id += int(new.sum())
+
+        # Tracks without detection are kept for a few keyframes
+        missed = np.ones(len(self.boxes), dtype=bool)
+        missed[matches[~new]] = False
+        self.missed[missed] += 1
+        keep = missed & (self.missed <= self.max_missed)
+
+        self.boxes = np.concatenate([boxes, self.boxes[keep]])
+        self.confidences = np.concatenate([confidences, self.confidences[keep]])
+        self.class_ids = np.concatenate([class_ids, self.class_ids[keep]])
+        self.track_ids = np.concatenate([track_ids, self.track_ids[keep]])
+        self.missed = np.concatenate([np.zeros(len(boxes), dtype=int), self.missed[keep]])
+        return track_ids
+
+    def visible(self) -> tuple:
+        """
+        Get the tracks that were detected on the last keyframe
+        Returns:
+            tuple: The boxes, confidences, class ids and track ids of the visible tracks
+        """
+        mask = self.missed == 0
+        return self.boxes[mask], self.confidences[mask], self.class_ids[mask], self.track_ids[mask]
+
+    def propagate(self, prev_gray: np.ndarray, gray: np.ndarray) -> tuple:
+        """
+        Move the tracks from the previous frame to the current one with pyramidal Lucas-Kanade
+        optical flow on a 3x3 grid of points inside every box
+        Args:
+            prev_gray (np.ndarray): The previous grayscale frame
+            gray (np.ndarray): The current grayscale frame
+        Returns:
+            tuple: The boxes, confidences, class ids and track ids of the visible tracks
+        """
+        if len(self.boxes):
+            grid = np.array([0.25, 0.5, 0.75])
+            fx, fy = np.meshgrid(grid, grid)
+            sizes = self.boxes[:, 2:] - self.boxes[:, :2]
+            points = (self.boxes[:, None, :2]
+                      + np.stack([fx.ravel(), fy.ravel()], axis=1)[None] * sizes[:, None])
+            points = points.reshape(-1, 1, 2).astype(np.float32)
+
+            moved, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, points, None)
+            flow = (moved - points).reshape(len(self.boxes), -1, 2)
+            valid = status.reshape(len(self.boxes), -1).astype(bool)
+
+            # Median shift of the points that were found, boxes without any stay in place
+            flow[~valid] = np.nan
+            flow[~valid.any(axis=1)] = 0
+            shift = np.nanmedian(flow, axis=1)
+            self.boxes = self.boxes + np.tile(shift, 2)
+        return self.visible()
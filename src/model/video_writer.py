@@ -0,0 +1,109 @@
+import queue
+import threading
+import cv2
+from src.model.metrics import Metrics
+from src.model.renderer import BoxRenderer
+
+
+class AsyncVideoWriter(threading.Thread):
+    def __init__(self, output_path: str, fps: float, size: tuple = None, renderer: BoxRenderer = None,
+                 queue_size: int = 32, fourcc: str = "mp4v", metrics: Metrics = None) -> None:
+        """
+        Initialize the AsyncVideoWriter, a background thread drawing the detections and encoding the
+        frames with cv2.VideoWriter, fed by a bounded queue so the main loop only hands frames over.
+        The thread starts with the first frame
+        Args:
+            output_path (str): The path to the video file
+            fps (float): The frame rate of the output video
+            size (tuple): The (width, height) of the output video, frames are resized to it
+                (default is None, the size of the first frame)
+            renderer (BoxRenderer): Draws the detections handed with every frame (default is None)
+            queue_size (int): The maximum number of frames waiting (default is 32)
+            fourcc (str): The codec of the output video (default is "mp4v")
+            metrics (Metrics): Collects the render and encode latency (default is None)
+        """
+        super().__init__(daemon=True)
+        self.output_path = output_path
+        self.fps = fps
+        self.size = size
+        self.renderer = renderer
+        self.fourcc = fourcc
+        self.metrics = metrics or Metrics()
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.writer = None
+        self.error = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            self.close()
+        except RuntimeError:
+            # An error of the writer thread must not hide the one leaving the with block
+            if exc_type is None:
+                raise
+
+    def write(self, frame, detections: tuple = None) -> None:
+        """
+        Queue a frame, blocks while the queue is full. The frame must not be modified afterwards
+        Args:
+            frame (np.ndarray): The BGR frame
+            detections (tuple): The (boxes, confidences, class_ids) to draw (default is None)
+        """
+        if self.error is not None:
+            raise RuntimeError(f"Writing {self.output_path} failed: {self.error}")
+        if self.ident is None:
+            self.start()
+        self.queue.put((frame, detections))
+
+    def run(self) -> None:
+        """
+        Draw and encode queued frames until the stop marker is received
+        """
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            if self.error is not None:
+                continue
+            frame, detections = item
+            try:
+                if detections is not None and self.renderer is not None:
+                    with self.metrics.stage("render"):
+                        frame = self.renderer.draw(frame, *detections)
+                with self.metrics.stage("encode"):
+                    self.encode(frame)
+            except Exception as error:
+                self.error = repr(error)
+
+    def encode(self, frame) -> None:
+        """
+        Write one frame, opening the video on the first frame
+        Args:
+            frame (np.ndarray): The BGR frame
+        """
+        if self.writer is None:
+            if self.size is None:
+                self.size = (frame.shape[1], frame.shape[0])
+            self.writer = cv2.VideoWriter(self.output_path, cv2.VideoWriter_fourcc(*self.fourcc),
+                                          self.fps, self.size)
+            if not self.writer.isOpened():
+                raise IOError(f"Cannot open {self.output_path} for writing")
+        if (frame.shape[1], frame.shape[0]) != self.size:
+            frame = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        self.writer.write(frame)
+
+    def close(self) -> None:
+        """
+        Wait until every queued frame is written and release the video, raises a RuntimeError when
+        a frame could not be drawn or encoded
+        """
+        if self.is_alive():
+            self.queue.put(None)
+            self.join()
+        if self.writer is not None:
+            self.writer.release()
+            self.writer = None
+        if self.error is not None:
+            raise RuntimeError(f"Writing {self.output_path} failed: {self.error}")
@@ -1,54 +1,79 @@
-from ultralytics import YOLO
+from contextlib import nullcontext
 import cv2
+import yaml
+from src.model.backends import CLASSIFY, TORCH, ModelBackend
+from src.model.cascade import Cascade
+from src.model.detection_sink import DetectionSink
+from src.model.frame_reader import FrameReader
+from src.model.metrics import Metrics
+from src.model.multi_stream import ROUND_ROBIN, MultiStreamScheduler
+from src.model.renderer import BoxRenderer
+from src.model.sliced_inference import SlicedInference
+from src.model.tracker import IoUTracker
+from src.model.video_writer import AsyncVideoWriter
 from src.common.configs import *
 from src.common.constans import *
-import sys
-sys.path.append(
-    r"E:\Traffic_Sign_Detection Thesis\Thesis---Traffic-Sign-Detection")
 
 
 class Detection:
-    def __init__(self, model: str, video: str):
+    def __init__(self, model: str, video: str, backend: str = TORCH, imgsz: int = 640, int8: bool = False,
+                 metrics: Metrics = None):
         """
         Initialize the Detection class with the model and video file
         Args:
             model (str): The pre-trained model file
             video (str): The video file to be processed
+            backend (str): "torch", or "onnx" / "openvino" to run a cached CPU export (default is "torch")
+            imgsz (int): The inference input size (default is 640)
+            int8 (bool): Quantize the exported model to int8 (default is False)
+            metrics (Metrics): Collects per-stage latency, fps and queue depth (default is None)
         """
         self.model = model
         self.video = video
+        self.backend = backend
+        self.imgsz = imgsz
+        self.int8 = int8
+        self.metrics = metrics or Metrics()
 
     def load(self):
         """
-        Load pre-trained model with the best weights file
+        Load pre-trained model with the best weights file on the selected backend
         """
-        model = YOLO(self.model)
-        return model
+        return ModelBackend(self.model, self.backend, self.imgsz, self.int8).load()
 
-    def detect(self):
+    def detect(self, font_path: str = None):
         """
         Detect objects in a video using the YOLOv8 model
+        Args:
+            font_path (str): A TrueType font with Vietnamese glyphs for the labels (default is None)
         """
         model = self.load()
+        renderer = BoxRenderer(model.names, font_path)
         cap = cv2.VideoCapture(self.video)
 
         # Loop through the video frames
         while cap.isOpened():
             # Read a frame from the video
-            success, frame = cap.read()
+            with self.metrics.stage("read"):
+                success, frame = cap.read()
 
             if success:
                 # Run YOLOv8 inference on the frame
-                results = model(frame)
+                with self.metrics.stage("infer"):
+                    results = model(frame, imgsz=self.imgsz, verbose=False)
 
                 # Visualize the results on the frame
-                annotated_frame = results[0].plot()
+                with self.metrics.stage("plot"):
+                    annotated_frame = renderer.draw(frame, *self.extract_detections(results[0]))
 
                 # Display the annotated frame
-                cv2.imshow(YOLOV8_DETECTION, annotated_frame)
+                with self.metrics.stage("show"):
+                    cv2.imshow(YOLOV8_DETECTION, annotated_frame)
+                    key = cv2.waitKey(1)
+                self.metrics.frame()
 
                 # Break the loop if 'q' is pressed
-                if cv2.waitKey(1) & 0xFF == ord(Q):
+                if key & 0xFF == ord(Q):
                     break
             else:
                 # Break the loop if the end of the video is reached
@@ -57,3 +82,233 @@ class Detection:
         # Release the video capture object and close the display window
         cap.release()
         cv2.destroyAllWindows()
+
+    def extract_detections(self, result) -> tuple:
+        """
+        Convert an ultralytics result to numpy arrays
+        Args:
+            result (ultralytics.engine.results.Results): The result of one image
+        Returns:
+            tuple: (N, 4) boxes [x1, y1, x2, y2] in pixels, (N,) confidences and (N,) class ids
+        """
+        boxes = result.boxes
+        return (boxes.xyxy.cpu().numpy(), boxes.conf.cpu().numpy(),
+                boxes.cls.cpu().numpy().astype(int))
+
+    def detect_headless(self, output_path: str, batch_size: int = 8, queue_size: int = 32,
+                        video_output: str = None, video_fps: float = None, video_size: tuple = None,
+                        font_path: str = None, model=None) -> int:
+        """
+        Detect objects in the video without any window. Frames are decoded on a reader thread,
+        inferred in batches and every box is streamed to a JSONL or CSV file. The annotated video
+        is drawn and encoded on a background thread
+        Args:
+            output_path (str): The JSONL file, or CSV file when it ends with .csv, for the detections
+            batch_size (int): The number of frames per inference call (default is 8)
+            queue_size (int): The maximum number of decoded frames waiting (default is 32)
+            video_output (str): The path to write the annotated video to (default is None)
+            video_fps (float): The frame rate of the annotated video (default is None, the input fps)
+            video_size (tuple): The (width, height) of the annotated video (default is None, the frame size)
+            font_path (str): A TrueType font with Vietnamese glyphs for the labels (default is None)
+            model (ultralytics.YOLO): An already loaded model (default is None, loaded with load)
+        Returns:
+            int: The number of processed frames
+        """
+        model = model or self.load()
+        reader = FrameReader(self.video, queue_size, self.metrics)
+        reader.start()
+
+        processed = 0
+        try:
+            # Created inside try so the reader thread is stopped when the renderer cannot be built
+            writer = None
+            if video_output:
+                writer = AsyncVideoWriter(video_output, video_fps or reader.fps or 30, video_size,
+                                          BoxRenderer(model.names, font_path), queue_size, metrics=self.metrics)
+            with DetectionSink(output_path, model.names) as sink, writer or nullcontext():
+                for batch in reader.batches(batch_size):
+                    with self.metrics.stage("infer"):
+                        results = model([frame for _, _, frame in batch], imgsz=self.imgsz, verbose=False)
+                    for (index, timestamp, frame), result in zip(batch, results):
+                        detections = self.extract_detections(result)
+                        with self.metrics.stage("write"):
+                            sink.write(index, timestamp, *detections)
+
+                        if writer is not None:
+                            writer.write(frame, detections)
+                        self.metrics.frame()
+                    processed += len(batch)
+        finally:
+            reader.stop()
+        return processed
+
+    def detect_cascade(self, output_path: str, classifier: str, crop_size: int = 64, padding: float = 0.1,
+                       batch_size: int = 8, crop_batch_size: int = 64, queue_size: int = 32,
+                       data_yaml: str = DATA_YAML, video_output: str = None, video_fps: float = None,
+                       video_size: tuple = None, font_path: str = None) -> int:
+        """
+        Detect objects in the video with the two stage cascade: the model of this Detection is a
+        class-agnostic sign localizer run on batches of full frames, and the classifier names the
+        localized signs from their crops. Both are trained on the datasets of CropExtractor
+        Args:
+            output_path (str): The JSONL file, or CSV file when it ends with .csv, for the detections
+            classifier (str): The classification weights trained on the crops
+            crop_size (int): The width and height of the crops, the classifier input size (default is 64)
+            padding (float): Context added on every side as a fraction of the box size (default is 0.1)
+            batch_size (int): The number of frames per localizer call (default is 8)
+            crop_batch_size (int): The maximum number of crops per classifier call (default is 64)
+            queue_size (int): The maximum number of decoded frames waiting (default is 32)
+            data_yaml (str): The data.yaml with the class names (default is DATA_YAML)
+            video_output (str): The path to write the annotated video to (default is None)
+            video_fps (float): The frame rate of the annotated video (default is None, the input fps)
+            video_size (tuple): The (width, height) of the annotated video (default is None, the frame size)
+            font_path (str): A TrueType font with Vietnamese glyphs for the labels (default is None)
+        Returns:
+            int: The number of processed frames
+        """
+        with open(data_yaml, READ, encoding="utf-8") as file:
+            class_names = dict(enumerate(yaml.safe_load(file)["names"]))
+        cascade = Cascade(self.load(), ModelBackend(classifier, self.backend, crop_size, self.int8, CLASSIFY).load(),
+                          crop_size, padding, crop_batch_size, self.metrics, self.imgsz)
+        reader = FrameReader(self.video, queue_size, self.metrics)
+        reader.start()
+
+        processed = 0
+        try:
+            # Created inside try so the reader thread is stopped when the renderer cannot be built
+            writer = None
+            if video_output:
+                writer = AsyncVideoWriter(video_output, video_fps or reader.fps or 30, video_size,
+                                          BoxRenderer(class_names, font_path), queue_size, metrics=self.metrics)
+            with DetectionSink(output_path, class_names) as sink, writer or nullcontext():
+                for batch in reader.batches(batch_size):
+                    detections = cascade.predict([frame for _, _, frame in batch], self.extract_detections)
+                    for (index, timestamp, frame), frame_detections in zip(batch, detections):
+                        with self.metrics.stage("write"):
+                            sink.write(index, timestamp, *frame_detections)
+
+                        if writer is not None:
+                            writer.write(frame, frame_detections)
+                        self.metrics.frame()
+                    processed += len(batch)
+        finally:
+            reader.stop()
+        return processed
+
+    def frame_difference(self, prev_small, small) -> float:
+        """
+        Cheap change score between two downscaled grayscale frames
+        Args:
+            prev_small (np.ndarray): The previous downscaled frame
+            small (np.ndarray): The current downscaled frame
+        Returns:
+            float: The mean absolute pixel difference (0-255)
+        """
+        return float(cv2.absdiff(prev_small, small).mean())
+
+    def detect_keyframes(self, output_path: str, every_n: int = 5, diff_threshold: float = None,
+                         queue_size: int = 32, iou_threshold: float = 0.3) -> dict:
+        """
+        Detect objects on keyframes only and track them in between. A frame is a keyframe every
+        every_n frames, or earlier when it differs enough from the last keyframe. Between keyframes
+        the boxes are carried forward with optical flow, and every box gets a persistent track id
+        Args:
+            output_path (str): The JSONL file, or CSV file when it ends with .csv, for the detections
+            every_n (int): The maximum distance between two keyframes (default is 5)
+            diff_threshold (float): Mean absolute difference (0-255) to the last keyframe that forces
+                a keyframe, None disables it (default is None)
+            queue_size (int): The maximum number of decoded frames waiting (default is 32)
+            iou_threshold (float): The minimum IoU to continue a track (default is 0.3)
+        Returns:
+            dict: The number of frames, keyframes and distinct tracks
+        """
+        model = self.load()
+        tracker = IoUTracker(iou_threshold)
+        reader = FrameReader(self.video, queue_size, self.metrics)
+        reader.start()
+
+        frames = keyframes = 0
+        last_key = prev_gray = key_small = None
+        try:
+            with DetectionSink(output_path, model.names) as sink:
+                for index, timestamp, frame in reader.frames():
+                    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                    small = cv2.resize(gray, (64, 36), interpolation=cv2.INTER_AREA)
+
+                    is_key = last_key is None or index - last_key >= every_n
+                    if not is_key and diff_threshold is not None:
+                        is_key = self.frame_difference(key_small, small) > diff_threshold
+
+                    if is_key:
+                        with self.metrics.stage("infer"):
+                            boxes, confidences, class_ids = self.extract_detections(
+                                model(frame, imgsz=self.imgsz, verbose=False)[0])
+                        track_ids = tracker.update(boxes, confidences, class_ids)
+                        last_key, key_small = index, small
+                        keyframes += 1
+                    else:
+                        with self.metrics.stage("track"):
+                            boxes, confidences, class_ids, track_ids = tracker.propagate(prev_gray, gray)
+
+                    sink.write(index, timestamp, boxes, confidences, class_ids, track_ids)
+                    prev_gray = gray
+                    frames += 1
+                    self.metrics.frame()
+        finally:
+            reader.stop()
+        return {"frames": frames, "keyframes": keyframes, "tracks": tracker.next_id}
+
+    def detect_sliced(self, output_path: str, tile_size: int = 640, overlap: float = 0.2,
+                      roi_mask: str = None, batch_size: int = 16, queue_size: int = 32) -> int:
+        """
+        Detect objects on overlapping tiles of every full resolution frame, so small distant signs
+        keep their pixels, and merge the boxes of neighbouring tiles with cross-tile NMM
+        Args:
+            output_path (str): The JSONL file, or CSV file when it ends with .csv, for the detections
+            tile_size (int): The width and height of a tile in pixels (default is 640)
+            overlap (float): The overlap of neighbouring tiles as a fraction of the tile (default is 0.2)
+            roi_mask (str): Path to a mask image, white where signs can appear (default is None)
+            batch_size (int): The number of tiles per inference call (default is 16)
+            queue_size (int): The maximum number of decoded frames waiting (default is 32)
+        Returns:
+            int: The number of processed frames
+        """
+        model = self.load()
+        mask = cv2.imread(roi_mask, cv2.IMREAD_GRAYSCALE) if roi_mask else None
+        slicer = SlicedInference(tile_size, overlap, mask, batch_size=batch_size, imgsz=self.imgsz)
+        reader = FrameReader(self.video, queue_size, self.metrics)
+        reader.start()
+
+        processed = 0
+        try:
+            with DetectionSink(output_path, model.names) as sink:
+                for index, timestamp, frame in reader.frames():
+                    with self.metrics.stage("infer"):
+                        detections = slicer.predict(model, frame, self.extract_detections)
+                    sink.write(index, timestamp, *detections)
+                    processed += 1
+                    self.metrics.frame()
+        finally:
+            reader.stop()
+        return processed
+
+    def detect_streams(self, sources: list, output_folder: str, batch_size: int = 8, policy: str = ROUND_ROBIN,
+                       queue_size: int = 4, max_age: float = 1.0, drop_oldest: bool = None) -> list:
+        """
+        Detect objects on many video sources with this one model, batching frames across streams.
+        The detections of source i are written to output_folder/stream_<i>.jsonl
+        Args:
+            sources (list): Video files or stream URLs
+            output_folder (str): The folder for the detection files
+            batch_size (int): The maximum number of frames per inference call (default is 8)
+            policy (str): "round_robin" or "deadline" (default is "round_robin")
+            queue_size (int): The maximum number of decoded frames waiting per stream (default is 4)
+            max_age (float): Frames of dropping streams waiting longer than this many seconds are
+                dropped, None keeps every frame (default is 1.0)
+            drop_oldest (bool): Drop the oldest frame of a full stream queue instead of pausing its
+                decoding (default is None, only for live streams and cameras)
+        Returns:
+            list: The number of processed frames of every source
+        """
+        scheduler = MultiStreamScheduler(self, sources, batch_size, policy, queue_size, max_age, drop_oldest)
+        return scheduler.run(output_folder)
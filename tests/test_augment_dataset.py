@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+from PIL import Image
+from src.model.augment_dataset import AugmentDataset
+from src.model.geometric_augment import GeometricAugment
+from src.model.image_store import ImageStore
+
+
+@pytest.fixture
+def augment(tmp_path):
+    images, labels = tmp_path / "images", tmp_path / "labels"
+    images.mkdir()
+    labels.mkdir()
+    rng = np.random.default_rng(0)
+    for i in range(5):
+        Image.fromarray(rng.integers(0, 256, (72, 96, 3), dtype=np.uint8)).save(images / f"{i}.jpg")
+        (labels / f"{i}.txt").write_text(f"{i} 0.5 0.5 0.4 0.3\n1 0.98 0.5 0.2 0.2\n")
+    return GeometricAugment(str(images), str(labels), str(tmp_path / "out"))
+
+
+def dataset_of(augment: GeometricAugment, **kwargs) -> AugmentDataset:
+    photometric = [(augment.add_noise, 0.5, []), (augment.change_contrast, 0.5, [(0.5, 1.5)])]
+    geometric = [(augment.rotate_matrix, 0.5, [(-20, 20)]), (augment.flip_matrix, 0.5, [])]
+    return AugmentDataset(augment, photometric, geometric, **kwargs)
+
+
+def assert_same_sample(first: tuple, second: tuple) -> None:
+    np.testing.assert_array_equal(first[0], second[0])
+    np.testing.assert_array_equal(first[1], second[1])
+
+
+def test_samples_are_fixed_by_seed_epoch_and_index(augment):
+    dataset = dataset_of(augment, seed=3)
+    other = dataset_of(augment, seed=3)
+    # Read in the opposite order by another dataset
+    forward = [dataset.sample(index, epoch=1) for index in range(len(dataset))]
+    backward = [other.sample(index, epoch=1) for index in reversed(range(len(dataset)))][::-1]
+    for first, second in zip(forward, backward):
+        assert_same_sample(first, second)
+    dataset.set_epoch(1)
+    assert_same_sample(dataset[2], other.sample(2, epoch=1))
+
+    epochs = [dataset.sample(0, epoch) for epoch in range(6)]
+    seeds = [dataset_of(augment, seed=seed).sample(0, 1) for seed in range(6)]
+    for samples in (epochs, seeds):
+        assert len({sample[0].tobytes() for sample in samples}) > 1
+
+
+def test_iteration_is_a_seeded_shuffle_of_the_samples(augment):
+    dataset = dataset_of(augment, seed=1)
+    dataset.set_epoch(2)
+    samples = list(dataset)
+    order = np.arange(5)
+    np.random.default_rng((1, 2)).shuffle(order)
+    assert not np.array_equal(order, np.arange(5))
+    for sample, index in zip(samples, order):
+        assert_same_sample(sample, dataset.sample(int(index), 2))
+
+    unshuffled = list(dataset_of(augment, seed=1, shuffle=False).generator(2))
+    for index, sample in enumerate(unshuffled):
+        assert_same_sample(sample, dataset.sample(index, 2))
+
+
+def test_lru_cache_keeps_the_latest_images(augment, monkeypatch):
+    dataset = AugmentDataset(augment, cache_size=2)
+    decoded = []
+    base_pair = augment.base_pair
+    monkeypatch.setattr(augment, "base_pair", lambda filename, operation: decoded.append(filename)
+                        or base_pair(filename, operation))
+    for index in [0, 1, 0, 2, 0, 1]:
+        dataset[index]
+    # 1 is evicted by 2, and 0 stays since it was read again
+    assert decoded == ["0.jpg", "1.jpg", "2.jpg", "1.jpg"]
+    assert list(dataset.cache) == ["0.jpg", "1.jpg"]
+    image, boxes = dataset[0]
+    assert not image.flags.writeable and not boxes.flags.writeable
+
+
+def test_cache_does_not_change_the_samples(augment):
+    cached = dataset_of(augment, cache_size=5)
+    uncached = dataset_of(augment)
+    for epoch in range(2):
+        for index in range(5):
+            assert_same_sample(cached.sample(index, epoch), uncached.sample(index, epoch))
+
+
+def test_stored_and_decoded_bases_are_the_same(tmp_path, augment):
+    decoded = AugmentDataset(augment)
+    store = ImageStore(str(tmp_path / "store"), augment.input_folder, size=640)
+    store.update()
+    stored_augment = GeometricAugment(augment.input_folder, augment.label_folder, augment.output_folder,
+                                      store=store)
+    stored = AugmentDataset(stored_augment)
+    for index in range(5):
+        image, boxes = stored[index]
+        assert isinstance(image, np.memmap)
+        assert_same_sample((image, boxes), decoded[index])
+    # The box at the right edge is clipped to the image
+    assert boxes[1, 1] + boxes[1, 3] / 2 == pytest.approx(1.0)
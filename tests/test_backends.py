@@ -0,0 +1,47 @@
+import hashlib
+import os
+import sys
+import pytest
+from src.model.backends import ModelBackend, file_hash
+
+
+@pytest.fixture
+def weights(tmp_path):
+    path = tmp_path / "models" / "best.pt"
+    path.parent.mkdir()
+    path.write_bytes(b"weights" * 1000)
+    return str(path)
+
+
+def test_file_hash_reads_in_chunks(weights):
+    with open(weights, "rb") as file:
+        expected = hashlib.sha1(file.read()).hexdigest()
+    assert file_hash(weights, chunk_size=100) == file_hash(weights) == expected
+
+
+def test_artifact_path_is_keyed_by_weights_size_and_precision(weights):
+    onnx = ModelBackend(weights, "onnx", imgsz=640).artifact_path()
+    assert os.path.dirname(onnx) == os.path.join(os.path.dirname(weights), ".cache")
+    assert os.path.basename(onnx) == f"best-{file_hash(weights)[:16]}-640.onnx"
+    assert ModelBackend(weights, "openvino", imgsz=640, int8=True).artifact_path().endswith(
+        "-640-int8_openvino_model")
+    assert ModelBackend(weights, "onnx", imgsz=320).artifact_path() != onnx
+
+    with open(weights, "ab") as file:
+        file.write(b"retrained")
+    assert ModelBackend(weights, "onnx", imgsz=640).artifact_path() != onnx
+
+
+def test_cached_export_is_reused_without_ultralytics(weights, monkeypatch):
+    backend = ModelBackend(weights, "onnx")
+    os.makedirs(os.path.dirname(backend.artifact_path()))
+    open(backend.artifact_path(), "wb").close()
+    # Importing a module set to None raises ImportError
+    monkeypatch.setitem(sys.modules, "ultralytics", None)
+    assert backend.export() == backend.artifact_path()
+
+
+@pytest.mark.parametrize("backend, int8", [("tensorrt", False), ("onnx", True), ("torch", True)])
+def test_invalid_options(weights, backend, int8):
+    with pytest.raises(ValueError):
+        ModelBackend(weights, backend, int8=int8)
@@ -0,0 +1,33 @@
+import json
+from src.controler import benchmark as controller
+from src.model.benchmark import Benchmark
+
+
+class FakeBenchmark:
+    def __init__(self, **kwargs) -> None:
+        pass
+
+    def run(self) -> dict:
+        return {"results": {"fast": {"seconds": 0.0, "items": 3, "per_second": None},
+                            "slow": {"seconds": 2.0, "items": 4, "per_second": 2.0},
+                            "detection": {"skipped": "no model"}}}
+
+    def save(self, report: dict, path: str) -> None:
+        pass
+
+
+def test_results_without_rate_are_printed(monkeypatch, capsys):
+    monkeypatch.setattr(controller, "Benchmark", FakeBenchmark)
+    controller.main([])
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].split() == ["fast", "0.0000s", "-/s"]
+    assert lines[1].split() == ["slow", "2.0000s", "2.0/s"]
+    assert lines[2].split() == ["detection", "skipped"]
+
+
+def test_compare_skips_baselines_timed_at_zero(tmp_path):
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps({"results": {"fast": {"seconds": 0.0}, "slow": {"seconds": 1.0},
+                                                "detection": {"skipped": "no model"}}}))
+    report = {"results": {"fast": {"seconds": 0.1}, "slow": {"seconds": 1.5}, "detection": {"seconds": 1.0}}}
+    assert Benchmark(repeats=1).compare(report, str(baseline), 0.1) == [("slow", 1.0, 1.5, 1.5)]
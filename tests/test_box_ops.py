@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from src.model.box_ops import format_yolo_lines, parse_yolo_lines, xyxy_to_yolo, yolo_to_xyxy
+from src.model.resize_bboxes import AdjustBoundingBoxes
+
+
+def random_yolo_boxes(count: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    size = rng.uniform(0.01, 0.5, (count, 2))
+    center = rng.uniform(size / 2, 1 - size / 2)
+    labels = rng.integers(0, 13, (count, 1))
+    return np.concatenate([labels, center, size], axis=1)
+
+
+def test_yolo_to_xyxy_matches_scalar_corners():
+    boxes = random_yolo_boxes(50)
+    adjust = AdjustBoundingBoxes("unused", [], 1920, 1080)
+    expected = [adjust.calculate_corners(*adjust.calculate_center_and_size(box)) for box in boxes[:, 1:].tolist()]
+    np.testing.assert_allclose(yolo_to_xyxy(boxes[:, 1:], 1920, 1080), expected, rtol=0, atol=1e-9)
+
+
+def test_xyxy_to_yolo_inverts_yolo_to_xyxy():
+    boxes = random_yolo_boxes(50, seed=1)[:, 1:]
+    np.testing.assert_allclose(xyxy_to_yolo(yolo_to_xyxy(boxes, 1280, 720), 1280, 720), boxes, atol=1e-12)
+
+
+def test_format_then_parse_round_trips():
+    boxes = random_yolo_boxes(20, seed=2)
+    text = format_yolo_lines(boxes)
+    assert text.count("\n") == 20
+    assert text.split("\n")[0].split()[0] == str(int(boxes[0, 0]))
+    np.testing.assert_array_equal(parse_yolo_lines(text), boxes)
+
+
+def test_parse_empty_file():
+    assert parse_yolo_lines("").shape == (0, 5)
+    assert format_yolo_lines(np.zeros((0, 5))) == ""
+
+
+@pytest.mark.parametrize("width, height", [(1920, 1080), (1280, 720), (640, 640), (333, 517)])
+def test_resize_bboxes_array_matches_scalar_path(width, height):
+    boxes = random_yolo_boxes(200, seed=width)
+    adjust = AdjustBoundingBoxes("unused", [], width, height)
+    lines = format_yolo_lines(boxes).splitlines()
+    expected = [[float(label), *values] for label, values in adjust.resize_bboxes_adjust(lines)]
+    np.testing.assert_allclose(adjust.resize_bboxes_array(boxes), expected, rtol=0, atol=1e-12)
+
+
+def test_load_boxes_offsets(tmp_path):
+    contents = ["0 0.5 0.5 0.2 0.2\n1 0.1 0.2 0.05 0.05\n", "", "2 0.3 0.3 0.1 0.1\n"]
+    paths = []
+    for i, content in enumerate(contents):
+        path = tmp_path / f"{i}.txt"
+        path.write_text(content)
+        paths.append(str(path))
+    boxes, offsets = AdjustBoundingBoxes(str(tmp_path), paths, 640, 640).load_boxes()
+    np.testing.assert_array_equal(offsets, [0, 2, 2, 3])
+    np.testing.assert_array_equal(boxes[offsets[2]:offsets[3], 0], [2])
@@ -0,0 +1,122 @@
+import os
+import numpy as np
+import pytest
+from PIL import Image
+from src.model.build_cache import BuildCache
+from src.model.data_augment import DataAugment
+from src.model.resize_bboxes import AdjustBoundingBoxes
+
+
+def test_key_depends_on_the_content_and_the_steps(tmp_path):
+    path = tmp_path / "input.jpg"
+    path.write_bytes(b"first")
+    cache = BuildCache(str(tmp_path / "manifest.json"))
+    key = cache.key(str(path), ("resize", (640,)))
+    assert cache.key(str(path), ("resize", (640,))) == key
+    assert cache.key(str(path), ("resize", (320,))) != key
+    assert cache.key(str(path), ("resize", (640,)), ("blur", ())) != key
+
+    path.write_bytes(b"second")
+    assert cache.key(str(path), ("resize", (640,))) != key
+
+
+def test_unchanged_inputs_are_not_read_again(tmp_path, monkeypatch):
+    path = tmp_path / "input.jpg"
+    path.write_bytes(b"content")
+    cache = BuildCache(str(tmp_path / "manifest.json"))
+    key = cache.key(str(path))
+    monkeypatch.setattr("builtins.open", lambda *args: pytest.fail("the input was read again"))
+    assert cache.key(str(path)) == key
+
+
+def test_manifest_round_trip(tmp_path):
+    (tmp_path / "input.jpg").write_bytes(b"content")
+    (tmp_path / "output.jpg").write_bytes(b"output")
+    cache = BuildCache(str(tmp_path / "cache" / "manifest.json"))
+    key = cache.key(str(tmp_path / "input.jpg"))
+    assert not cache.is_fresh(str(tmp_path / "output.jpg"), key)
+    cache.record(str(tmp_path / "output.jpg"), key)
+    cache.save()
+
+    reloaded = BuildCache(str(tmp_path / "cache" / "manifest.json"))
+    assert reloaded.inputs == cache.inputs
+    assert reloaded.is_fresh(str(tmp_path / "output.jpg"), key)
+    assert not reloaded.is_fresh(str(tmp_path / "output.jpg"), "other")
+    os.remove(tmp_path / "output.jpg")
+    assert not reloaded.is_fresh(str(tmp_path / "output.jpg"), key)
+
+
+def test_prune_deletes_only_recorded_outputs_of_the_folders(tmp_path):
+    for name in ("a/kept.jpg", "a/removed.jpg", "a/unrecorded.jpg", "b/other.jpg"):
+        (tmp_path / name).parent.mkdir(exist_ok=True)
+        (tmp_path / name).write_bytes(b"")
+    cache = BuildCache(str(tmp_path / "manifest.json"))
+    for name in ("a/kept.jpg", "a/removed.jpg", "a/gone.jpg", "b/other.jpg"):
+        cache.record(str(tmp_path / name), "key")
+    assert cache.prune([str(tmp_path / "a")], {str(tmp_path / "a" / "kept.jpg")}) == 1
+    assert sorted(os.listdir(tmp_path / "a")) == ["kept.jpg", "unrecorded.jpg"]
+    assert sorted(cache.outputs) == [str(tmp_path / "a" / "kept.jpg"), str(tmp_path / "b" / "other.jpg")]
+
+
+@pytest.fixture
+def images(tmp_path):
+    folder = tmp_path / "images"
+    folder.mkdir()
+    rng = np.random.default_rng(0)
+    for i in range(3):
+        Image.fromarray(rng.integers(0, 256, (48, 64, 3), dtype=np.uint8)).save(folder / f"{i}.jpg")
+    return folder
+
+
+def run_variants(tmp_path, images, factor: float = 1.5) -> list:
+    augment = DataAugment(str(images), str(tmp_path / "base"))
+    processed = []
+    task = augment.process_file_variants
+    augment.process_file_variants = lambda filename, *args: processed.append(filename) or task(filename, *args)
+    cache = BuildCache(str(tmp_path / "manifest.json"))
+    variants = {str(tmp_path / "contrast"): (augment.change_contrast, (factor,))}
+    assert augment.process_variants(variants, cache=cache) == []
+    return sorted(processed)
+
+
+def test_process_variants_skips_up_to_date_images(tmp_path, images):
+    assert run_variants(tmp_path, images) == ["0.jpg", "1.jpg", "2.jpg"]
+    assert run_variants(tmp_path, images) == []
+
+    # A changed image, a deleted output and new parameters are built again
+    Image.new("RGB", (64, 48), "red").save(images / "1.jpg")
+    assert run_variants(tmp_path, images) == ["1.jpg"]
+    os.remove(tmp_path / "contrast" / "2.jpg")
+    assert run_variants(tmp_path, images) == ["2.jpg"]
+    assert run_variants(tmp_path, images, factor=0.5) == ["0.jpg", "1.jpg", "2.jpg"]
+
+
+def test_process_variants_prunes_removed_images(tmp_path, images):
+    run_variants(tmp_path, images)
+    (tmp_path / "base" / "notes.txt").write_text("kept")
+    os.remove(images / "0.jpg")
+    assert run_variants(tmp_path, images) == []
+    assert sorted(os.listdir(tmp_path / "base")) == ["1.jpg", "2.jpg", "notes.txt"]
+    assert sorted(os.listdir(tmp_path / "contrast")) == ["1.jpg", "2.jpg"]
+
+
+def test_annotations_are_adjusted_only_when_stale(tmp_path):
+    labels = tmp_path / "labels"
+    labels.mkdir()
+    for i in range(3):
+        (labels / f"{i}.txt").write_text(f"{i} 0.5 0.5 0.2 0.2\n")
+    paths = [str(labels / f"{i}.txt") for i in range(3)]
+
+    def adjust() -> int:
+        adjuster = AdjustBoundingBoxes(str(tmp_path / "resize"), paths, 1280, 720)
+        adjuster.write_new_bboxes_to_annotations_file([str(tmp_path / "blur")],
+                                                      cache=BuildCache(str(tmp_path / "manifest.json")))
+        return adjuster.metrics.counters["labels_items"]
+
+    assert adjust() == 3
+    expected = (tmp_path / "resize" / "1.txt").read_text()
+    assert (tmp_path / "blur" / "1.txt").read_text() == expected
+    assert adjust() == 0
+    (labels / "1.txt").write_text("4 0.5 0.5 0.2 0.2\n1 0.1 0.1 0.1 0.1\n")
+    assert adjust() == 2
+    assert (tmp_path / "resize" / "1.txt").read_text() != expected
@@ -0,0 +1,59 @@
+import os
+import subprocess
+import sys
+import types
+import pytest
+from src import cli
+
+HEAVY = ("cv2", "PIL", "numpy", "torch", "ultralytics")
+
+
+def loaded_modules(*argv) -> tuple:
+    code = ("import sys\nfrom src.cli import main\ntry:\n    main(sys.argv[1:])\nexcept SystemExit:\n    pass\n"
+            "print(' '.join(sys.modules), file=sys.stderr)")
+    result = subprocess.run([sys.executable, "-c", code, *argv], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return {name.split(".")[0] for name in result.stderr.split()}, result.stdout
+
+
+@pytest.mark.parametrize("argv", [["--help"], ["extract", "--help"], ["split", "--help"], ["detect", "--help"]])
+def test_help_does_not_import_the_heavy_packages(argv):
+    modules, output = loaded_modules(*argv)
+    assert "usage: python -m src" in output
+    assert not modules & set(HEAVY)
+
+
+def test_forwarded_commands_get_the_remaining_arguments(monkeypatch):
+    received = []
+    controller = types.ModuleType("src.controler.evaluate")
+    controller.main = lambda argv: received.append(argv) or 3
+    monkeypatch.setitem(sys.modules, "src.controler.evaluate", controller)
+    with pytest.raises(SystemExit) as exit_info:
+        cli.main(["evaluate", "--split", "valid", "--help"])
+    assert exit_info.value.code == 3
+    assert received == [["--split", "valid", "--help"]]
+
+
+def test_unknown_arguments_of_other_commands_are_errors(capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        cli.main(["rename", "--unknown"])
+    assert exit_info.value.code == 2
+    assert "unrecognized arguments: --unknown" in capsys.readouterr().err
+
+
+def test_split_checks_its_options_before_reading_images(tmp_path, capsys):
+    for argv in (["--mode", "hardlink"], ["--ratios", "0.7", "0.2", "0.2"]):
+        with pytest.raises(SystemExit):
+            cli.main(["split", "--images", str(tmp_path / "missing"), "--output", str(tmp_path / "out"), *argv])
+    assert not (tmp_path / "out").exists()
+    errors = capsys.readouterr().err
+    assert "need --labels" in errors and "sum to 1" in errors
+
+
+def test_import_profiler_restores_import(capsys):
+    original = __import__
+    with cli.ImportProfiler() as profiler:
+        import json.tool  # noqa: F401
+    assert __import__ is original
+    assert "total" in capsys.readouterr().err
+    assert isinstance(profiler.times, dict)
@@ -0,0 +1,104 @@
+import os
+import numpy as np
+import cv2
+import pytest
+import yaml
+from src.model.crop_extractor import CropExtractor, class_folder, crop_boxes, folder_class_ids
+
+
+def scalar_crop(image: np.ndarray, box: list, size: int, padding: float) -> np.ndarray:
+    """
+    Bilinear sampling of one crop, one output pixel at a time
+    """
+    height, width = image.shape[:2]
+    x1, y1, x2, y2 = box
+    margin_x, margin_y = (x2 - x1) * padding, (y2 - y1) * padding
+    left, top = x1 - margin_x, y1 - margin_y
+    extent_x, extent_y = x2 - x1 + 2 * margin_x, y2 - y1 + 2 * margin_y
+    crop = np.empty((size, size, image.shape[2]))
+    for row in range(size):
+        y = min(max(top + (row + 0.5) / size * extent_y - 0.5, 0), height - 1)
+        for col in range(size):
+            x = min(max(left + (col + 0.5) / size * extent_x - 0.5, 0), width - 1)
+            x0, y0 = int(x), int(y)
+            x_next, y_next = min(x0 + 1, width - 1), min(y0 + 1, height - 1)
+            wx, wy = x - x0, y - y0
+            top_row = image[y0, x0] * (1 - wx) + image[y0, x_next] * wx
+            bottom_row = image[y_next, x0] * (1 - wx) + image[y_next, x_next] * wx
+            crop[row, col] = top_row * (1 - wy) + bottom_row * wy
+    return crop
+
+
+@pytest.fixture
+def image():
+    image = np.random.default_rng(0).integers(0, 256, (120, 160, 3), dtype=np.uint8)
+    # Smooth it so rounding differences stay within one level
+    return cv2.GaussianBlur(image, (5, 5), 0)
+
+
+@pytest.mark.parametrize("padding", [0.0, 0.1, 0.5])
+def test_crop_boxes_matches_scalar_path(image, padding):
+    boxes = np.array([[10, 20, 74, 84], [0, 0, 30, 12], [150, 100, 160, 120], [40.5, 30.25, 47.75, 60.5]])
+    crops = crop_boxes(image, boxes, 16, padding)
+    assert crops.shape == (4, 16, 16, 3) and crops.dtype == np.uint8
+    for crop, box in zip(crops, boxes.tolist()):
+        expected = scalar_crop(image, box, 16, padding)
+        assert np.abs(crop.astype(int) - np.rint(expected)).max() <= 1
+
+
+def test_crop_boxes_matches_cv2_resize_when_shrinking(image):
+    boxes = np.array([[8, 16, 72, 80], [40, 0, 160, 120], [0, 56, 32, 88]])
+    crops = crop_boxes(image, boxes, 16, padding=0)
+    for crop, (x1, y1, x2, y2) in zip(crops, boxes):
+        expected = cv2.resize(image[y1:y2, x1:x2], (16, 16), interpolation=cv2.INTER_LINEAR)
+        assert np.abs(crop.astype(int) - expected).max() <= 1
+
+
+def test_crop_boxes_empty(image):
+    assert crop_boxes(image, np.zeros((0, 4)), 32).shape == (0, 32, 32, 3)
+
+
+def test_folder_class_ids_maps_back_to_data_yaml():
+    names = {i: class_folder(class_id) for i, class_id in enumerate(sorted([12, 3, 0, 7]))}
+    np.testing.assert_array_equal(folder_class_ids(names), [0, 3, 7, 12])
+    assert sorted(class_folder(i) for i in range(13)) == [class_folder(i) for i in range(13)]
+
+
+@pytest.fixture
+def dataset(tmp_path, image):
+    data = tmp_path / "data"
+    for split in ("train", "valid", "test"):
+        (data / split / "images").mkdir(parents=True)
+        (data / split / "labels").mkdir(parents=True)
+    cv2.imwrite(str(data / "train" / "images" / "a.jpg"), image)
+    (data / "train" / "labels" / "a.txt").write_text("1 0.5 0.5 0.2 0.2\n2 0.25 0.25 0.1 0.1\n1 0.7 0.7 0.1 0.1\n")
+    cv2.imwrite(str(data / "train" / "images" / "background.jpg"), image)
+    (data / "train" / "images" / "broken.jpg").write_bytes(b"not a jpeg")
+    (data / "train" / "labels" / "broken.txt").write_text("0 0.5 0.5 0.2 0.2\n")
+    (data / "data.yaml").write_text("names: [x, y, z]\n")
+    return data
+
+
+def test_extract_writes_crops_per_class_and_reports_unreadable_images(tmp_path, dataset):
+    extractor = CropExtractor(str(dataset), str(dataset / "data.yaml"), size=24)
+    counts, failures = extractor.extract(str(tmp_path / "crops"), workers=2)
+    assert counts == {"train": [0, 2, 1], "valid": [0, 0, 0], "test": [0, 0, 0]}
+    assert [os.path.basename(path) for path, _ in failures] == ["broken.jpg"]
+
+    train = tmp_path / "crops" / "train"
+    assert sorted(os.listdir(train / class_folder(1))) == ["a_0.jpg", "a_2.jpg"]
+    assert cv2.imread(str(train / class_folder(2) / "a_1.jpg")).shape == (24, 24, 3)
+    assert os.listdir(tmp_path / "crops" / "val" / class_folder(0)) == []
+
+
+def test_agnostic_labels_keep_background_images(tmp_path, dataset):
+    extractor = CropExtractor(str(dataset), str(dataset / "data.yaml"))
+    output = tmp_path / "agnostic"
+    assert extractor.agnostic_labels(str(output), splits=["train"]) == 3
+
+    labels = output / "train" / "labels"
+    assert (labels / "background.txt").read_text() == ""
+    assert [line.split()[0] for line in (labels / "a.txt").read_text().splitlines()] == ["0", "0", "0"]
+    assert sorted(os.listdir(output / "train" / "images")) == ["a.jpg", "background.jpg", "broken.jpg"]
+    data_yaml = yaml.safe_load((output / "data.yaml").read_text())
+    assert data_yaml["names"] == ["sign"] and data_yaml["train"] == "train/images"
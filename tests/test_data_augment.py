@@ -0,0 +1,99 @@
+import os
+import numpy as np
+import pytest
+from PIL import Image
+from src.model.data_augment import DataAugment, letterbox_geometry
+from src.model.image_store import ImageStore
+
+
+@pytest.fixture
+def images(tmp_path):
+    folder = tmp_path / "images"
+    folder.mkdir()
+    rng = np.random.default_rng(0)
+    for i, size in enumerate([(1920, 1080), (800, 600), (640, 640)]):
+        pixels = rng.integers(0, 256, (size[1] // 8, size[0] // 8, 3), dtype=np.uint8)
+        Image.fromarray(pixels).resize(size).save(folder / f"{i}.jpg", quality=90)
+    return folder
+
+
+def test_store_holds_the_resize_fast_pixels(tmp_path, images):
+    store = ImageStore(str(tmp_path / "store"), str(images))
+    assert store.update() == 3
+    augment = DataAugment(str(images), str(tmp_path / "out"))
+    for filename in augment.list_images():
+        np.testing.assert_array_equal(store.image(filename), np.asarray(augment.resize_fast(str(images / filename))))
+
+
+def test_stored_and_decoded_base_images_are_the_same(tmp_path, images):
+    store = ImageStore(str(tmp_path / "store"), str(images))
+    store.update()
+    for name, used_store in [("decoded", None), ("stored", store)]:
+        augment = DataAugment(str(images), str(tmp_path / name / "base"), store=used_store)
+        blur = str(tmp_path / name / "blur")
+        assert augment.process_variants({blur: (augment.add_blur, ())}) == []
+
+    # Equal pixels are encoded to equal JPEG files
+    for filename in ["0.jpg", "1.jpg", "2.jpg"]:
+        for folder in ("base", "blur"):
+            decoded = Image.open(tmp_path / "decoded" / folder / filename)
+            stored = Image.open(tmp_path / "stored" / folder / filename)
+            assert decoded.size == (640, 640)
+            np.testing.assert_array_equal(np.asarray(decoded), np.asarray(stored))
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_failing_images_do_not_stop_the_others(tmp_path, images, workers):
+    (images / "broken.jpg").write_bytes(b"not a jpeg")
+    augment = DataAugment(str(images), str(tmp_path / "out"))
+    failures = augment.process_images(augment.add_blur, workers=workers, chunk_size=1)
+    assert [filename for filename, _ in failures] == ["broken.jpg"]
+    assert "UnidentifiedImageError" in failures[0][1]
+    assert sorted(os.listdir(tmp_path / "out")) == ["0.jpg", "1.jpg", "2.jpg"]
+
+
+def test_process_pool_matches_serial_run(tmp_path, images):
+    outputs = {}
+    for workers in (1, 3):
+        augment = DataAugment(str(images), str(tmp_path / f"base{workers}"))
+        variants = {str(tmp_path / f"noise{workers}"): (augment.add_noise, ()),
+                    str(tmp_path / f"contrast{workers}"): (augment.change_contrast, (1.5,))}
+        assert augment.process_variants(variants, workers=workers, chunk_size=2) == []
+        outputs[workers] = {folder: [np.asarray(Image.open(tmp_path / f"{folder}{workers}" / filename))
+                                     for filename in ["0.jpg", "1.jpg", "2.jpg"]]
+                            for folder in ("base", "noise", "contrast")}
+    for folder, serial in outputs[1].items():
+        for serial_image, pool_image in zip(serial, outputs[3][folder]):
+            np.testing.assert_array_equal(serial_image, pool_image)
+
+
+def test_resize_fast_stays_close_to_the_full_decode(tmp_path, images):
+    augment = DataAugment(str(images), str(tmp_path / "out"))
+    for filename in augment.list_images():
+        with Image.open(images / filename) as img:
+            full = np.asarray(img.convert('RGB').resize((640, 640), Image.BOX), dtype=np.int16)
+        fast = np.asarray(augment.resize_fast(str(images / filename)), dtype=np.int16)
+        assert fast.shape == (640, 640, 3)
+        assert np.abs(fast - full).mean() < 4
+
+
+@pytest.mark.parametrize("width, height, expected", [
+    (1920, 1080, (640, 360, 0, 140)), (600, 800, (480, 640, 80, 0)), (640, 640, (640, 640, 0, 0)),
+    (333, 100, (640, 192, 0, 224)), (5000, 1, (640, 1, 0, 319)),
+])
+def test_letterbox_geometry(width, height, expected):
+    assert letterbox_geometry(width, height, 640) == expected
+
+
+def test_letterbox_pastes_the_reduced_image_on_the_padding(tmp_path, images):
+    augment = DataAugment(str(images), str(tmp_path / "out"))
+    canvas, scale, (pad_x, pad_y) = augment.letterbox(str(images / "0.jpg"), color=(1, 2, 3))
+    assert canvas.size == (640, 640) and scale == (640 / 1920, 360 / 1080) and (pad_x, pad_y) == (0, 140)
+    pixels = np.asarray(canvas)
+    assert (pixels[:140] == (1, 2, 3)).all() and (pixels[500:] == (1, 2, 3)).all()
+    # The 1920x1080 JPEG is decoded at half scale, which still covers 640x360
+    with Image.open(images / "0.jpg") as img:
+        img.draft(None, (640, 360))
+        assert img.size == (960, 540)
+        expected = np.asarray(img.convert('RGB').resize((640, 360), Image.BOX))
+    np.testing.assert_array_equal(pixels[140:500], expected)
@@ -0,0 +1,168 @@
+import errno
+import os
+import cv2
+import numpy as np
+import pytest
+from src.model import data_collector
+from src.model.data_collector import DataCollectorAndDivider
+from src.model.image_writer import ImageWriterPool
+
+
+@pytest.fixture
+def frames(tmp_path):
+    images, labels = tmp_path / "frames", tmp_path / "labels"
+    images.mkdir()
+    labels.mkdir()
+    for i in range(20):
+        (images / f"image_{i}.jpg").write_bytes(b"jpeg %d" % i)
+        (labels / f"image_{i}.txt").write_text(f"{i % 3} 0.5 0.5 0.2 0.2\n")
+    return images, labels
+
+
+def cross_device_link(source, target):
+    raise OSError(errno.EXDEV, os.strerror(errno.EXDEV), source, None, target)
+
+
+@pytest.mark.parametrize("mode", ["hardlink", "manifest"])
+def test_hard_links_fall_back_to_symlinks_across_file_systems(tmp_path, frames, monkeypatch, mode):
+    images, labels = frames
+    monkeypatch.setattr(data_collector.os, "link", cross_device_link)
+    divider = DataCollectorAndDivider(None, str(images), str(tmp_path / "split"))
+    splits, failures = divider.split_dataset_linked(str(labels), mode)
+    assert failures == [] and sum(len(files) for files in splits.values()) == 20
+
+    folder = tmp_path / "split" / ("train" if mode == "hardlink" else "")
+    image_link = folder / "images" / splits["train"][0]
+    label_link = folder / "labels" / (os.path.splitext(splits["train"][0])[0] + ".txt")
+    assert os.path.islink(image_link) and os.path.islink(label_link)
+    assert os.path.samefile(image_link, images / splits["train"][0])
+    assert label_link.read_text() == (labels / label_link.name).read_text()
+
+
+def test_other_link_errors_are_raised(tmp_path, frames, monkeypatch):
+    images, labels = frames
+
+    def full_disk(source, target):
+        raise OSError(errno.ENOSPC, os.strerror(errno.ENOSPC))
+
+    monkeypatch.setattr(data_collector.os, "link", full_disk)
+    divider = DataCollectorAndDivider(None, str(images), str(tmp_path / "split"))
+    with pytest.raises(OSError):
+        divider.split_dataset_linked(str(labels), "hardlink")
+
+
+def test_ratios_must_sum_to_one(tmp_path, frames):
+    images, labels = frames
+    divider = DataCollectorAndDivider(None, str(images), str(tmp_path / "split"))
+    with pytest.raises(ValueError, match="sum to 1"):
+        divider.split_dataset_linked(str(labels), "manifest", 0.7, 0.2, 0.2)
+    assert not os.path.exists(tmp_path / "split")
+
+
+@pytest.fixture
+def video(tmp_path):
+    # Every frame is filled with its index so the saved frames can be told apart
+    path = str(tmp_path / "video.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 10, (64, 48))
+    for i in range(30):
+        writer.write(np.full((48, 64, 3), 8 * i, dtype=np.uint8))
+    writer.release()
+    return path
+
+
+def saved_frames(folder) -> dict:
+    return {int(name[len("image_"):-len(".jpg")]): cv2.imread(str(folder / name))
+            for name in os.listdir(folder)}
+
+
+def test_extract_frames_fast_keeps_the_stride_of_the_window(tmp_path, video):
+    divider = DataCollectorAndDivider(video, str(tmp_path / "frames"), None)
+    saved, failures = divider.extract_frames_fast(stride=3, start_time=1.0, end_time=2.5, workers=2)
+    frames = saved_frames(tmp_path / "frames")
+    assert (saved, failures) == (5, [])
+    assert sorted(frames) == [10, 13, 16, 19, 22]
+    for i, frame in frames.items():
+        assert abs(int(frame.mean()) - 8 * i) <= 2
+
+
+def test_extract_frames_fast_matches_extract_frame_for_every_frame(tmp_path, video):
+    slow = DataCollectorAndDivider(video, str(tmp_path / "slow"), None)
+    slow.extract_frame()
+    fast = DataCollectorAndDivider(video, str(tmp_path / "fast"), None)
+    assert fast.extract_frames_fast(workers=3, queue_size=2) == (30, [])
+    expected, frames = saved_frames(tmp_path / "slow"), saved_frames(tmp_path / "fast")
+    assert sorted(frames) == sorted(expected) == list(range(30))
+    for i, frame in frames.items():
+        np.testing.assert_array_equal(frame, expected[i])
+
+
+def test_target_fps_overrides_the_stride(tmp_path, video):
+    divider = DataCollectorAndDivider(video, str(tmp_path / "frames"), None)
+    assert divider.extract_frames_fast(stride=7, target_fps=5) == (15, [])
+    assert sorted(saved_frames(tmp_path / "frames")) == list(range(0, 30, 2))
+
+
+def test_writer_pool_reports_failed_images(tmp_path):
+    image = np.zeros((8, 8, 3), dtype=np.uint8)
+    with ImageWriterPool(workers=2) as writer:
+        writer.submit(str(tmp_path / "ok.jpg"), image)
+        writer.submit(str(tmp_path / "missing" / "bad.jpg"), image)
+    assert [path for path, _ in writer.failures] == [str(tmp_path / "missing" / "bad.jpg")]
+    assert os.path.exists(tmp_path / "ok.jpg")
+
+
+def class_counts(splits: dict, labels) -> dict:
+    return {split: sorted(int((labels / (os.path.splitext(f)[0] + ".txt")).read_text()[0]) for f in files)
+            for split, files in splits.items()}
+
+
+def test_stratified_split_keeps_the_ratios_of_every_class(tmp_path, frames):
+    images, labels = frames
+    divider = DataCollectorAndDivider(None, str(images), str(tmp_path / "split"))
+    splits, _ = divider.split_dataset_linked(str(labels), "manifest", stratify=True, seed=3)
+    # Classes 0 and 1 have 7 images, class 2 has 6
+    assert class_counts(splits, labels) == {"train": [0] * 5 + [1] * 5 + [2] * 4,
+                                            "test": [0, 1, 2], "valid": [0, 1, 2]}
+    assert sorted(sum(splits.values(), [])) == sorted(os.listdir(images))
+    assert divider.split_dataset_linked(str(labels), "manifest", stratify=True, seed=3)[0] == splits
+    for split, files in splits.items():
+        manifest = (tmp_path / "split" / f"{split}.txt").read_text().split()
+        # The labels are not next to the images, so the manifests list linked copies
+        assert manifest == [str(tmp_path / "split" / "images" / f) for f in files]
+
+
+@pytest.fixture
+def scenes(tmp_path):
+    # Six different scenes, each saved as three identical frames
+    folder = tmp_path / "scenes"
+    folder.mkdir()
+    rng = np.random.default_rng(0)
+    for scene in range(6):
+        image = cv2.resize(rng.integers(0, 256, (8, 9, 3), dtype=np.uint8), (90, 80))
+        for copy in range(3):
+            cv2.imwrite(str(folder / f"image_{3 * copy + scene * 9}.jpg"), image)
+    return folder
+
+
+def scene_of(img_file: str) -> int:
+    return int(img_file[len("image_"):-len(".jpg")]) // 9
+
+
+def test_near_duplicates_land_in_a_single_split(tmp_path, scenes):
+    divider = DataCollectorAndDivider(None, str(scenes), str(tmp_path / "split"))
+    splits, failures = divider.split_dataset_linked(dedup_threshold=4, seed=1)
+    assert failures == []
+    assert sorted(sum(splits.values(), [])) == sorted(os.listdir(scenes))
+    split_scenes = {split: {scene_of(f) for f in files} for split, files in splits.items()}
+    assert sum(len(found) for found in split_scenes.values()) == 6
+    # 18 frames in clusters of 3: 13 train frames round up to 5 clusters
+    assert [len(split_scenes[split]) for split in ("train", "test", "valid")] == [5, 1, 0]
+
+
+def test_drop_duplicates_keeps_one_frame_per_scene(tmp_path, scenes):
+    (scenes / "image_99.jpg").write_bytes(b"unreadable")
+    divider = DataCollectorAndDivider(None, str(scenes), str(tmp_path / "split"))
+    splits, failures = divider.split_dataset_linked(dedup_threshold=4, drop_duplicates=True)
+    kept = sum(splits.values(), [])
+    assert sorted(scene_of(f) for f in kept) == list(range(6))
+    assert [os.path.basename(path) for path, _ in failures] == ["image_99.jpg"]
@@ -0,0 +1,119 @@
+import os
+import numpy as np
+import cv2
+import pytest
+from src.model.dedup import HashIndex, connected_components, dhash, hamming
+
+
+def planted_hashes(count: int = 300, seed: int = 0) -> np.ndarray:
+    """
+    Random hashes, and copies of some of them with a few bits flipped or none at all
+    """
+    rng = np.random.default_rng(seed)
+    base = rng.integers(0, np.iinfo(np.uint64).max, count // 2, dtype=np.uint64, endpoint=True)
+    copies = base[rng.integers(0, len(base), count - len(base))].copy()
+    for i in range(len(copies)):
+        for bit in rng.choice(64, rng.integers(0, 7), replace=False):
+            copies[i] ^= np.uint64(1) << np.uint64(bit)
+    return np.concatenate([base, copies])
+
+
+def index_of(hashes: np.ndarray, tmp_path) -> HashIndex:
+    index = HashIndex(str(tmp_path / "index"), str(tmp_path))
+    index.hashes = hashes
+    index.files = [{"name": f"{i}.jpg", "mtime": 0, "size": 0} for i in range(len(hashes))]
+    return index
+
+
+def brute_force_pairs(hashes: np.ndarray, threshold: int) -> set:
+    values = [int(value) for value in hashes]
+    return {(i, j) for i in range(len(values)) for j in range(i + 1, len(values))
+            if bin(values[i] ^ values[j]).count("1") <= threshold}
+
+
+def test_dhash_matches_scalar_path():
+    image = np.random.default_rng(1).integers(0, 256, (60, 90, 3), dtype=np.uint8)
+    thumbnail = cv2.resize(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY), (9, 8), interpolation=cv2.INTER_AREA)
+    expected = 0
+    for row in range(8):
+        for col in range(8):
+            expected = expected << 1 | int(thumbnail[row, col + 1] > thumbnail[row, col])
+    assert int(dhash(image)) == expected
+    assert int(dhash(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY))) == expected
+
+
+def test_hamming_matches_scalar_popcount():
+    rng = np.random.default_rng(2)
+    a = rng.integers(0, np.iinfo(np.uint64).max, 50, dtype=np.uint64, endpoint=True)
+    b = rng.integers(0, np.iinfo(np.uint64).max, 40, dtype=np.uint64, endpoint=True)
+    expected = [[bin(int(x) ^ int(y)).count("1") for y in b] for x in a]
+    np.testing.assert_array_equal(hamming(a[:, None], b[None, :]), expected)
+    assert hamming(np.uint64(0), np.uint64(np.iinfo(np.uint64).max)) == 64
+
+
+@pytest.mark.parametrize("threshold", [0, 2, 4, 7])
+@pytest.mark.parametrize("block_size", [7, 1 << 20])
+def test_pairs_match_brute_force(tmp_path, threshold, block_size):
+    hashes = planted_hashes()
+    index = index_of(hashes, tmp_path)
+    found = set()
+    for first, second in index.close_pairs(threshold, block_size):
+        assert (first < second).all()
+        found.update(zip(first.tolist(), second.tolist()))
+    assert found == brute_force_pairs(hashes, threshold)
+
+    first, second = index.pairs(threshold)
+    assert set(zip(first.tolist(), second.tolist())) == found
+
+
+def test_clusters_match_brute_force(tmp_path):
+    # Many identical frames next to chains of near duplicates
+    hashes = np.concatenate([planted_hashes(seed=3), np.full(500, 12345, dtype=np.uint64)])
+    clusters = index_of(hashes, tmp_path).clusters(4)
+
+    expected = np.arange(len(hashes))
+    for i, j in sorted(brute_force_pairs(hashes, 4)):
+        old, new = max(expected[i], expected[j]), min(expected[i], expected[j])
+        expected[expected == old] = new
+    np.testing.assert_array_equal(clusters, expected)
+
+
+def test_incremental_components_match_one_pass():
+    rng = np.random.default_rng(4)
+    first, second = rng.integers(0, 200, 150), rng.integers(0, 200, 150)
+    expected = connected_components(200, first, second)
+    parent = None
+    for start in range(0, 150, 20):
+        parent = connected_components(200, first[start:start + 20], second[start:start + 20], parent)
+    np.testing.assert_array_equal(parent, expected)
+    assert (expected <= np.arange(200)).all()
+
+
+def test_update_hashes_only_changed_images(tmp_path):
+    images = tmp_path / "images"
+    images.mkdir()
+    rng = np.random.default_rng(5)
+    for i in range(3):
+        cv2.imwrite(str(images / f"{i}.png"), rng.integers(0, 256, (64, 64, 3), dtype=np.uint8))
+    index = HashIndex(str(tmp_path / "index"), str(images))
+    assert index.update() == (3, [])
+    assert index.update() == (0, [])
+
+    cv2.imwrite(str(images / "1.png"), rng.integers(0, 256, (64, 64, 3), dtype=np.uint8))
+    os.utime(images / "1.png", ns=(1, 1))
+    reloaded = HashIndex(str(tmp_path / "index"), str(images))
+    assert reloaded.filenames() == ["0.png", "1.png", "2.png"]
+    assert reloaded.update() == (1, [])
+    assert reloaded.unique(0) == ["0.png", "1.png", "2.png"]
+
+
+def test_update_reports_unreadable_images(tmp_path):
+    images = tmp_path / "images"
+    images.mkdir()
+    cv2.imwrite(str(images / "0.png"), np.random.default_rng(6).integers(0, 256, (64, 64, 3), dtype=np.uint8))
+    (images / "1.jpg").write_bytes(b"not a jpeg")
+    index = HashIndex(str(tmp_path / "index"), str(images))
+    assert index.update() == (1, [(str(images / "1.jpg"), "cv2.imread returned None")])
+    assert index.filenames() == ["0.png"] and len(index.hashes) == 1
+    # The broken image is tried again until it can be read
+    assert index.update()[1] == [(str(images / "1.jpg"), "cv2.imread returned None")]
@@ -0,0 +1,42 @@
+import csv
+import json
+import numpy as np
+from src.model.detection_sink import FIELDS, DetectionSink
+
+NAMES = {0: "Cấm đi ngược chiều", 1: "Stop"}
+
+
+def write_frames(sink: DetectionSink) -> None:
+    sink.write(0, 0.0, np.array([[1.04, 2, 30.26, 40]]), np.array([0.91234]), np.array([1]))
+    sink.write(1, 1 / 30, np.zeros((0, 4)), np.zeros(0), np.zeros(0, dtype=int))
+    sink.write(2, 2 / 30, np.array([[5, 6, 7, 8], [9, 10, 11, 12.]]), np.array([0.5, 0.25]),
+               np.array([0, 7]), track_ids=np.array([3, 4]))
+
+
+def test_jsonl_rows_follow_the_frames(tmp_path):
+    path = str(tmp_path / "detections.jsonl")
+    with DetectionSink(path, NAMES) as sink:
+        write_frames(sink)
+    with open(path, encoding="utf-8") as file:
+        rows = [json.loads(line) for line in file]
+    assert rows == [
+        {"frame": 0, "timestamp": 0.0, "class_id": 1, "class_name": "Stop", "confidence": 0.9123,
+         "x1": 1.0, "y1": 2.0, "x2": 30.3, "y2": 40.0, "track_id": None},
+        {"frame": 2, "timestamp": 0.067, "class_id": 0, "class_name": NAMES[0], "confidence": 0.5,
+         "x1": 5.0, "y1": 6.0, "x2": 7.0, "y2": 8.0, "track_id": 3},
+        {"frame": 2, "timestamp": 0.067, "class_id": 7, "class_name": "", "confidence": 0.25,
+         "x1": 9.0, "y1": 10.0, "x2": 11.0, "y2": 12.0, "track_id": 4},
+    ]
+
+
+def test_csv_has_a_header_and_the_same_rows(tmp_path):
+    with DetectionSink(str(tmp_path / "detections.jsonl"), NAMES) as sink:
+        write_frames(sink)
+    with DetectionSink(str(tmp_path / "detections.csv"), NAMES) as sink:
+        write_frames(sink)
+    with open(tmp_path / "detections.csv", newline="", encoding="utf-8") as file:
+        header, *rows = list(csv.reader(file))
+    with open(tmp_path / "detections.jsonl", encoding="utf-8") as file:
+        expected = [json.loads(line) for line in file]
+    assert header == FIELDS
+    assert rows == [["" if value is None else str(value) for value in row.values()] for row in expected]
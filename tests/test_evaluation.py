@@ -0,0 +1,166 @@
+import os
+import numpy as np
+import cv2
+import pytest
+from src.model.box_ops import format_yolo_lines
+from src.model.evaluation import IOU_THRESHOLDS, Evaluation, average_precision
+
+NAMES = ["a", "b", "c"]
+# As in ultralytics, the curve drops to 0 at recall 1, so perfect predictions score 0.995
+PERFECT_AP = 0.995
+
+
+class FakeModel:
+    def __init__(self, predictions: list) -> None:
+        self.predictions = predictions
+        self.calls = 0
+
+    def __call__(self, frames, **kwargs):
+        self.calls += 1
+        # The first pixel of every image holds its index
+        return [self.predictions[int(frame[0, 0, 0])] for frame in frames]
+
+
+class FakeDetection:
+    """
+    Stands in for Detection, a result is already the (boxes, confidences, class ids) of an image
+    """
+    backend = "torch"
+    imgsz = 640
+    int8 = False
+
+    def __init__(self, model: str, predictions: list) -> None:
+        self.model = model
+        self.fake = FakeModel(predictions)
+
+    def load(self):
+        return self.fake
+
+    def extract_detections(self, result):
+        return result
+
+
+def make_evaluation(tmp_path, labels: list, predictions: list, size: int = 100) -> Evaluation:
+    """
+    Write one size x size image per entry of labels, labels are (N, 5) YOLO boxes or None for no
+    label file, and predictions are (boxes in pixels, confidences, class ids) per image
+    """
+    for folder in ("images", "labels"):
+        (tmp_path / "test" / folder).mkdir(parents=True, exist_ok=True)
+    for i, boxes in enumerate(labels):
+        # Images already written are kept, so a second evaluation finds its cache fresh
+        image_path = tmp_path / "test" / "images" / f"{i:03d}.png"
+        if not image_path.exists():
+            cv2.imwrite(str(image_path), np.full((size, size, 3), i, np.uint8))
+        if boxes is not None:
+            label_path = tmp_path / "test" / "labels" / f"{i:03d}.txt"
+            label_path.write_text(format_yolo_lines(np.array(boxes).reshape(-1, 5)))
+    (tmp_path / "data.yaml").write_text(f"names: {NAMES}\n")
+    predictions = [(np.array(boxes, dtype=float).reshape(-1, 4), np.array(confidences, dtype=float),
+                    np.array(class_ids, dtype=int)) for boxes, confidences, class_ids in predictions]
+    return Evaluation(FakeDetection(str(tmp_path / "model.pt"), predictions), str(tmp_path),
+                      data_yaml=str(tmp_path / "data.yaml"), cache_folder=str(tmp_path / "cache"))
+
+
+def scalar_average_precision(recall: list, precision: list) -> float:
+    """
+    The precision envelope sampled at 101 recall points and integrated with the trapezoid rule,
+    one value at a time
+    """
+    recall = [0.0, *recall, 1.0]
+    precision = [1.0, *precision, 0.0]
+    for i in range(len(precision) - 2, -1, -1):
+        precision[i] = max(precision[i], precision[i + 1])
+    points = [i / 100 for i in range(101)]
+    curve = [float(np.interp(point, recall, precision)) for point in points]
+    return sum((points[i + 1] - points[i]) * (curve[i + 1] + curve[i]) / 2 for i in range(100))
+
+
+def test_average_precision_matches_scalar_path():
+    rng = np.random.default_rng(0)
+    hits = rng.uniform(size=(40, 10)) < np.linspace(0.9, 0.2, 10)
+    true_cumsum = np.cumsum(hits, axis=0)
+    recall = true_cumsum / 50
+    precision = true_cumsum / np.arange(1, 41)[:, None]
+    expected = [scalar_average_precision(recall[:, t].tolist(), precision[:, t].tolist()) for t in range(10)]
+    np.testing.assert_allclose(average_precision(recall, precision), expected, atol=1e-12)
+
+
+def test_perfect_predictions(tmp_path):
+    labels = [[[0, 0.5, 0.5, 0.2, 0.2], [1, 0.2, 0.2, 0.1, 0.1]], [[2, 0.7, 0.7, 0.3, 0.3]]]
+    predictions = [([[40, 40, 60, 60], [15, 15, 25, 25]], [0.9, 0.8], [0, 1]), ([[55, 55, 85, 85]], [0.7], [2])]
+    result = make_evaluation(tmp_path, labels, predictions).evaluate()
+    assert result["precision"] == result["recall"] == 1.0
+    assert result["map50"] == pytest.approx(PERFECT_AP) and result["map50_95"] == pytest.approx(PERFECT_AP)
+    np.testing.assert_array_equal(result["confusion_matrix"], np.eye(3, dtype=int))
+    assert result["false_positives"].sum() == result["missed"].sum() == 0
+
+
+def test_shifted_box_is_a_true_positive_up_to_its_iou(tmp_path):
+    # The prediction is shifted by 8 pixels on a 40 pixel box, IoU 1280 / 1920 = 0.67
+    labels = [[[0, 0.5, 0.5, 0.4, 0.4]]]
+    predictions = [([[38, 30, 78, 70]], [0.9], [0])]
+    result = make_evaluation(tmp_path, labels, predictions).evaluate()
+    assert result["map50"] == pytest.approx(PERFECT_AP)
+    assert result["map50_95"] == pytest.approx(PERFECT_AP * np.mean(IOU_THRESHOLDS < 2 / 3))
+
+
+def test_wrong_class_and_duplicates(tmp_path):
+    labels = [[[0, 0.5, 0.5, 0.2, 0.2]], [[1, 0.5, 0.5, 0.2, 0.2]], None]
+    predictions = [([[40, 40, 60, 60], [40, 40, 60, 61]], [0.9, 0.8], [0, 0]),
+                   ([[40, 40, 60, 60]], [0.9], [2]),
+                   ([[10, 10, 20, 20]], [0.3], [1])]
+    result = make_evaluation(tmp_path, labels, predictions).evaluate(conf=0.25)
+    classes = {row["name"]: row for row in result["classes"]}
+    assert classes["a"]["precision"] == 0.5 and classes["a"]["recall"] == 1.0
+    assert classes["b"]["recall"] == 0.0 and classes["b"]["instances"] == 1
+    assert result["confusion_matrix"][1, 2] == 1
+    np.testing.assert_array_equal(result["false_positives"], [1, 1, 0])
+    np.testing.assert_array_equal(result["missed"], [0, 0, 0])
+
+
+def test_classes_missing_from_data_yaml_are_ignored(tmp_path):
+    labels = [[[0, 0.5, 0.5, 0.2, 0.2], [7, 0.1, 0.1, 0.1, 0.1]]]
+    predictions = [([[40, 40, 60, 60], [0, 0, 10, 10]], [0.9, 0.8], [0, 9])]
+    result = make_evaluation(tmp_path, labels, predictions).evaluate()
+    assert result["unknown"] == {"predictions": 1, "labels": 1}
+    assert result["map50"] == pytest.approx(PERFECT_AP)
+    assert result["confusion_matrix"].sum() == 1
+
+
+def test_predictions_are_cached(tmp_path):
+    labels = [[[0, 0.5, 0.5, 0.2, 0.2]], [[1, 0.5, 0.5, 0.2, 0.2]]]
+    predictions = [([[40, 40, 60, 60]], [0.9], [0]), ([[40, 40, 60, 60]], [0.6], [1])]
+    first = make_evaluation(tmp_path, labels, predictions)
+    expected = first.evaluate()
+    assert first.detection.fake.calls == 1
+
+    second = make_evaluation(tmp_path, labels, predictions)
+    result = second.evaluate()
+    assert second.detection.fake.calls == 0
+    assert result["map50_95"] == expected["map50_95"]
+    np.testing.assert_array_equal(result["confusion_matrix"], expected["confusion_matrix"])
+
+
+def test_sweep_trades_precision_for_recall(tmp_path):
+    labels = [[[0, 0.5, 0.5, 0.2, 0.2]], [[0, 0.5, 0.5, 0.2, 0.2]]]
+    predictions = [([[40, 40, 60, 60], [0, 0, 10, 10]], [0.9, 0.5], [0, 0]), ([[40, 40, 60, 60]], [0.3], [0])]
+    sweep = make_evaluation(tmp_path, labels, predictions).sweep([0.2, 0.4, 0.8])
+    assert [recall for _, _, recall in sweep] == [1.0, 0.5, 0.5]
+    assert [precision for _, precision, _ in sweep] == pytest.approx([2 / 3, 0.5, 1.0])
+
+
+def test_replaced_images_are_inferred_again(tmp_path):
+    labels = [[[0, 0.5, 0.5, 0.2, 0.2]], [[1, 0.5, 0.5, 0.2, 0.2]]]
+    predictions = [([[40, 40, 60, 60]], [0.9], [0]), ([[40, 40, 60, 60]], [0.6], [1])]
+    first = make_evaluation(tmp_path, labels, predictions)
+    assert first.evaluate()["recall"] == 1.0
+
+    # Image 1 is replaced under the same name by a copy of image 0, whose prediction has the wrong class
+    image_path = tmp_path / "test" / "images" / "001.png"
+    cv2.imwrite(str(image_path), np.zeros((100, 100, 3), np.uint8))
+    os.utime(image_path, ns=(1, 1))
+    second = make_evaluation(tmp_path, labels, predictions)
+    result = second.evaluate()
+    assert second.detection.fake.calls == 1
+    assert result["recall"] == 0.5
@@ -0,0 +1,55 @@
+import time
+import cv2
+import numpy as np
+import pytest
+from src.model.frame_reader import FrameReader
+
+
+@pytest.fixture
+def video(tmp_path):
+    # Every frame is filled with its index so the frames can be told apart
+    path = str(tmp_path / "video.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 20, (32, 24))
+    for i in range(25):
+        writer.write(np.full((24, 32, 3), 8 * i, dtype=np.uint8))
+    writer.release()
+    return path
+
+
+def test_frames_arrive_in_order_with_their_timestamps(video):
+    reader = FrameReader(video, queue_size=2)
+    reader.start()
+    items = list(reader.frames())
+    reader.join()
+    assert [index for index, _, _ in items] == list(range(25))
+    assert [timestamp for _, timestamp, _ in items] == pytest.approx([i / 20 for i in range(25)])
+    for index, _, frame in items:
+        assert abs(int(frame.mean()) - 8 * index) <= 2
+    assert reader.metrics.snapshot()["stages"]["read"]["total_count"] == 26
+
+
+def test_batches_keep_the_order_and_the_last_partial_batch(video):
+    reader = FrameReader(video)
+    reader.start()
+    batches = list(reader.batches(10))
+    assert [len(batch) for batch in batches] == [10, 10, 5]
+    assert [index for batch in batches for index, _, _ in batch] == list(range(25))
+
+
+def test_drop_oldest_keeps_the_order_of_the_newest_frames(video):
+    reader = FrameReader(video, queue_size=3, drop_oldest=True)
+    reader.start()
+    reader.join()
+    indices = [index for index, _, _ in reader.frames()]
+    assert indices == sorted(indices) and indices[-1] == 24
+    assert len(indices) < 25
+    assert reader.metrics.counters["dropped_frames"] == 25 - len(indices)
+
+
+def test_stop_does_not_wait_for_a_full_queue(video):
+    reader = FrameReader(video, queue_size=1)
+    reader.start()
+    time.sleep(0.05)
+    started = time.monotonic()
+    reader.stop()
+    assert not reader.is_alive() and time.monotonic() - started < 1
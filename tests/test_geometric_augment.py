@@ -0,0 +1,200 @@
+import os
+import numpy as np
+import pytest
+from PIL import Image
+from src.model.box_ops import format_yolo_lines, xyxy_to_yolo, yolo_to_xyxy
+from src.model.build_cache import BuildCache
+from src.model.data_augment import DataAugment
+from src.model.geometric_augment import GeometricAugment
+from src.model.image_store import ImageStore
+
+
+@pytest.fixture
+def augment(tmp_path):
+    return GeometricAugment(str(tmp_path), str(tmp_path), str(tmp_path / "out"), min_visibility=0.3)
+
+
+@pytest.fixture
+def image():
+    return np.random.default_rng(0).integers(0, 256, (90, 160, 3), dtype=np.uint8)
+
+
+def random_boxes(count: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    size = rng.uniform(0.05, 0.4, (count, 2))
+    center = rng.uniform(size / 2, 1 - size / 2)
+    return np.concatenate([rng.integers(0, 13, (count, 1)), center, size], axis=1)
+
+
+def scalar_transform_boxes(boxes, matrix, image_size, output_size, min_visibility):
+    """
+    One box at a time: transform the corners, enclose, clip and drop boxes mostly outside
+    """
+    result = []
+    for label, *box in boxes.tolist():
+        x1, y1, x2, y2 = yolo_to_xyxy(np.array([box]), *image_size)[0]
+        points = [matrix @ [x, y, 1] for x, y in ((x1, y1), (x2, y1), (x2, y2), (x1, y2))]
+        xs, ys = [point[0] for point in points], [point[1] for point in points]
+        enclosing = [min(xs), min(ys), max(xs), max(ys)]
+        clipped = [min(max(enclosing[0], 0), output_size[0]), min(max(enclosing[1], 0), output_size[1]),
+                   min(max(enclosing[2], 0), output_size[0]), min(max(enclosing[3], 0), output_size[1])]
+        area = (enclosing[2] - enclosing[0]) * (enclosing[3] - enclosing[1])
+        clipped_width, clipped_height = clipped[2] - clipped[0], clipped[3] - clipped[1]
+        if clipped_width * clipped_height / max(area, 1e-9) < min_visibility:
+            continue
+        if clipped_width <= 1 or clipped_height <= 1:
+            continue
+        result.append([label, *xyxy_to_yolo(np.array([clipped]), *output_size)[0]])
+    return np.array(result).reshape(-1, 5)
+
+
+@pytest.mark.parametrize("operation, args", [
+    ("rotate_matrix", (17.0,)), ("rotate_matrix", (-90.0,)), ("flip_matrix", (True,)), ("flip_matrix", (False,)),
+    ("scale_matrix", (1.4,)), ("scale_matrix", (0.6,)), ("translate_matrix", (0.3, -0.2)),
+    ("letterbox_matrix", ()), ("resize_matrix", ()),
+])
+def test_transform_boxes_matches_scalar_path(augment, operation, args):
+    boxes = random_boxes(100)
+    matrix, output_size = getattr(augment, operation)(160, 90, *args)
+    expected = scalar_transform_boxes(boxes, matrix, (160, 90), output_size, augment.min_visibility)
+    np.testing.assert_allclose(augment.transform_boxes(boxes, matrix, (160, 90), output_size), expected,
+                               rtol=0, atol=1e-9)
+
+
+def test_rotate_matrix_matches_data_augment_rotate(augment, image):
+    matrix, output_size = augment.rotate_matrix(160, 90, 30.0)
+    rotated = DataAugment("unused", "unused").rotate(Image.fromarray(image), 30.0)
+    assert rotated.size == output_size
+
+
+def test_rotate_boxes_match_hand_computed_rotation(augment):
+    # 45 degrees on a 100 x 100 image: the canvas grows to 141 x 141 and the center moves to 70.5
+    boxes = xyxy_to_yolo(np.array([[0, 0, 20, 20], [40, 30, 60, 50.]]), 100, 100)
+    boxes = np.concatenate([[[3], [5]], boxes], axis=1)
+    matrix, output_size = augment.rotate_matrix(100, 100, 45.0)
+    assert output_size == (141, 141)
+
+    # Counterclockwise, a corner offset (dx, dy) from the center lands on (s * (dx + dy), s * (dy - dx))
+    s = np.sqrt(0.5)
+    expected = np.array([
+        # The top-left box sticks out of the canvas by 0.21 pixels on the left and is clipped
+        [0, 70.5 - 20 * s, 70.5 - 60 * s, 70.5 + 20 * s],
+        [70.5 - 30 * s, 70.5 - 30 * s, 70.5 + 10 * s, 70.5 + 10 * s],
+    ])
+    rotated = augment.transform_boxes(boxes, matrix, (100, 100), output_size)
+    np.testing.assert_array_equal(rotated[:, 0], [3, 5])
+    np.testing.assert_allclose(yolo_to_xyxy(rotated[:, 1:], *output_size), expected, atol=1e-9)
+
+
+@pytest.mark.parametrize("horizontal, flip", [(True, np.fliplr), (False, np.flipud)])
+def test_flip_moves_pixels_and_boxes_together(augment, image, horizontal, flip):
+    boxes = random_boxes(10)
+    flipped, flipped_boxes = augment.apply(image, boxes, augment.flip_matrix, horizontal)
+    np.testing.assert_array_equal(flipped, flip(image))
+
+    axis = 1 if horizontal else 2
+    np.testing.assert_allclose(flipped_boxes[:, axis], 1 - boxes[:, axis], atol=1e-12)
+    _, restored = augment.apply(flipped, flipped_boxes, augment.flip_matrix, horizontal)
+    np.testing.assert_allclose(restored, boxes, atol=1e-12)
+
+
+def test_resize_keeps_normalized_boxes(augment, image):
+    boxes = random_boxes(10)
+    resized, resized_boxes = augment.apply(image, boxes, augment.resize_matrix)
+    assert resized.shape == (640, 640, 3)
+    np.testing.assert_allclose(resized_boxes, boxes, atol=1e-12)
+
+
+@pytest.mark.parametrize("width, height", [(160, 90), (90, 160), (641, 479), (3, 1000)])
+def test_letterbox_matrix_matches_data_augment_letterbox(augment, width, height):
+    image = np.full((height, width, 3), 255, dtype=np.uint8)
+    matrix, output_size = augment.letterbox_matrix(width, height)
+    letterboxed, (scale_x, scale_y), (pad_x, pad_y) = DataAugment("unused", "unused").letterbox(Image.fromarray(image))
+    assert output_size == letterboxed.size == (640, 640)
+    np.testing.assert_array_equal(matrix, [[scale_x, 0, pad_x], [0, scale_y, pad_y]])
+
+    # The image corners land exactly on the edges of the pasted image
+    x1, y1 = matrix[:, 2]
+    x2, y2 = matrix @ [width, height, 1]
+    x1, y1, x2, y2 = int(x1), int(y1), round(x2), round(y2)
+    assert abs(x2 - (matrix @ [width, height, 1])[0]) < 1e-9
+    pixels = np.asarray(letterboxed)
+    assert (pixels[y1:y2, x1:x2] == 255).all()
+    assert (pixels[:y1] == 114).all() and (pixels[y2:] == 114).all()
+    assert (pixels[:, :x1] == 114).all() and (pixels[:, x2:] == 114).all()
+
+
+def test_boxes_moved_out_of_the_image_are_dropped(augment):
+    boxes = np.array([[1, 0.1, 0.5, 0.1, 0.1], [2, 0.9, 0.5, 0.1, 0.1]])
+    matrix, output_size = augment.translate_matrix(160, 90, 0.5, 0)
+    kept = augment.transform_boxes(boxes, matrix, (160, 90), output_size)
+    np.testing.assert_array_equal(kept[:, 0], [1])
+    np.testing.assert_allclose(kept[0, 1:], [0.6, 0.5, 0.1, 0.1], atol=1e-12)
+
+
+def test_empty_boxes(augment):
+    matrix, output_size = augment.rotate_matrix(160, 90, 10.0)
+    assert augment.transform_boxes(np.zeros((0, 5)), matrix, (160, 90), output_size).shape == (0, 5)
+
+
+@pytest.fixture
+def dataset(tmp_path, image):
+    images, labels = tmp_path / "images", tmp_path / "labels"
+    images.mkdir()
+    labels.mkdir()
+    for i in range(3):
+        Image.fromarray(np.roll(image, 20 * i, axis=1)).save(images / f"{i}.png")
+    # The first box hangs over the left edge and is clipped, the second is a sliver that is dropped
+    (labels / "0.txt").write_text(format_yolo_lines(np.array([[1, 0.05, 0.5, 0.2, 0.2], [2, -0.01, 0.5, 0.0, 0.3]])))
+    (labels / "1.txt").write_text(format_yolo_lines(random_boxes(5)))
+    return images, labels
+
+
+def read_pairs(folder) -> dict:
+    return {name: (np.asarray(Image.open(folder / "images" / name)),
+                   (folder / "labels" / (os.path.splitext(name)[0] + ".txt")).read_text())
+            for name in sorted(os.listdir(folder / "images"))}
+
+
+def test_stored_and_decoded_base_pairs_are_the_same(tmp_path, dataset):
+    images, labels = dataset
+    store = ImageStore(str(tmp_path / "store"), str(images), str(labels))
+    store.update()
+    results = []
+    for name, used_store in [("decoded", None), ("stored", store)]:
+        augment = GeometricAugment(str(images), str(labels), str(tmp_path / name / "base"), store=used_store)
+        failures = augment.process_variants({str(tmp_path / name / "flip"): (augment.flip_matrix, (True,))},
+                                            photometric={str(tmp_path / name / "blur"): (augment.add_blur, ())})
+        assert failures == []
+        results.append({folder: read_pairs(tmp_path / name / folder) for folder in ("base", "flip", "blur")})
+
+    decoded, stored = results
+    for folder in decoded:
+        assert decoded[folder].keys() == stored[folder].keys() == {"0.png", "1.png", "2.png"}
+        for filename, (image, label) in decoded[folder].items():
+            np.testing.assert_array_equal(image, stored[folder][filename][0])
+            assert label == stored[folder][filename][1]
+    assert len(decoded["base"]["0.png"][1].splitlines()) == 1
+    assert decoded["base"]["2.png"][1] == ""
+
+
+def test_process_variants_skips_up_to_date_pairs(tmp_path, dataset):
+    images, labels = dataset
+    augment = GeometricAugment(str(images), str(labels), str(tmp_path / "base"))
+    cache = BuildCache(str(tmp_path / "cache.json"))
+    processed = []
+    process_file_variants = augment.process_file_variants
+    augment.process_file_variants = lambda filename, *args: (processed.append(filename),
+                                                             process_file_variants(filename, *args))
+    variants = {str(tmp_path / "flip"): (augment.flip_matrix, (True,))}
+    assert augment.process_variants(variants, None, 1, 16, cache) == []
+    assert augment.process_variants(variants, cache=cache) == []
+    assert processed == ["0.png", "1.png", "2.png"]
+
+    # A changed label file builds its image again, a removed image loses its pairs
+    (labels / "1.txt").write_text(format_yolo_lines(random_boxes(2, seed=1)))
+    os.remove(images / "2.png")
+    assert augment.process_variants(variants, cache=cache) == []
+    assert processed[3:] == ["1.png"]
+    assert sorted(os.listdir(tmp_path / "flip" / "images")) == ["0.png", "1.png"]
+    assert sorted(os.listdir(tmp_path / "base" / "labels")) == ["0.txt", "1.txt"]
@@ -0,0 +1,93 @@
+import os
+import pickle
+import numpy as np
+import pytest
+from PIL import Image
+from src.model.image_store import ImageStore, resize_reduced
+
+LABELS = {"a": [[0, 0.5, 0.5, 0.2, 0.2], [3, 0.1, 0.2, 0.05, 0.1]], "b": [], "d": [[1, 0.3, 0.3, 0.5, 0.4]]}
+
+
+def write_image(path, seed: int, size: tuple = (120, 90)) -> None:
+    rng = np.random.default_rng(seed)
+    Image.fromarray(rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8)).save(path)
+
+
+@pytest.fixture
+def folders(tmp_path):
+    images, labels = tmp_path / "images", tmp_path / "labels"
+    images.mkdir()
+    labels.mkdir()
+    # c has no label file, b an empty one
+    for seed, stem in enumerate("abcd"):
+        write_image(images / f"{stem}.jpg" if stem != "d" else images / "d.png", seed)
+    for stem, boxes in LABELS.items():
+        (labels / f"{stem}.txt").write_text("".join(" ".join(map(str, box)) + "\n" for box in boxes))
+    return images, labels
+
+
+def expected_image(path, size: int) -> np.ndarray:
+    with Image.open(path) as img:
+        return np.asarray(resize_reduced(img, size))
+
+
+def test_images_and_boxes_round_trip(tmp_path, folders):
+    images, labels = folders
+    store = ImageStore(str(tmp_path / "store"), str(images), str(labels), size=32)
+    assert store.update() == 4
+    assert [record["name"] for record in store.files] == ["a.jpg", "b.jpg", "c.jpg", "d.png"]
+    np.testing.assert_array_equal(store.offsets, [0, 2, 2, 2, 3])
+    for name in os.listdir(images):
+        np.testing.assert_array_equal(store.image(name), expected_image(images / name, 32))
+    np.testing.assert_array_equal(store.labels("a.jpg"), np.array(LABELS["a"], dtype=np.float32))
+    assert store.labels("b.jpg").shape == store.labels("c.jpg").shape == (0, 5)
+
+    reloaded = ImageStore(str(tmp_path / "store"), str(images), str(labels), size=32)
+    assert isinstance(reloaded.images, np.memmap) and len(reloaded) == 4 and "d.png" in reloaded
+    np.testing.assert_array_equal(reloaded.batch(slice(0, 4)), store.batch([0, 1, 2, 3]))
+    np.testing.assert_array_equal(reloaded.labels("d.png"), store.labels("d.png"))
+    assert reloaded.update() == 0
+
+
+def test_empty_folder(tmp_path):
+    (tmp_path / "images").mkdir()
+    store = ImageStore(str(tmp_path / "store"), str(tmp_path / "images"), size=16)
+    assert store.update() == 0 and len(store) == 0
+    assert store.images.shape == (0, 16, 16, 3) and store.offsets.tolist() == [0]
+    # A store that was never built survives pickling
+    assert len(pickle.loads(pickle.dumps(store))) == 0
+
+
+def test_update_decodes_only_changed_images(tmp_path, folders):
+    images, labels = folders
+    store = ImageStore(str(tmp_path / "store"), str(images), str(labels), size=32)
+    store.update()
+    write_image(images / "b.jpg", seed=10, size=(60, 60))
+    os.remove(images / "c.jpg")
+    write_image(images / "e.jpg", seed=11)
+    (labels / "a.txt").write_text("2 0.5 0.5 0.1 0.1\n")
+    assert not store.is_fresh("b.jpg") and store.is_fresh("a.jpg")
+
+    assert store.update() == 2
+    assert [record["name"] for record in store.files] == ["a.jpg", "b.jpg", "d.png", "e.jpg"]
+    for name in os.listdir(images):
+        np.testing.assert_array_equal(store.image(name), expected_image(images / name, 32))
+    np.testing.assert_array_equal(store.labels("a.jpg"), np.array([[2, 0.5, 0.5, 0.1, 0.1]], dtype=np.float32))
+    np.testing.assert_array_equal(store.labels("d.png"), np.array(LABELS["d"], dtype=np.float32))
+    assert store.is_fresh("b.jpg") and not store.is_fresh("c.jpg")
+
+
+def test_pickled_store_maps_the_files_again(tmp_path, folders):
+    images, labels = folders
+    store = ImageStore(str(tmp_path / "store"), str(images), str(labels), size=32)
+    store.update()
+    copy = pickle.loads(pickle.dumps(store))
+    assert isinstance(copy.images, np.memmap)
+    np.testing.assert_array_equal(copy.image("c.jpg"), store.image("c.jpg"))
+
+
+def test_size_mismatch(tmp_path, folders):
+    images, _ = folders
+    ImageStore(str(tmp_path / "store"), str(images), size=32).update()
+    with pytest.raises(ValueError, match="32x32"):
+        ImageStore(str(tmp_path / "store"), str(images), size=64)
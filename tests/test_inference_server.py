@@ -0,0 +1,129 @@
+import asyncio
+import base64
+import json
+import time
+import cv2
+import numpy as np
+from src.model.inference_server import InferenceServer
+from src.model.metrics import Metrics
+
+
+class FakeModel:
+    names = {0: "Stop"}
+
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+        self.batches = []
+
+    def __call__(self, frames, imgsz, verbose):
+        self.batches.append(len(frames))
+        time.sleep(self.delay)
+        # The result of a frame is its mean, so every request can check it got its own
+        return [float(frame.mean()) for frame in frames]
+
+
+class FakeDetection:
+    imgsz = 64
+
+    def __init__(self, model: FakeModel) -> None:
+        self.model = model
+        self.metrics = Metrics()
+
+    def load(self):
+        return self.model
+
+    def extract_detections(self, result):
+        return np.array([[result, 0, 10, 10]]), np.array([0.5]), np.array([0])
+
+
+def frame(value: int) -> np.ndarray:
+    return np.full((8, 8, 3), value, dtype=np.uint8)
+
+
+async def running(server: InferenceServer, coroutine):
+    server.model = server.detection.load()
+    server.queue = asyncio.Queue(maxsize=server.max_queue)
+    batcher = asyncio.create_task(server.batch_loop())
+    try:
+        return await coroutine
+    finally:
+        batcher.cancel()
+
+
+def run(server: InferenceServer, *requests) -> list:
+    async def submit_all():
+        return await asyncio.gather(*(server.submit(frames) for frames in requests))
+    return asyncio.run(running(server, submit_all()))
+
+
+def test_concurrent_requests_share_a_batch():
+    model = FakeModel()
+    server = InferenceServer(FakeDetection(model), max_batch_size=8, max_wait_ms=50)
+    responses = run(server, [frame(1)], [frame(2), frame(3)], [frame(4)])
+    assert model.batches == [4]
+    assert [status for status, _ in responses] == [200, 200, 200]
+    first_boxes = [[detection["box"][0] for detection in result] for _, response in responses
+                   for result in response["results"]]
+    assert first_boxes == [[1.0], [2.0], [3.0], [4.0]]
+    assert server.detection.metrics.counters["server_batches"] == 1
+
+
+def test_batches_are_capped_at_max_batch_size():
+    model = FakeModel()
+    server = InferenceServer(FakeDetection(model), max_batch_size=2, max_wait_ms=50)
+    responses = run(server, *[[frame(i)] for i in range(5)])
+    assert model.batches == [2, 2, 1]
+    assert [response["results"][0][0]["box"][0] for _, response in responses] == [0, 1, 2, 3, 4]
+
+
+def test_full_queue_and_oversized_requests_are_rejected():
+    server = InferenceServer(FakeDetection(FakeModel(delay=0.2)), max_batch_size=1, max_queue=2)
+    statuses = [status for status, _ in run(server, [frame(0)], [frame(1)], [frame(2)], [frame(3)] * 3)]
+    # The first two frames fill the queue before the batcher takes any of them
+    assert statuses == [200, 200, 503, 413]
+    assert server.detection.metrics.counters["server_rejected"] == 4
+
+
+def test_slow_model_times_out():
+    server = InferenceServer(FakeDetection(FakeModel(delay=0.3)), request_timeout=0.05)
+    (status, response), = run(server, [frame(0)])
+    assert status == 504 and server.detection.metrics.counters["server_timeouts"] == 1
+
+
+async def http(port: int, request: bytes) -> tuple:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(request)
+    await writer.drain()
+    head = await reader.readuntil(b"\r\n\r\n")
+    length = int(next(line.split(b":")[1] for line in head.split(b"\r\n") if line.lower().startswith(b"content-length")))
+    body = await reader.readexactly(length)
+    writer.close()
+    return int(head.split()[1]), body
+
+
+def post(path: str, body: bytes) -> bytes:
+    return (f"POST {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n").encode() + body
+
+
+def test_http_routes():
+    server = InferenceServer(FakeDetection(FakeModel()), max_wait_ms=1)
+    jpeg = cv2.imencode(".jpg", frame(200))[1].tobytes()
+
+    async def requests():
+        listener = await asyncio.start_server(server.handle_connection, "127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        async with listener:
+            return [await http(port, post("/detect", jpeg)),
+                    await http(port, post("/detect_batch", json.dumps(
+                        {"images": [base64.b64encode(jpeg).decode()] * 2}).encode())),
+                    await http(port, post("/detect", b"not a jpeg")),
+                    await http(port, b"GET /health HTTP/1.1\r\n\r\n"),
+                    await http(port, b"GET /missing HTTP/1.1\r\n\r\n")]
+
+    (detect, body), (batch, batch_body), (bad, _), (health, health_body), (missing, _) = asyncio.run(
+        running(server, requests()))
+    assert (detect, batch, bad, health, missing) == (200, 200, 400, 200, 404)
+    detections = json.loads(body)["detections"]
+    assert detections[0]["class_name"] == "Stop" and abs(detections[0]["box"][0] - 200) < 2
+    assert len(json.loads(batch_body)["results"]) == 2
+    assert json.loads(health_body) == {"status": "ok", "queue": 0}
@@ -0,0 +1,90 @@
+import os
+import numpy as np
+import pytest
+from src.model.label_index import LabelIndex
+
+LABELS = {
+    "train": {"a": [[0, 0.5, 0.5, 0.2, 0.2], [3, 0.1, 0.2, 0.05, 0.1]], "b": [], "c": [[1, 0.3, 0.3, 0.5, 0.4]]},
+    "valid": {"d": [[3, 0.6, 0.6, 0.1, 0.1], [3, 0.4, 0.4, 0.3, 0.3], [0, 0.2, 0.8, 0.1, 0.2]]},
+}
+
+
+def write_labels(path, boxes) -> None:
+    path.write_text("".join(f"{int(c)} {x} {y} {w} {h}\n" for c, x, y, w, h in boxes))
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    for split, files in LABELS.items():
+        for folder in ("images", "labels"):
+            (tmp_path / "dataset" / split / folder).mkdir(parents=True)
+        for stem, boxes in files.items():
+            (tmp_path / "dataset" / split / "images" / f"{stem}.png").write_bytes(b"")
+            write_labels(tmp_path / "dataset" / split / "labels" / f"{stem}.txt", boxes)
+    return tmp_path / "dataset"
+
+
+def boxes_by_label(index: LabelIndex) -> dict:
+    return {os.path.basename(record["label"]): index.boxes[index.offsets[i]:index.offsets[i + 1]].tolist()
+            for i, record in enumerate(index.files)}
+
+
+def expected_boxes() -> dict:
+    return {f"{stem}.txt": np.array(boxes, dtype=np.float32).reshape(-1, 5).tolist()
+            for files in LABELS.values() for stem, boxes in files.items()}
+
+
+def test_boxes_round_trip_through_the_offsets(tmp_path, dataset):
+    index = LabelIndex(str(tmp_path / "index"), str(dataset))
+    assert index.update() == 4
+    np.testing.assert_array_equal(index.offsets, [0, 2, 2, 3, 6])
+    assert boxes_by_label(index) == expected_boxes()
+    assert [os.path.basename(record["image"]) for record in index.files] == ["a.png", "b.png", "c.png", "d.png"]
+    np.testing.assert_array_equal(index.file_ids(), [0, 0, 2, 3, 3, 3])
+
+    reloaded = LabelIndex(str(tmp_path / "index"), str(dataset))
+    assert isinstance(reloaded.boxes, np.memmap)
+    assert boxes_by_label(reloaded) == expected_boxes()
+
+
+def test_empty_dataset(tmp_path):
+    (tmp_path / "dataset").mkdir()
+    index = LabelIndex(str(tmp_path / "index"), str(tmp_path / "dataset"))
+    assert index.update() == 0
+    assert index.boxes.shape == (0, 5) and index.offsets.tolist() == [0]
+    boxes, images = index.query(classes=[0])
+    assert boxes.shape == (0, 5) and images == []
+    np.testing.assert_array_equal(index.class_counts(num_classes=3), [0, 0, 0])
+
+
+def test_update_parses_only_changed_files(tmp_path, dataset):
+    index = LabelIndex(str(tmp_path / "index"), str(dataset))
+    index.update()
+    assert LabelIndex(str(tmp_path / "index"), str(dataset)).update() == 0
+
+    write_labels(dataset / "train" / "labels" / "b.txt", [[2, 0.5, 0.5, 0.1, 0.1]])
+    os.remove(dataset / "valid" / "labels" / "d.txt")
+    assert index.update() == 1
+    expected = expected_boxes()
+    expected["b.txt"] = [np.array([2, 0.5, 0.5, 0.1, 0.1], dtype=np.float32).tolist()]
+    del expected["d.txt"]
+    assert boxes_by_label(index) == expected
+
+
+def test_query_and_counts(tmp_path, dataset):
+    index = LabelIndex(str(tmp_path / "index"), str(dataset))
+    index.update()
+    boxes, images = index.query(classes=[3], splits=["valid"], min_area=0.05)
+    np.testing.assert_allclose(boxes, [[3, 0.4, 0.4, 0.3, 0.3]])
+    assert images == [str(dataset / "valid" / "images" / "d.png")]
+    np.testing.assert_array_equal(index.class_counts(num_classes=4), [2, 1, 0, 3])
+    np.testing.assert_array_equal(index.class_counts(num_classes=4, splits=["train"]), [1, 1, 0, 1])
+
+
+def test_relabel_rewrites_only_files_with_the_class(tmp_path, dataset):
+    index = LabelIndex(str(tmp_path / "index"), str(dataset))
+    index.update()
+    assert index.relabel({3: 0}) == 2
+    np.testing.assert_array_equal(index.class_counts(num_classes=4), [5, 1, 0, 0])
+    first = (dataset / "train" / "labels" / "a.txt").read_text().split("\n")[1].split()
+    assert first[0] == "0" and float(first[1]) == 0.1
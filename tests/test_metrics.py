@@ -0,0 +1,80 @@
+import io
+import json
+import pickle
+import numpy as np
+import pytest
+from src.model.metrics import Metrics
+
+
+def test_percentiles_cover_the_window_and_totals_every_sample():
+    metrics = Metrics(window=100)
+    for i in range(1, 201):
+        metrics.observe("infer", i / 1000)
+    stage = metrics.snapshot()["stages"]["infer"]
+    assert stage["count"] == 100 and stage["total_count"] == 200
+    assert stage["total_seconds"] == pytest.approx(sum(range(1, 201)) / 1000)
+    assert stage["mean_ms"] == pytest.approx(150.5)
+    assert stage["p50_ms"] == pytest.approx(np.percentile(np.arange(101, 201), 50))
+    assert stage["p99_ms"] == pytest.approx(np.percentile(np.arange(101, 201), 99))
+
+
+def test_stage_times_the_block_even_when_it_raises():
+    metrics = Metrics()
+    with pytest.raises(ValueError):
+        with metrics.stage("decode"):
+            raise ValueError
+    assert metrics.snapshot()["stages"]["decode"]["total_count"] == 1
+
+
+def test_counters_gauges_and_throughput():
+    metrics = Metrics()
+    metrics.increment("dropped_frames")
+    metrics.increment("dropped_frames", 2)
+    metrics.set_gauge("queue_depth", 5)
+    metrics.throughput("augment", 50, 2.0)
+    snapshot = metrics.snapshot()
+    assert snapshot["counters"] == {"dropped_frames": 3, "augment_items": 50}
+    assert snapshot["gauges"] == {"queue_depth": 5, "augment_items_per_second": 25.0}
+
+
+def test_fps_needs_two_frames(monkeypatch):
+    metrics = Metrics()
+    clock = iter([10.0, 10.5, 11.0])
+    monkeypatch.setattr("src.model.metrics.time.monotonic", lambda: next(clock))
+    metrics.frame()
+    assert metrics.fps() == 0.0
+    metrics.frame()
+    metrics.frame()
+    assert metrics.fps() == pytest.approx(2.0)
+    assert metrics.counters["frames"] == 3
+
+
+def test_prometheus_text():
+    metrics = Metrics(prefix="ts")
+    metrics.observe("infer", 0.25)
+    metrics.increment("frames", 4)
+    metrics.set_gauge("queue_depth", 2)
+    lines = metrics.to_prometheus().splitlines()
+    assert 'ts_stage_latency_seconds{stage="infer",quantile="0.95"} 0.25' in lines
+    assert 'ts_stage_latency_seconds_sum{stage="infer"} 0.25' in lines
+    assert 'ts_stage_latency_seconds_count{stage="infer"} 1' in lines
+    assert "ts_frames_total 4" in lines and "ts_queue_depth 2" in lines
+
+
+def test_export_writes_the_log_line_and_the_text_file(tmp_path):
+    stream = io.StringIO()
+    metrics = Metrics(prometheus_path=str(tmp_path / "metrics.prom"), log_stream=stream)
+    metrics.increment("frames")
+    line = metrics.export()
+    assert stream.getvalue() == line + "\n"
+    assert json.loads(line)["counters"] == {"frames": 1}
+    assert (tmp_path / "metrics.prom").read_text() == metrics.to_prometheus()
+
+
+def test_pickled_copy_drops_the_stream():
+    metrics = Metrics(log_stream=io.StringIO())
+    metrics.observe("read", 0.1)
+    copy = pickle.loads(pickle.dumps(metrics))
+    assert copy.log_stream is None
+    copy.observe("read", 0.2)
+    assert copy.snapshot()["stages"]["read"]["total_count"] == 2
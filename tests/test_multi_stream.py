@@ -0,0 +1,104 @@
+import json
+import queue
+import time
+import cv2
+import numpy as np
+import pytest
+from src.model.metrics import Metrics
+from src.model.multi_stream import MultiStreamScheduler, is_live
+
+
+class FakeReader:
+    def __init__(self, stream_id: int, arrivals: list, drop_oldest: bool = False) -> None:
+        self.stream_id = stream_id
+        self.drop_oldest = drop_oldest
+        self.queue = queue.Queue()
+        for index, arrival in enumerate(arrivals):
+            self.queue.put((index, index / 30, None, arrival))
+        self.queue.put(None)
+
+
+class FakeModel:
+    names = {0: "Stop"}
+
+    def __call__(self, frames, imgsz, verbose):
+        return [float(frame.mean()) for frame in frames]
+
+
+class FakeDetection:
+    imgsz = 64
+
+    def __init__(self) -> None:
+        self.metrics = Metrics()
+
+    def load(self):
+        return FakeModel()
+
+    def extract_detections(self, result):
+        return np.array([[result, 0, 10, 10]]), np.array([0.5]), np.array([0])
+
+
+def scheduler_of(*readers, **kwargs) -> MultiStreamScheduler:
+    scheduler = MultiStreamScheduler(FakeDetection(), [None] * len(readers), **kwargs)
+    scheduler.readers = list(readers)
+    return scheduler
+
+
+def schedule(scheduler: MultiStreamScheduler) -> list:
+    batches = []
+    while batch := scheduler.next_batch():
+        batches.append([(stream_id, index) for stream_id, index, _, _ in batch])
+    return batches
+
+
+def test_round_robin_takes_one_frame_per_stream_in_turn():
+    now = time.monotonic()
+    scheduler = scheduler_of(FakeReader(0, [now] * 3), FakeReader(1, [now]), FakeReader(2, [now] * 2),
+                             batch_size=4)
+    assert schedule(scheduler) == [[(0, 0), (1, 0), (2, 0), (0, 1)], [(2, 1), (0, 2)]]
+
+
+def test_deadline_takes_the_oldest_frames_first():
+    now = time.monotonic()
+    scheduler = scheduler_of(FakeReader(0, [now - 1, now - 0.1]), FakeReader(1, [now - 2, now - 1.5, now - 0.5]),
+                             batch_size=3, policy="deadline", max_age=None)
+    assert schedule(scheduler) == [[(1, 0), (1, 1), (0, 0)], [(1, 2), (0, 1)]]
+
+
+def test_stale_frames_are_dropped_only_for_dropping_streams():
+    now = time.monotonic()
+    scheduler = scheduler_of(FakeReader(0, [now - 5, now]), FakeReader(1, [now - 5, now], drop_oldest=True),
+                             max_age=1.0)
+    assert schedule(scheduler) == [[(0, 0), (1, 1), (0, 1)]]
+    assert scheduler.metrics.counters["stale_frames"] == 1
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        MultiStreamScheduler(FakeDetection(), [], policy="fifo")
+
+
+def test_is_live():
+    assert is_live(0) and is_live("1") and is_live("rtsp://camera/stream")
+    assert not is_live("videos/road.mp4")
+
+
+def test_run_writes_every_frame_of_every_stream_in_order(tmp_path):
+    sources = []
+    for stream_id, count in enumerate([7, 3]):
+        path = str(tmp_path / f"video_{stream_id}.avi")
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 10, (32, 24))
+        for i in range(count):
+            writer.write(np.full((24, 32, 3), 100 * stream_id + 10 * i, dtype=np.uint8))
+        writer.release()
+        sources.append(path)
+
+    scheduler = MultiStreamScheduler(FakeDetection(), sources, batch_size=3, queue_size=2)
+    assert scheduler.run(str(tmp_path / "out")) == [7, 3]
+    for stream_id, count in enumerate([7, 3]):
+        with open(tmp_path / "out" / f"stream_{stream_id}.jsonl", encoding="utf-8") as file:
+            rows = [json.loads(line) for line in file]
+        assert [row["frame"] for row in rows] == list(range(count))
+        for row in rows:
+            assert abs(row["x1"] - (100 * stream_id + 10 * row["frame"])) < 3
+    assert scheduler.metrics.counters["frames"] == 10
@@ -0,0 +1,99 @@
+import pickle
+import numpy as np
+import pytest
+from PIL import Image, ImageEnhance, ImageStat
+from src.model.data_augment import DataAugment
+from src.model.photometric import NoiseBank, adjust_brightness, adjust_contrast, gray_mean, image_key
+
+FACTORS = [0.0, 0.3, 0.5, 0.9, 1.0, 1.2, 1.5, 2.0, 3.7]
+
+
+def random_images(count: int, shape: tuple = (37, 53, 3), seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).integers(0, 256, (count, *shape), dtype=np.uint8)
+
+
+@pytest.mark.parametrize("factor", FACTORS)
+def test_adjust_brightness_matches_pil(factor):
+    for image in random_images(3):
+        expected = np.asarray(ImageEnhance.Brightness(Image.fromarray(image)).enhance(factor))
+        np.testing.assert_array_equal(adjust_brightness(image, factor), expected)
+
+
+@pytest.mark.parametrize("factor", FACTORS)
+@pytest.mark.parametrize("shape", [(37, 53, 3), (37, 53)])
+def test_adjust_contrast_matches_pil(factor, shape):
+    images = random_images(4, shape, seed=1)
+    # A dark image has a different gray mean, so every image gets its own table
+    images[0] //= 4
+    expected = np.stack([np.asarray(ImageEnhance.Contrast(Image.fromarray(image)).enhance(factor))
+                         for image in images])
+    np.testing.assert_array_equal(adjust_contrast(images, factor, batch=True), expected)
+    np.testing.assert_array_equal(adjust_contrast(images[0], factor, batch=False), expected[0])
+
+
+def test_gray_mean_matches_pil():
+    images = random_images(5, seed=2)
+    expected = [int(ImageStat.Stat(Image.fromarray(image).convert("L")).mean[0] + 0.5) for image in images]
+    np.testing.assert_array_equal(gray_mean(images), expected)
+    assert gray_mean(images[0]) == expected[0]
+
+
+def test_data_augment_enhancements_match_pil():
+    augment = DataAugment("unused", "unused")
+    image = Image.fromarray(random_images(1, seed=3)[0])
+    np.testing.assert_array_equal(np.asarray(augment.change_contrast(image, 1.5)),
+                                  np.asarray(ImageEnhance.Contrast(image).enhance(1.5)))
+    np.testing.assert_array_equal(np.asarray(augment.modified_color(image, 0.5)),
+                                  np.asarray(ImageEnhance.Brightness(image).enhance(0.5)))
+
+
+def test_noise_is_a_window_of_the_bank_and_saturates():
+    bank = NoiseBank(size=10000)
+    image = random_images(1, (20, 30, 3), seed=4)[0]
+    noisy = bank.add(image, key=7)
+    window = bank.window(image.size, key=7).reshape(image.shape)
+    np.testing.assert_array_equal(noisy, np.clip(image.astype(np.int32) + window, 0, 255))
+    assert noisy.dtype == np.uint8
+
+
+def test_noise_depends_on_the_image_not_on_the_call_order():
+    images = random_images(3, (20, 30, 3), seed=5)
+    first = NoiseBank(size=10000)
+    forward = [first.add(image) for image in images]
+    second = NoiseBank(size=10000)
+    backward = [second.add(image) for image in images[::-1]][::-1]
+    for a, b in zip(forward, backward):
+        np.testing.assert_array_equal(a, b)
+
+
+def test_noise_survives_pickling():
+    bank = NoiseBank(size=10000)
+    image = random_images(1, (20, 30, 3), seed=6)[0]
+    expected = bank.add(image)
+    copy = pickle.loads(pickle.dumps(bank))
+    assert copy.bank is None
+    np.testing.assert_array_equal(copy.add(image), expected)
+
+
+def test_noise_bank_grows_to_large_images():
+    bank = NoiseBank(size=100)
+    image = random_images(1, (20, 30, 3), seed=7)[0]
+    assert bank.add(image, key=image_key(image)).shape == image.shape
+    assert len(bank.bank) >= image.size
+
+
+def test_noise_statistics():
+    values = NoiseBank(sigma=25.0).values(1)
+    assert values.dtype == np.int16
+    assert abs(values.mean()) < 0.5
+    assert abs(values.std() - 25.0) < 0.5
+
+
+def test_image_key_samples_the_image():
+    image = random_images(1, (480, 640, 3), seed=8)[0]
+    assert image_key(image) == image_key(image.copy()) == image_key(np.asfortranarray(image))
+    other = image.copy()
+    other[::7, ::10] //= 2
+    assert image_key(other) != image_key(image)
+    # Same sampled pixels, different shape
+    assert image_key(np.zeros((64, 64, 3), np.uint8)) != image_key(np.zeros((64, 64), np.uint8))
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+from src.model import renderer
+from src.model.renderer import BoxRenderer, concatenated_ranges
+
+NAMES = ["Cấm đi ngược chiều", "Đường ưu tiên", "Stop"]
+
+
+def scalar_draw(box_renderer: BoxRenderer, frame, boxes, confidences, class_ids):
+    """
+    Paint the outline strips and then the labels one box at a time with slices
+    """
+    height, width = frame.shape[:2]
+    t = box_renderer.thickness
+    corners = np.rint(boxes).astype(int)
+    for (x1, y1, x2, y2), class_id in zip(corners, class_ids):
+        left, top = x1 - t // 2, y1 - t // 2
+        right, bottom = left + x2 - x1 + t, top + y2 - y1 + t
+        for strip in ((left, top, right, top + t), (left, bottom - t, right, bottom),
+                      (left, top, left + t, bottom), (right - t, top, right, bottom)):
+            sx1, sy1, sx2, sy2 = np.clip(strip, 0, [width, height, width, height])
+            frame[sy1:sy2, sx1:sx2] = box_renderer.color(int(class_id))
+    for (x1, y1, _, _), confidence, class_id in zip(corners, confidences, class_ids):
+        percent = int(confidence * 100) if box_renderer.show_confidence else None
+        label = box_renderer.glyph(int(class_id), percent)
+        label_height, label_width = label.shape[:2]
+        top = y1 - label_height if y1 >= label_height else max(y1, 0)
+        left = min(max(x1, 0), max(width - label_width, 0))
+        bottom, right = min(top + label_height, height), min(left + label_width, width)
+        if bottom > top and right > left:
+            frame[top:bottom, left:right] = label[:bottom - top, :right - left]
+    return frame
+
+
+def random_detections(count: int, seed: int = 0) -> tuple:
+    rng = np.random.default_rng(seed)
+    top_left = rng.uniform(-30, 300, (count, 2))
+    boxes = np.concatenate([top_left, top_left + rng.uniform(5, 100, (count, 2))], axis=1)
+    return boxes, rng.uniform(0, 1, count), rng.integers(0, len(NAMES), count)
+
+
+def test_concatenated_ranges_matches_python():
+    starts, lengths = np.array([5, 0, 100, 3]), np.array([3, 1, 4, 2])
+    expected = [value for start, length in zip(starts, lengths) for value in range(start, start + length)]
+    np.testing.assert_array_equal(concatenated_ranges(starts, lengths), expected)
+
+
+@pytest.mark.parametrize("show_confidence", [True, False])
+@pytest.mark.parametrize("thickness", [1, 2, 3])
+def test_draw_matches_scalar_path(show_confidence, thickness):
+    box_renderer = BoxRenderer(NAMES, thickness=thickness, show_confidence=show_confidence)
+    # Boxes on top of each other: the labels must cover the outlines and the later labels the earlier ones
+    boxes, confidences, class_ids = random_detections(30)
+    frame = np.zeros((240, 320, 3), dtype=np.uint8)
+    drawn = box_renderer.draw(frame, boxes, confidences, class_ids)
+    assert drawn is frame
+    expected = scalar_draw(box_renderer, np.zeros_like(frame), boxes, confidences, class_ids)
+    np.testing.assert_array_equal(drawn, expected)
+
+
+def test_draw_non_contiguous_frame():
+    box_renderer = BoxRenderer(NAMES)
+    boxes, confidences, class_ids = random_detections(5, seed=1)
+    frame = np.zeros((240, 640, 3), dtype=np.uint8)[:, ::2]
+    box_renderer.draw(frame, boxes, confidences, class_ids)
+    expected = scalar_draw(box_renderer, np.zeros((240, 320, 3), dtype=np.uint8), boxes, confidences, class_ids)
+    np.testing.assert_array_equal(frame, expected)
+
+
+def test_draw_without_boxes_keeps_the_frame():
+    frame = np.full((10, 10, 3), 7, dtype=np.uint8)
+    assert BoxRenderer(NAMES).draw(frame, np.zeros((0, 4)), np.zeros(0), np.zeros(0, dtype=int)) is frame
+    assert (frame == 7).all()
+
+
+def test_draw_boxes_outside_the_frame():
+    frame = np.zeros((50, 50, 3), dtype=np.uint8)
+    # Below the frame, so the outline and the label above it are both cut away
+    BoxRenderer(NAMES).draw(frame, np.array([[10, 100, 30, 120.]]), np.array([0.5]), np.array([0]))
+    assert not frame.any()
+
+
+def test_missing_fonts_warn(monkeypatch):
+    monkeypatch.setattr(renderer, "FONTS", ())
+    with pytest.warns(RuntimeWarning, match="missing.ttf"):
+        renderer.load_font("missing.ttf")
@@ -0,0 +1,93 @@
+import numpy as np
+from src.model.box_ops import box_ios, box_iou, nmm
+from src.model.sliced_inference import SlicedInference
+
+
+def random_boxes(count: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    top_left = rng.uniform(0, 500, (count, 2))
+    return np.concatenate([top_left, top_left + rng.uniform(5, 120, (count, 2))], axis=1)
+
+
+def scalar_overlaps(box1, box2):
+    width = max(0.0, min(box1[2], box2[2]) - max(box1[0], box2[0]))
+    height = max(0.0, min(box1[3], box2[3]) - max(box1[1], box2[1]))
+    area1 = (box1[2] - box1[0]) * (box1[3] - box1[1])
+    area2 = (box2[2] - box2[0]) * (box2[3] - box2[1])
+    inter = width * height
+    return inter / (area1 + area2 - inter), inter / min(area1, area2)
+
+
+def test_box_iou_and_ios_match_scalar_path():
+    boxes1, boxes2 = random_boxes(30), random_boxes(20, seed=1)
+    expected = np.array([[scalar_overlaps(a, b) for b in boxes2] for a in boxes1])
+    np.testing.assert_allclose(box_iou(boxes1, boxes2), expected[..., 0], atol=1e-12)
+    np.testing.assert_allclose(box_ios(boxes1, boxes2), expected[..., 1], atol=1e-12)
+
+
+def test_nmm_joins_the_pieces_of_a_cut_box():
+    # A sign cut by a tile border into two pieces, and the whole sign seen by the full frame tile
+    boxes = np.array([[100, 100, 150, 200], [150, 100, 200, 200], [100, 100, 200, 200], [300, 300, 320, 320.]])
+    scores = np.array([0.9, 0.8, 0.6, 0.5])
+    class_ids = np.array([1, 1, 1, 1])
+    # The IoU of each piece with the whole box is only 0.5, their intersection over the smaller box is 1
+    np.testing.assert_allclose(box_iou(boxes[:2], boxes[2:3]), [[0.5], [0.5]])
+
+    keep, merged = nmm(boxes, scores, class_ids, 0.5)
+    np.testing.assert_array_equal(keep, [0, 3])
+    np.testing.assert_array_equal(merged, [[100, 100, 200, 200], [300, 300, 320, 320]])
+
+
+def test_nmm_keeps_classes_apart():
+    boxes = np.array([[0, 0, 10, 10], [0, 0, 10, 10.]])
+    keep, merged = nmm(boxes, np.array([0.9, 0.8]), np.array([0, 1]), 0.5)
+    np.testing.assert_array_equal(keep, [0, 1])
+    np.testing.assert_array_equal(merged, boxes)
+
+
+def test_nmm_empty():
+    keep, merged = nmm(np.zeros((0, 4)), np.zeros(0), np.zeros(0, dtype=int), 0.5)
+    assert keep.shape == (0,) and merged.shape == (0, 4)
+
+
+def test_tiles_cover_the_frame():
+    slicer = SlicedInference(tile_size=100, overlap=0.2)
+    tiles = slicer.tiles(250, 130)
+    assert tiles[:, [0, 1]].min() == 0
+    assert tiles[:, 2].max() == 250 and tiles[:, 3].max() == 130
+    assert ((tiles[:, 2] - tiles[:, 0]) == 100).all() and ((tiles[:, 3] - tiles[:, 1]) == 100).all()
+
+
+def test_empty_roi_infers_nothing():
+    calls = []
+
+    def model(crops, **kwargs):
+        calls.append(len(crops))
+        return crops
+
+    slicer = SlicedInference(tile_size=100, roi_mask=np.zeros((10, 10), dtype=np.uint8))
+    assert slicer.full_tile(300, 300) is None
+    boxes, confidences, class_ids = slicer.predict(model, np.zeros((300, 300, 3), dtype=np.uint8), None)
+    assert calls == [] and len(boxes) == len(confidences) == len(class_ids) == 0
+
+
+def test_predict_merges_across_tiles():
+    # Every pixel holds its own coordinates, so a tile knows where it was cut from
+    ys, xs = np.mgrid[:200, :300]
+    frame = np.stack([xs, ys], axis=2)
+    sign = np.array([80.0, 40, 160, 120])
+
+    def extract_detections(tile):
+        # The model sees the part of the sign inside the tile, in tile coordinates
+        x1, y1 = tile[0, 0]
+        height, width = tile.shape[:2]
+        box = np.clip(sign - [x1, y1, x1, y1], 0, [width, height, width, height])
+        if box[2] - box[0] < 1 or box[3] - box[1] < 1:
+            return np.zeros((0, 4)), np.zeros(0), np.zeros(0, dtype=int)
+        return box[None], np.array([(box[2] - box[0]) * (box[3] - box[1]) / 6400]), np.array([3])
+
+    slicer = SlicedInference(tile_size=100, overlap=0.2, full_frame=True)
+    assert len(slicer.tiles(300, 200)) > 1
+    boxes, _, class_ids = slicer.predict(lambda tiles, **kwargs: tiles, frame, extract_detections)
+    np.testing.assert_array_equal(class_ids, [3])
+    np.testing.assert_allclose(boxes, [sign])
@@ -0,0 +1,67 @@
+import numpy as np
+from src.model.tracker import IoUTracker
+
+
+def detections(*rows) -> tuple:
+    rows = np.array(rows, dtype=float).reshape(-1, 6)
+    return rows[:, :4], rows[:, 4], rows[:, 5].astype(int)
+
+
+def test_moving_boxes_keep_their_track_id():
+    tracker = IoUTracker()
+    first = tracker.update(*detections([0, 0, 10, 10, 0.9, 1], [50, 50, 70, 70, 0.8, 2]))
+    np.testing.assert_array_equal(first, [0, 1])
+    # Given in the other order and moved a little
+    second = tracker.update(*detections([52, 51, 72, 71, 0.7, 2], [1, 1, 11, 11, 0.9, 1]))
+    np.testing.assert_array_equal(second, [1, 0])
+    assert tracker.next_id == 2
+
+
+def test_other_class_or_low_iou_starts_a_new_track():
+    tracker = IoUTracker(iou_threshold=0.5)
+    tracker.update(*detections([0, 0, 10, 10, 0.9, 1]))
+    np.testing.assert_array_equal(tracker.update(*detections([0, 0, 10, 10, 0.9, 3])), [1])
+    # IoU 1/3 with the class 1 track, which is still kept
+    np.testing.assert_array_equal(tracker.update(*detections([5, 0, 15, 10, 0.9, 1])), [2])
+    assert sorted(tracker.track_ids.tolist()) == [0, 1, 2]
+
+
+def test_highest_iou_wins_and_each_track_matches_once():
+    tracker = IoUTracker()
+    tracker.update(*detections([0, 0, 10, 10, 0.9, 0]))
+    # Both overlap the track, the second one more
+    track_ids = tracker.update(*detections([3, 0, 13, 10, 0.9, 0], [1, 0, 11, 10, 0.9, 0]))
+    np.testing.assert_array_equal(track_ids, [1, 0])
+
+
+def test_missed_tracks_survive_max_missed_keyframes():
+    tracker = IoUTracker(max_missed=2)
+    tracker.update(*detections([0, 0, 10, 10, 0.9, 0]))
+    empty = detections()
+    for _ in range(2):
+        tracker.update(*empty)
+        assert tracker.track_ids.tolist() == [0] and not len(tracker.visible()[0])
+    np.testing.assert_array_equal(tracker.update(*detections([0, 0, 10, 10, 0.9, 0])), [0])
+    for _ in range(3):
+        tracker.update(*empty)
+    assert not len(tracker.track_ids)
+    np.testing.assert_array_equal(tracker.update(*detections([0, 0, 10, 10, 0.9, 0])), [1])
+
+
+def test_propagate_follows_the_image():
+    rng = np.random.default_rng(0)
+    texture = (rng.random((30, 40)) * 255).astype(np.uint8).repeat(4, 0).repeat(4, 1)
+    prev_gray, gray = texture[:100, :140], texture[3:103, 5:145]
+    tracker = IoUTracker()
+    tracker.update(*detections([40, 30, 80, 70, 0.9, 0]))
+    boxes, confidences, class_ids, track_ids = tracker.propagate(np.ascontiguousarray(prev_gray),
+                                                                 np.ascontiguousarray(gray))
+    # The content moved up by 3 and left by 5 pixels
+    np.testing.assert_allclose(boxes, [[35, 27, 75, 67]], atol=0.5)
+    assert confidences.tolist() == [0.9] and class_ids.tolist() == [0] and track_ids.tolist() == [0]
+
+
+def test_propagate_without_tracks():
+    frame = np.zeros((20, 20), dtype=np.uint8)
+    boxes, _, _, track_ids = IoUTracker().propagate(frame, frame)
+    assert boxes.shape == (0, 4) and not len(track_ids)
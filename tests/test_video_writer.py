@@ -0,0 +1,49 @@
+import cv2
+import numpy as np
+import pytest
+from src.model.video_writer import AsyncVideoWriter
+
+
+class BrokenRenderer:
+    def draw(self, frame, boxes, confidences, class_ids):
+        raise ValueError("cannot draw")
+
+
+def frames(count: int):
+    return [np.full((48, 64, 3), 10 * i, dtype=np.uint8) for i in range(count)]
+
+
+def test_frames_are_encoded_and_resized(tmp_path):
+    path = str(tmp_path / "out.avi")
+    with AsyncVideoWriter(path, 10, size=(32, 24), fourcc="MJPG") as writer:
+        for frame in frames(5):
+            writer.write(frame)
+    video = cv2.VideoCapture(path)
+    assert int(video.get(cv2.CAP_PROP_FRAME_COUNT)) == 5
+    ok, frame = video.read()
+    assert ok and frame.shape == (24, 32, 3)
+    video.release()
+
+
+def test_thread_starts_with_the_first_frame(tmp_path):
+    writer = AsyncVideoWriter(str(tmp_path / "out.avi"), 10, fourcc="MJPG")
+    assert writer.ident is None
+    # Closing a writer that never received a frame neither blocks nor writes a file
+    writer.close()
+    assert not (tmp_path / "out.avi").exists()
+
+
+def test_close_raises_the_writer_error(tmp_path):
+    detections = (np.zeros((0, 4)), np.zeros(0), np.zeros(0, dtype=int))
+    with pytest.raises(RuntimeError, match="cannot draw"):
+        with AsyncVideoWriter(str(tmp_path / "out.avi"), 10, renderer=BrokenRenderer(), fourcc="MJPG") as writer:
+            writer.write(frames(1)[0], detections)
+
+
+def test_writer_error_does_not_hide_the_original_error(tmp_path):
+    detections = (np.zeros((0, 4)), np.zeros(0), np.zeros(0, dtype=int))
+    with pytest.raises(KeyError, match="detection failed"):
+        with AsyncVideoWriter(str(tmp_path / "out.avi"), 10, renderer=BrokenRenderer(), fourcc="MJPG") as writer:
+            writer.write(frames(1)[0], detections)
+            raise KeyError("detection failed")
+    assert not writer.is_alive()